@@ -0,0 +1,54 @@
+"""Параболическая поляра CD = CD0 + k·CL² и оптимальная скорость полета"""
+import numpy as np
+
+# Модели аэродинамики: "fixed" - качество задано выбором aero_quality,
+# "polar" - качество по поляре при текущих скорости, плотности и нагрузке на крыло
+AERO_MODELS = ('fixed', 'polar')
+
+OSWALD = 0.8   # коэффициент Освальда
+CL_MAX = 1.3   # наибольший коэффициент подъемной силы в установившемся полете
+
+
+def polar(aero_quality, aspect_ratio, oswald=OSWALD):
+    """Коэффициенты поляры (CD0, k) для класса качества и удлинения.
+
+    k = 1/(π·e·λ) определяется удлинением, а CD0 подбирается так, чтобы
+    наибольшее качество 1/(2·sqrt(CD0·k)) было равно aero_quality.
+    """
+    k = 1 / (np.pi * oswald * np.asarray(aspect_ratio, dtype=np.float64))
+    cd0 = 1 / (4 * k * np.asarray(aero_quality, dtype=np.float64) ** 2)
+    return cd0, k
+
+
+def lift_to_drag(lift_coefficient, cd0, k):
+    """Аэродинамическое качество при заданном CL"""
+    return lift_coefficient / (cd0 + k * lift_coefficient**2)
+
+
+def lift_coefficient(weight, density, speed_ms, wing_area):
+    """CL установившегося горизонтального полета"""
+    return weight / (0.5 * density * speed_ms**2 * wing_area)
+
+
+def cruise_lift_coefficient(wing_loading, density, speed_ms):
+    """CL в расчетной точке при нагрузке на крыло wing_loading (Н/м²).
+
+    CL = (W/S)/q не больше CL_MAX: если при заданной нагрузке крыло на
+    этой скорости и высоте не держит аппарат, крыло увеличивается до CL_MAX.
+    """
+    return np.minimum(lift_coefficient(wing_loading, density, speed_ms, 1.0), CL_MAX)
+
+
+def optimal_speed(weight, density, wing_area, cd0, k, mission_type="loitering"):
+    """Скорость наименьшей потребной мощности (барражирование) или наибольшей дальности.
+
+    Для электрического БВС масса в полете не меняется, поэтому наибольшая
+    дальность достигается при наибольшем качестве: CL = sqrt(CD0/k).
+    Наименьшая мощность D·V - при CL = sqrt(3·CD0/k). CL ограничен
+    CL_MAX. Решение в замкнутом виде, аргументы - числа или массивы одной
+    формы. Возвращает (скорость м/с, CL, качество).
+    """
+    factor = 1.0 if mission_type == "long_range" else 3.0
+    cl = np.minimum(np.sqrt(factor * cd0 / k), CL_MAX)
+    speed_ms = np.sqrt(weight / (0.5 * density * wing_area * cl))
+    return speed_ms, cl, lift_to_drag(cl, cd0, k)
@@ -1,11 +1,12 @@
+import asyncio
 import logging
 import json
-import subprocess
 from dotenv import load_dotenv
 import os
 from datetime import datetime, timedelta
 import pandas as pd
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardRemove
+from telegram.helpers import escape_markdown
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -16,10 +17,23 @@ from telegram.ext import (
     filters
 )
 from pathlib import Path
-import re
 import time
 import uuid
-import math
+from collections import OrderedDict
+from storage import UserLocks, call_with_version, create_config_store, new_config_id
+from repo_sync import RepoSyncWorker
+import numpy as np
+import aero
+import atmosphere
+import catalog
+import engine
+from design import DESIGN_INPUT_KEYS
+import design
+import matching
+import mission
+import robustness
+import sensitivity
+from result_cache import ResultCache
 
 # Настройка логирования
 logging.basicConfig(
@@ -35,8 +49,9 @@ logger = logging.getLogger(__name__)
     INPUT_PLANE_MATERIAL, INPUT_PROPELLER_TYPE, INPUT_TAKEOFF_TYPE,
     INPUT_CEILING, CALCULATE, CHANGE_FLIGHT_TIME, CHANGE_SPEED,
     CHANGE_AERO_QUALITY, CHANGE_MANEUVER_TIME, WELCOME_STATE,
-    SHOW_HISTORY, SHOW_CONFIG, CONFIRM_DELETE, INPUT_CONFIG_NAME
-) = range(21)
+    SHOW_HISTORY, SHOW_CONFIG, CONFIRM_DELETE, INPUT_CONFIG_NAME,
+    CHANGE_WING_LOADING
+) = range(22)
 
 # Токен бота из переменных окружения
 TOKEN = os.getenv("BOT_TOKEN")
@@ -45,10 +60,111 @@ GIT_TOKEN = os.getenv("GIT_TOKEN")
 CONFIG_FILE = 'configurations.json'
 
 # Стандартная атмосфера (на уровне моря)
-STD_ATMOSPHERE = {
-    'density': 1.225  # кг/м³ на уровне моря
+STD_ATMOSPHERE = atmosphere.state(0.0)._asdict()
+
+# Версия формата сохраняемой конфигурации (2 - только входные параметры)
+CONFIG_SCHEMA_VERSION = 2
+
+# Кнопка переключения модели энергии (подпись зависит от текущей модели)
+ENERGY_MODEL_TOGGLE_LABELS = {
+    'lumped': "Энергия: по участкам полета",
+    'mission': "Энергия: по крейсерской мощности"
+}
+
+# Сколько подходящих комплектующих из каталога показывать под результатами
+CATALOG_MATCHES = 2
+
+# Кнопка переключения модели винта
+PROPELLER_MODEL_TOGGLE_LABELS = {
+    'constant': "Винт: подбор по таблицам",
+    'table': "Винт: постоянный КПД"
+}
+
+# Кнопка переключения модели аэродинамики
+AERO_MODEL_TOGGLE_LABELS = {
+    'fixed': "Аэродинамика: поляра",
+    'polar': "Аэродинамика: заданное качество"
+}
+
+# Переключаемые модели расчета: {параметр: (подписи кнопки по текущей модели, название для журнала)}.
+# Первая модель в подписях - модель по умолчанию
+MODEL_TOGGLES = {
+    'energy_model': (ENERGY_MODEL_TOGGLE_LABELS, "модель энергии"),
+    'propeller_model': (PROPELLER_MODEL_TOGGLE_LABELS, "модель винта"),
+    'aero_model': (AERO_MODEL_TOGGLE_LABELS, "модель аэродинамики")
+}
+
+# Выбор винта по таблицам (КПД по умолчанию - если ни один винт не подходит)
+PROPELLER_TABLE_CHOICE = "table"
+PROPELLER_TABLE_FALLBACK_EFF = 0.75
+
+# Названия неопределенных параметров для отчета о робастности
+ROBUSTNESS_LABELS = {
+    'aero_quality': "качество",
+    'propeller_eff': "КПД винта",
+    'battery_capacity': "удельная энергия АКБ",
+    'plane_mass': "доля массы планера"
+}
+
+# Названия входных и выходных параметров для отчета о чувствительности
+SENSITIVITY_LABELS = {
+    'payload': "Полезная нагрузка",
+    'speed': "Крейсерская скорость",
+    'flight_time': "Время полета",
+    'distance': "Дальность",
+    'aero_quality': "Аэродинамическое качество",
+    'thrust_reserve': "Запас тяги",
+    'maneuver_time': "Время маневрирования",
+    'plane_mass': "Доля массы планера",
+    'propeller_eff': "КПД винта",
+    'battery_capacity': "Удельная энергия АКБ",
+    'ceiling': "Высота полета",
+    'takeoff_mass': "Взлетная масса",
+    'power_cruise': "Крейсерская мощность",
+    'battery_mass': "Масса батареи",
+    'wingspan': "Размах крыла"
+}
+SENSITIVITY_TOP = 5
+
+# Параметры, по которым строится сетка /sweep: (название, единицы, формат)
+SWEEP_PARAMS = {
+    'speed': ("Скорость", "км/ч", "{:.0f}"),
+    'payload': ("Полезная нагрузка", "кг", "{:.2f}"),
+    'flight_time': ("Время полета", "ч", "{:.2f}")
+}
+
+# Критерии оптимизации /sweep
+SWEEP_OBJECTIVES = {
+    'takeoff_mass': "Взлетная масса",
+    'battery_mass': "Масса батареи",
+    'power_cruise': "Мощность (крейсер)",
+    'power_max': "Мощность (макс)",
+    'wing_area': "Площадь крыла",
+    'wingspan': "Размах крыла"
+}
+
+# Исходная точка /sweep, если пользователь еще не выполнил расчет
+SWEEP_DEFAULTS = {
+    'type': "loitering", 'flight_time': 2.0, 'speed': 120.0, 'payload': 5.0, 'aero_quality': 12,
+    'thrust_reserve': 2.0, 'maneuver_time': 15.0, 'plane_mass': 0.45, 'propeller_eff': 0.80,
+    'takeoff_type': 0.4, 'ceiling': 1000.0, 'battery_capacity': 300
 }
 
+SWEEP_MAX_POINTS = 200  # точек на одну ось
+SWEEP_MAX_TOTAL = int(os.getenv('SWEEP_MAX_TOTAL', '20000'))  # точек во всей сетке
+SWEEP_TABLE_ROWS = 10
+SWEEP_TABLE_COLS = 5
+
+SWEEP_USAGE = f"""
+Использование:
+/sweep speed=60:160:11 [payload=1:10:10] [min=battery_mass]
+
+Параметры сетки (1 или 2): speed, payload, flight_time в формате начало:конец:число_точек.
+Не больше {SWEEP_MAX_POINTS} точек на ось и {SWEEP_MAX_TOTAL} во всей сетке.
+Критерий: min=<величина> или max=<величина>, величины: takeoff_mass, battery_mass, power_cruise, power_max, wing_area, wingspan.
+Остальные параметры берутся из последнего расчета.
+"""
+
 # Словарь для маппинга выбора
 SELECTION_MAPS = {
     'aero_quality': {"6": 6, "8": 8, "12": 12, "14": 14},
@@ -58,46 +174,141 @@ SELECTION_MAPS = {
     'takeoff_type': {"0.3": 0.3, "0.4": 0.4, "0.6": 0.6}
 }
 
-def calculate_air_density(altitude):
-    """Расчет плотности воздуха по модели ISA"""
-    rho_0 = 1.225  # кг/м³ на уровне моря
-    T_0 = 288.15   # К на уровне моря
-    g = 9.81       # м/с²
-    R = 287.05     # Дж/(кг·К)
-    L = 0.0065     # К/м (температурный градиент)
-    exponent = g / (R * L)
-    return rho_0 * (1 - L * altitude / T_0) ** exponent if altitude <= 11000 else 0.3639 * math.exp(-g * (altitude - 11000) / (R * 226.32))
-
-def load_configs():
-    """Загрузка конфигураций из JSON-файла"""
+config_store = None
+user_locks = UserLocks()
+
+# Размер страницы истории и кэш клавиатур недавно открытых страниц
+HISTORY_PAGE_SIZE = 8
+HISTORY_CACHE_USERS = 1000
+HISTORY_CACHE_PAGES = 8
+history_keyboards = OrderedDict()
+
+def get_config_store():
+    """Хранилище конфигураций (создается при первом обращении)"""
+    global config_store
+    if config_store is None:
+        config_store = create_config_store(legacy_file=CONFIG_FILE)
+    return config_store
+
+def close_config_store():
+    """Закрытие хранилища конфигураций"""
+    global config_store
+    if config_store is not None:
+        config_store.close()
+        config_store = None
+
+async def load_user_config_by_id(user_id, config_id):
+    """Загрузка одной конфигурации пользователя по идентификатору: (имя, запись) или None"""
     try:
-        if os.path.exists(CONFIG_FILE):
-            with open(CONFIG_FILE, 'r') as f:
-                return json.load(f)
-        return {}
+        return await asyncio.to_thread(get_config_store().get_config_by_id, user_id, config_id)
     except json.JSONDecodeError:
-        logger.error("Ошибка чтения configurations.json, возвращается пустой словарь")
-        return {}
+        logger.error(f"Ошибка чтения конфигурации {config_id} пользователя {user_id}")
+        return None
+
+async def save_user_config(user_id, config_name, data):
+    """Сохранение одной конфигурации пользователя"""
+    async with user_locks.hold(user_id):
+        user_configs = await asyncio.to_thread(
+            call_with_version, get_config_store().save_config, user_id, config_name, data
+        )
+    invalidate_history_keyboards(user_id)
+    notify_repo_sync()
+    return user_configs
+
+async def delete_user_config(user_id, config_name):
+    """Удаление одной конфигурации пользователя, возвращает оставшиеся"""
+    async with user_locks.hold(user_id):
+        user_configs = await asyncio.to_thread(
+            call_with_version, get_config_store().delete_config, user_id, config_name
+        )
+    invalidate_history_keyboards(user_id)
+    notify_repo_sync()
+    return user_configs
 
-def save_configs(configs):
-    """Сохранение конфигураций в JSON-файл"""
-    try:
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(configs, f, indent=4)
-    except Exception as e:
-        logger.error(f"Ошибка записи в configurations.json: {e}")
+def invalidate_history_keyboards(user_id):
+    """Сброс закэшированных страниц истории пользователя"""
+    history_keyboards.pop(str(user_id), None)
+
+async def history_keyboard(user_id, nav=""):
+    """Клавиатура страницы истории или None, если страница пуста.
 
-def update_repo():
-    """Обновление репозитория GitHub"""
+    nav - пусто для первой страницы, "o:<курсор>" для более старых записей,
+    "n:<курсор>" для более новых. Курсор - "created_at|id" крайней записи.
+    """
+    key = str(user_id)
+    pages = history_keyboards.get(key)
+    if pages is not None and nav in pages:
+        history_keyboards.move_to_end(key)
+        pages.move_to_end(nav)
+        return pages[nav]
+
+    direction, _, cursor = nav.partition(':')
+    cursor = tuple(cursor.split('|', 1)) if cursor else None
+    store = get_config_store()
     try:
-        subprocess.run(['git', 'config', '--global', 'user.email', 'bot@example.com'], check=True)
-        subprocess.run(['git', 'config', '--global', 'user.name', 'Bot'], check=True)
-        subprocess.run(['git', 'add', CONFIG_FILE], check=True)
-        subprocess.run(['git', 'commit', '-m', 'Обновлены конфигурации'], check=True)
-        subprocess.run(['git', 'push', 'origin', 'main'], check=True)
-        logger.info("Конфигурации успешно отправлены в репозиторий")
-    except subprocess.CalledProcessError as e:
-        logger.error(f"Ошибка при пушe в репозиторий: {e}")
+        items, has_more = await asyncio.to_thread(
+            store.list_page, user_id, HISTORY_PAGE_SIZE,
+            cursor if direction == "o" else None,
+            cursor if direction == "n" else None
+        )
+    except json.JSONDecodeError:
+        logger.error(f"Ошибка чтения конфигураций пользователя {user_id}")
+        return None
+    logger.debug(f"Кэш конфигураций: {store.cache_stats()}")
+    if not items:
+        return None
+
+    keyboard = [
+        [InlineKeyboardButton(f"{name} ({data['created_at']})", callback_data=f"cfg:{data['id']}")]
+        for name, data in items
+    ]
+    nav_row = []
+    if direction == "o" or (direction == "n" and has_more):
+        newest = items[0][1]
+        nav_row.append(InlineKeyboardButton("⬅ Новее", callback_data=f"hist:n:{newest['created_at']}|{newest['id']}"))
+    if direction == "n" or (direction != "n" and has_more):
+        oldest = items[-1][1]
+        nav_row.append(InlineKeyboardButton("Старее ➡", callback_data=f"hist:o:{oldest['created_at']}|{oldest['id']}"))
+    if nav_row:
+        keyboard.append(nav_row)
+    keyboard.append([InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")])
+    markup = InlineKeyboardMarkup(keyboard)
+
+    pages = history_keyboards.setdefault(key, OrderedDict())
+    pages[nav] = markup
+    history_keyboards.move_to_end(key)
+    while len(pages) > HISTORY_CACHE_PAGES:
+        pages.popitem(last=False)
+    while len(history_keyboards) > HISTORY_CACHE_USERS:
+        history_keyboards.popitem(last=False)
+    return markup
+
+async def send_history(update: Update, context: ContextTypes.DEFAULT_TYPE, user_id, nav="",
+                       text="📜 Выберите конфигурацию из списка:") -> int:
+    """Отправка страницы истории конфигураций"""
+    markup = await history_keyboard(user_id, nav)
+    if markup is None and nav:
+        # Страница опустела после удаления - показываем первую
+        markup = await history_keyboard(user_id)
+    if markup is None:
+        await send_message(
+            update, context,
+            "⏳ У вас пока нет сохранённых конфигураций. Создайте свою первую конфигурацию для расчета параметров БПЛА!",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("🛠 Создать конфигурацию", callback_data="new_config")],
+                [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")]
+            ])
+        )
+        return WELCOME_STATE
+    await send_message(update, context, text, reply_markup=markup)
+    return SHOW_HISTORY
+
+repo_sync = None
+
+def notify_repo_sync():
+    """Уведомление фоновой синхронизации о изменении конфигураций"""
+    if repo_sync is not None:
+        repo_sync.notify()
 
 async def delete_messages(context: ContextTypes.DEFAULT_TYPE, chat_id: int, keep_ids: list = None):
     """Удаление всех сообщений, кроме указанных в keep_ids"""
@@ -146,7 +357,11 @@ async def send_message(update: Update, context: ContextTypes.DEFAULT_TYPE, text:
     try:
         sent_msg = None
         if update.callback_query:
-            await update.callback_query.answer()
+            try:
+                await update.callback_query.answer()
+            except Exception as e:
+                # На запрос уже ответили (например, сообщение отправляет фоновая задача)
+                logger.debug(f"Не удалось ответить на запрос: {e}")
             message_id = update.callback_query.message.message_id
             try:
                 sent_msg = await context.bot.edit_message_text(
@@ -246,26 +461,7 @@ async def handle_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return WELCOME_STATE
 
     elif query.data == "history":
-        configs = load_configs()
-        user_configs = configs.get(str(user_id), {})
-        if not user_configs:
-            await send_message(
-                update, context,
-                "⏳ У вас пока нет сохранённых конфигураций. Создайте свою первую конфигурацию для расчета параметров БПЛА!",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🛠 Создать конфигурацию", callback_data="new_config")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")]
-                ])
-            )
-            return WELCOME_STATE
-
-        keyboard = [
-            [InlineKeyboardButton(f"{name} ({data['created_at']})", callback_data=f"config_{name}")]
-            for name, data in user_configs.items()
-        ]
-        keyboard.append([InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")])
-        await send_message(update, context, "📜 Выберите конфигурацию из списка:", reply_markup=InlineKeyboardMarkup(keyboard))
-        return SHOW_HISTORY
+        return await send_history(update, context, user_id)
 
     elif query.data == "new_config":
         keyboard = [
@@ -352,52 +548,23 @@ async def show_history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             )
             return CALCULATE
 
-        result_text = f"""
-📊 Результаты расчета:
-
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
-
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-        """
-        keyboard = [
-            [InlineKeyboardButton("📖 История", callback_data="history")],
-            [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
-            [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")]
-        ]
+        result_text = format_result(data, "📊 Результаты расчета:")
         await send_message(
             update, context,
             result_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=result_keyboard(),
             parse_mode="Markdown"
         )
         logger.info(f"Пользователь {user_id} вернулся к текущей конфигурации")
         return CALCULATE
 
-    if match := re.match(r"config_(.+)", query.data):
-        config_name = match.group(1)
-        configs = load_configs()
-        config = configs.get(str(user_id), {}).get(config_name)
-        if not config:
+    if query.data.startswith("hist:"):
+        return await send_history(update, context, user_id, nav=query.data[len("hist:"):])
+
+    action, _, config_id = query.data.partition(':')
+    if action == "cfg":
+        found = await load_user_config_by_id(user_id, config_id)
+        if not found:
             await send_message(
                 update, context,
                 "⚠️ Конфигурация не найдена. Вернитесь в главное меню.",
@@ -407,35 +574,12 @@ async def show_history(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             )
             return SHOW_HISTORY
 
-        result_text = f"""
-📊 Конфигурация: {config_name} ({config['created_at']})
-
-🔹 Взлетная масса: {config['takeoff_mass']:.2f} кг
-🔹 Тяга: {config['thrust_cruise']:.2f} кгс (крейсер), {config['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {config['power_cruise']/1000:.2f} кВт (крейсер), {config['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {config['ceiling']:.0f} м
-🔹 Плотность воздуха: {config['air_density']:.3f} кг/м³
-🔹 Размах крыла: {config['wingspan']:.2f} м
-🔹 Площадь крыла: {config['wing_area']:.2f} м²
-
-🔋 Аккумулятор {config['battery_type']}:
-- Масса: {config['battery_mass']:.2f} кг
-- Напряжение: {config['battery_voltage']} В
-- Емкость: {config['battery_capacity_ah']:.2f} А·ч (рекомендуется {config['battery_capacity_recommended']} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {config.get('distance', 0):.2f} км
-- Время: {config.get('flight_time', 0):.2f} ч
-- Скорость: {config.get('speed', 0)} км/ч
-- Маневры: {config.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {config['battery_info']}
-- Электромотор: {config['rotor_info']}
-        """
+        config_name, record = found
+        config = expand_config_record(record)
+        result_text = format_result(config, f"📊 Конфигурация: {config_name} ({config['created_at']})")
         keyboard = [
             [InlineKeyboardButton("⬅ Назад к списку", callback_data="history")],
-            [InlineKeyboardButton("🗑 Удалить", callback_data=f"delete_{config_name}")]
+            [InlineKeyboardButton("🗑 Удалить", callback_data=f"del:{config_id}")]
         ]
         await send_message(
             update, context,
@@ -459,44 +603,23 @@ async def show_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     await delete_messages(context, chat_id, keep_ids=[context.user_data.get('welcome_message_id')])
 
     if query.data == "history":
-        configs = load_configs()
-        user_configs = configs.get(str(user_id), {})
-        if not user_configs:
-            await send_message(
-                update, context,
-                "⏳ У вас пока нет сохранённых конфигураций. Создайте свою первую конфигурацию для расчета параметров БПЛА!",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🛠 Создать конфигурацию", callback_data="new_config")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")]
-                ])
-            )
-            return WELCOME_STATE
-
-        keyboard = [
-            [InlineKeyboardButton(f"{name} ({data['created_at']})", callback_data=f"config_{name}")]
-            for name, data in user_configs.items()
-        ]
-        keyboard.append([InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")])
-        await send_message(update, context, "📜 Выберите конфигурацию из списка:", reply_markup=InlineKeyboardMarkup(keyboard))
-        return SHOW_HISTORY
+        return await send_history(update, context, user_id)
 
-    if match := re.match(r"delete_(.+)", query.data):
-        config_name = match.group(1)
+    action, _, config_id = query.data.partition(':')
+    if action == "del":
         await send_message(
             update, context,
             "Вы точно хотите удалить конфигурацию?",
             reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("🗑 Удалить", callback_data=f"confirm_delete_{config_name}")],
-                [InlineKeyboardButton("🚫 Отмена", callback_data=f"config_{config_name}")]
+                [InlineKeyboardButton("🗑 Удалить", callback_data=f"cdel:{config_id}")],
+                [InlineKeyboardButton("🚫 Отмена", callback_data=f"cfg:{config_id}")]
             ])
         )
         return CONFIRM_DELETE
 
-    if match := re.match(r"config_(.+)", query.data):
-        config_name = match.group(1)
-        configs = load_configs()
-        config = configs.get(str(user_id), {}).get(config_name)
-        if not config:
+    if action == "cfg":
+        found = await load_user_config_by_id(user_id, config_id)
+        if not found:
             await send_message(
                 update, context,
                 "⚠️ Конфигурация не найдена. Вернитесь в главное меню.",
@@ -506,35 +629,12 @@ async def show_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             )
             return SHOW_HISTORY
 
-        result_text = f"""
-📊 Конфигурация: {config_name} ({config['created_at']})
-
-🔹 Взлетная масса: {config['takeoff_mass']:.2f} кг
-🔹 Тяга: {config['thrust_cruise']:.2f} кгс (крейсер), {config['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {config['power_cruise']/1000:.2f} кВт (крейсер), {config['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {config['ceiling']:.0f} м
-🔹 Плотность воздуха: {config['air_density']:.3f} кг/м³
-🔹 Размах крыла: {config['wingspan']:.2f} м
-🔹 Площадь крыла: {config['wing_area']:.2f} м²
-
-🔋 Аккумулятор {config['battery_type']}:
-- Масса: {config['battery_mass']:.2f} кг
-- Напряжение: {config['battery_voltage']} В
-- Емкость: {config['battery_capacity_ah']:.2f} А·ч (рекомендуется {config['battery_capacity_recommended']} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {config.get('distance', 0):.2f} км
-- Время: {config.get('flight_time', 0):.2f} ч
-- Скорость: {config.get('speed', 0)} км/ч
-- Маневры: {config.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {config['battery_info']}
-- Электромотор: {config['rotor_info']}
-        """
+        config_name, record = found
+        config = expand_config_record(record)
+        result_text = format_result(config, f"📊 Конфигурация: {config_name} ({config['created_at']})")
         keyboard = [
             [InlineKeyboardButton("⬅ Назад к списку", callback_data="history")],
-            [InlineKeyboardButton("🗑 Удалить", callback_data=f"delete_{config_name}")]
+            [InlineKeyboardButton("🗑 Удалить", callback_data=f"del:{config_id}")]
         ]
         await send_message(
             update, context,
@@ -557,43 +657,18 @@ async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
 
     await delete_messages(context, chat_id, keep_ids=[context.user_data.get('welcome_message_id')])
 
-    if match := re.match(r"confirm_delete_(.+)", query.data):
-        config_name = match.group(1)
-        configs = load_configs()
-        if str(user_id) in configs and config_name in configs[str(user_id)]:
-            del configs[str(user_id)][config_name]
-            if not configs[str(user_id)]:
-                del configs[str(user_id)]
-            save_configs(configs)
-            if os.getenv('RENDER'):
-                update_repo()
+    action, _, config_id = query.data.partition(':')
+    if action == "cdel":
+        found = await load_user_config_by_id(user_id, config_id)
+        if found:
+            config_name = found[0]
+            await delete_user_config(user_id, config_name)
             logger.info(f"Пользователь {user_id} удалил конфигурацию {config_name}")
-        
-        user_configs = configs.get(str(user_id), {})
-        if not user_configs:
-            await send_message(
-                update, context,
-                "⏳ У вас пока нет сохранённых конфигураций. Создайте свою первую конфигурацию для расчета параметров БПЛА!",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🛠 Создать конфигурацию", callback_data="new_config")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")]
-                ])
-            )
-            return WELCOME_STATE
+        return await send_history(update, context, user_id, text="📜 Конфигурация удалена. Выберите другую конфигурацию:")
 
-        keyboard = [
-            [InlineKeyboardButton(f"{name} ({data['created_at']})", callback_data=f"config_{name}")]
-            for name, data in user_configs.items()
-        ]
-        keyboard.append([InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")])
-        await send_message(update, context, "📜 Конфигурация удалена. Выберите другую конфигурацию:", reply_markup=InlineKeyboardMarkup(keyboard))
-        return SHOW_HISTORY
-
-    if match := re.match(r"config_(.+)", query.data):
-        config_name = match.group(1)
-        configs = load_configs()
-        config = configs.get(str(user_id), {}).get(config_name)
-        if not config:
+    if action == "cfg":
+        found = await load_user_config_by_id(user_id, config_id)
+        if not found:
             await send_message(
                 update, context,
                 "⚠️ Конфигурация не найдена. Вернитесь в главное меню.",
@@ -603,35 +678,12 @@ async def confirm_delete(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             return SHOW_HISTORY
 
-        result_text = f"""
-📊 Конфигурация: {config_name} ({config['created_at']})
-
-🔹 Взлетная масса: {config['takeoff_mass']:.2f} кг
-🔹 Тяга: {config['thrust_cruise']:.2f} кгс (крейсер), {config['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {config['power_cruise']/1000:.2f} кВт (крейсер), {config['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {config['ceiling']:.0f} м
-🔹 Плотность воздуха: {config['air_density']:.3f} кг/м³
-🔹 Размах крыла: {config['wingspan']:.2f} м
-🔹 Площадь крыла: {config['wing_area']:.2f} м²
-
-🔋 Аккумулятор {config['battery_type']}:
-- Масса: {config['battery_mass']:.2f} кг
-- Напряжение: {config['battery_voltage']} В
-- Емкость: {config['battery_capacity_ah']:.2f} А·ч (рекомендуется {config['battery_capacity_recommended']} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {config.get('distance', 0):.2f} км
-- Время: {config.get('flight_time', 0):.2f} ч
-- Скорость: {config.get('speed', 0)} км/ч
-- Маневры: {config.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {config['battery_info']}
-- Электромотор: {config['rotor_info']}
-        """
+        config_name, record = found
+        config = expand_config_record(record)
+        result_text = format_result(config, f"📊 Конфигурация: {config_name} ({config['created_at']})")
         keyboard = [
             [InlineKeyboardButton("⬅ Назад к списку", callback_data="history")],
-            [InlineKeyboardButton("🗑 Удалить", callback_data=f"delete_{config_name}")]
+            [InlineKeyboardButton("🗑 Удалить", callback_data=f"del:{config_id}")]
         ]
         await send_message(
             update, context,
@@ -1033,11 +1085,16 @@ async def input_plane_material(update: Update, context: ContextTypes.DEFAULT_TYP
 
 Винты на заказ - КПД 80%
 - Оптимизированы под вашу конструкцию
-- Дороже, но эффективнее"""
+- Дороже, но эффективнее
+
+Подбор по таблицам - КПД по характеристикам винтов
+- Винт выбирается под тягу и скорость
+- КПД разный на крейсерском режиме и на максимальной тяге"""
         
     keyboard = [
         [InlineKeyboardButton("Стандартные винты (75%)", callback_data="0.75")],
-        [InlineKeyboardButton("Винты на заказ (80%)", callback_data="0.80")]
+        [InlineKeyboardButton("Винты на заказ (80%)", callback_data="0.80")],
+        [InlineKeyboardButton("Подбор по таблицам", callback_data=PROPELLER_TABLE_CHOICE)]
     ]
     
     prompt_msg = await send_message(update, context, propeller_info, reply_markup=InlineKeyboardMarkup(keyboard))
@@ -1059,19 +1116,25 @@ async def input_propeller_type(update: Update, context: ContextTypes.DEFAULT_TYP
         context.user_data['message_ids'].append(query.message.message_id)
         logger.debug(f"Добавлен message_id {query.message.message_id} для выбора типа винта")
     
-    if query.data not in SELECTION_MAPS['propeller_eff']:
+    if query.data not in SELECTION_MAPS['propeller_eff'] and query.data != PROPELLER_TABLE_CHOICE:
         prompt_msg = await send_message(
             update, context,
             "Ошибка! Неверный выбор. Попробуйте снова:",
             reply_markup=InlineKeyboardMarkup([
                 [InlineKeyboardButton("Стандартные винты (75%)", callback_data="0.75")],
-                [InlineKeyboardButton("Винты на заказ (80%)", callback_data="0.80")]
+                [InlineKeyboardButton("Винты на заказ (80%)", callback_data="0.80")],
+                [InlineKeyboardButton("Подбор по таблицам", callback_data=PROPELLER_TABLE_CHOICE)]
             ])
         )
         logger.debug(f"Добавлен message_id {prompt_msg.message_id} для сообщения об ошибке выбора")
         return INPUT_PROPELLER_TYPE
     
-    context.user_data['propeller_eff'] = float(query.data)
+    if query.data == PROPELLER_TABLE_CHOICE:
+        context.user_data['propeller_model'] = 'table'
+        context.user_data['propeller_eff'] = PROPELLER_TABLE_FALLBACK_EFF
+    else:
+        context.user_data['propeller_model'] = 'constant'
+        context.user_data['propeller_eff'] = float(query.data)
     
     takeoff_info = """🛫 Выберите тип взлета:
     
@@ -1156,43 +1219,11 @@ async def input_ceiling(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         data = calculate_results(context)
         context.user_data['current_config'] = data
         
-        result_text = f"""
-📊 Результаты расчета:
-
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
-
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-        """
-        keyboard = [
-            [InlineKeyboardButton("📖 История", callback_data="history")],
-            [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
-            [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")]
-        ]
-        
+        result_text = format_result(data, "📊 Результаты расчета:")
         prompt_msg = await send_message(
             update, context,
             result_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=result_keyboard(),
             parse_mode="Markdown"
         )
         logger.debug(f"Добавлен message_id {prompt_msg.message_id} для отображения результатов")
@@ -1212,79 +1243,241 @@ async def input_ceiling(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         logger.debug(f"Текущее состояние message_ids после ошибки: {context.user_data['message_ids']}")
         return INPUT_CEILING
 
+def render_result_text(data):
+    """Текст результатов расчета (без заголовка)"""
+    warning = "" if data['mass_converged'] else (
+        "⚠️ Масса не замыкается: батарея и двигатель тяжелее, чем позволяет планер. "
+        "Показан расчет без учета их массы - уменьшите время полета, скорость или массу планера.\n\n"
+    )
+    return f"""{warning}🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
+🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
+🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
+🔹 Практический потолок: {data['ceiling']:.0f} м
+🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
+🔹 Размах крыла: {data['wingspan']:.2f} м
+🔹 Площадь крыла: {data['wing_area']:.2f} м²
+{format_optimal_speed(data)}
+🔋 Аккумулятор {data['battery_type']}:
+- Масса: {data['battery_mass']:.2f} кг
+- Напряжение: {data['battery_voltage']:.1f} В
+- Сборка: {data['pack_info']}
+- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
+
+✈️ Параметры полета:
+- Дальность: {data.get('distance', 0):.2f} км
+- Время: {data.get('flight_time', 0):.2f} ч
+- Скорость: {data.get('speed', 0)} км/ч
+- Маневры: {data.get('maneuver_time', 0)}% времени
+
+🦾 Комплектация:
+- АКБ: {data['battery_info']}
+- Электромотор: {data['rotor_info']} ({data['motor_mass']:.2f} кг)
+- Винт: {data['propeller_info']}
+{format_catalog_matches(data)}{format_segment_energy(data)}"""
+
+def format_optimal_speed(data):
+    """Качество по поляре и оптимальная скорость (только для модели аэродинамики "polar")"""
+    if data.get('optimal_speed') is None:
+        return ""
+    label = "наибольшей дальности" if data.get('type') == "long_range" else "наименьшей мощности"
+    stall = " - крыло увеличено, чтобы не выйти на сваливание" if data['lift_coefficient'] >= aero.CL_MAX else ""
+    return f"""🔹 Качество по поляре: {data['lift_to_drag']:.2f} (CL {data['lift_coefficient']:.2f} при нагрузке на крыло {data['wing_loading']:.0f} Н/м²{stall})
+🔹 Скорость {label}: {data['optimal_speed']:.0f} км/ч (качество {data['optimal_lift_to_drag']:.2f}, мощность {data['optimal_power_cruise']/1000:.2f} кВт)
+"""
+
+def format_catalog_matches(data):
+    """Самые легкие подходящие АКБ и моторы из каталога"""
+    try:
+        matched = matching.match(data, CATALOG_MATCHES)
+    except (ImportError, OSError, ValueError) as e:
+        logger.warning(f"Подбор из каталога недоступен: {e}")
+        return ""
+
+    def lines(rows, describe):
+        if not rows:
+            return "- нет подходящих в каталоге"
+        return "\n".join(f"- {escape_markdown(row['name'].strip())} ({describe(row)})" for row in rows)
+
+    batteries = lines(
+        matched['batteries'], lambda row: f"{row['energy']:.0f} Вт·ч, {row['voltage']} В, {row['mass']:.2f} кг"
+    )
+    motors = lines(matched['motors'], lambda row: f"{row['power']/1000:.1f} кВт, {row['voltage']} В")
+    return f"""
+🛒 Из каталога:
+АКБ:
+{batteries}
+Электромоторы:
+{motors}
+"""
+
+def format_segment_energy(data):
+    """Энергия по участкам полета (только для модели энергии по участкам)"""
+    if not data.get('segment_energy'):
+        return ""
+    lines = "\n".join(
+        f"- {mission.SEGMENT_NAMES[kind]}: {energy:.1f} Вт·ч" for kind, energy in data['segment_energy']
+    )
+    total = sum(energy for _, energy in data['segment_energy'])
+    return f"\n⚡ Энергия по участкам полета ({total:.1f} Вт·ч):\n{lines}\n"
+
+def catalog_version():
+    """Версия каталога для ключа кэша результатов (None - каталог недоступен)"""
+    try:
+        return catalog.version()
+    except (ImportError, OSError, ValueError):
+        return None
+
+# Общий кэш результатов и текста для одинаковых входных параметров;
+# текст содержит подбор из каталога, поэтому в ключ входит версия каталога
+result_cache = ResultCache(
+    lambda design_input: design.calculate(design_input).as_dict(),
+    render_result_text,
+    maxsize=int(os.getenv('RESULT_CACHE_SIZE', '4096')),
+    ttl=float(os.getenv('RESULT_CACHE_TTL', '3600')),
+    precision=int(os.getenv('RESULT_CACHE_PRECISION', '6')),
+    version=catalog_version
+)
+
+def format_result(data, title):
+    """Сообщение с результатами: заголовок и текст из кэша"""
+    _, text = result_cache.get(data)
+    return f"\n{title}\n\n{text}"
+
+def result_keyboard():
+    """Кнопки под результатами расчета"""
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("📖 История", callback_data="history")],
+        [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
+        [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
+        [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")],
+        [InlineKeyboardButton("🎲 Робастность", callback_data="robustness")],
+        [InlineKeyboardButton("📐 Чувствительность", callback_data="sensitivity")]
+    ])
+
+async def report_robustness(update: Update, context: ContextTypes.DEFAULT_TYPE, data):
+    """Фоновая оценка робастности: результат отправляется, когда расчет закончится"""
+    user_id = update.effective_user.id
+    back = InlineKeyboardMarkup([[InlineKeyboardButton("⬅ Назад", callback_data="back_to_current")]])
+    start_time = time.perf_counter()
+    try:
+        summary = await robustness.run(data)
+    except Exception as e:
+        logger.error(f"Ошибка оценки робастности для пользователя {user_id}: {e}")
+        await send_message(update, context, "⚠️ Не удалось оценить разброс результатов. Попробуйте позже.", reply_markup=back)
+        return
+    finally:
+        context.user_data.pop('robustness_running', None)
+    logger.info(f"Пользователь {user_id} запустил оценку робастности: {summary['samples']} вариантов "
+                f"за {time.perf_counter() - start_time:.2f} с")
+    await send_message(update, context, format_robustness(summary), reply_markup=back, parse_mode="Markdown")
+
+def format_robustness(summary):
+    """Текст с процентилями и гистограммой по результатам Монте-Карло"""
+    uncertainty = ", ".join(
+        f"{ROBUSTNESS_LABELS[key]} ±{sigma * 100:.0f}%" if kind == 'rel' else f"{ROBUSTNESS_LABELS[key]} ±{sigma:.2f}"
+        for key, (kind, sigma, _) in robustness.UNCERTAINTY.items()
+    )
+    infeasible_share = summary['infeasible'] / summary['samples'] * 100
+    samples = f"{summary['samples']:,}".replace(',', ' ')
+    text = f"""
+🎲 Разброс результатов ({samples} вариантов)
+
+СКО входных параметров: {uncertainty}
+Батарея - подобранная сборка АКБ, как в расчете.
+"""
+    if 'takeoff_mass' not in summary:
+        return text + "\n⚠️ Ни один вариант не замыкается по массе."
+
+    def percentiles(values):
+        return " | ".join(f"P{p}: {values[p]:.2f}" for p in robustness.PERCENTILES)
+
+    counts, edges = summary['histogram']
+    peak = max(counts) or 1
+    bars = "\n".join(
+        f"{edges[i]:7.2f}–{edges[i + 1]:<7.2f} {'█' * round(count / peak * 12):<12} {count / summary['samples'] * 100:4.1f}%"
+        for i, count in enumerate(counts)
+    )
+    text += f"""
+🔹 Взлетная масса, кг:
+{percentiles(summary['takeoff_mass'])}
+🔹 Масса батареи, кг:
+{percentiles(summary['battery_mass'])}
+
+Гистограмма взлетной массы (крайние столбцы включают хвосты):
+```
+{bars}
+```"""
+    if summary.get('nominal_inside') is False:
+        text += f"\n⚠️ Номинальная взлетная масса {summary['nominal']:.2f} кг вне диапазона P{robustness.PERCENTILES[0]}–P{robustness.PERCENTILES[-1]}"
+    if summary['infeasible']:
+        text += f"\n⚠️ Вариантов, не замыкающихся по массе: {summary['infeasible']} ({infeasible_share:.2f}%)"
+    return text
+
+def format_sensitivity(report, feasible):
+    """Ранжированный список параметров по влиянию на основные результаты"""
+    text = """
+📐 Чувствительность результатов
+
+Эластичность - на сколько % изменится результат при увеличении параметра на 1%.
+Сборка АКБ - как в расчете, число параллельных цепочек считается непрерывным.
+"""
+    if not feasible:
+        text += "\n⚠️ Вблизи этой точки масса не замыкается, оценки могут быть неточными.\n"
+    for output in sensitivity.SENSITIVITY_OUTPUTS:
+        lines = "\n".join(
+            f"{place}. {SENSITIVITY_LABELS[key]}: {value:+.2f}"
+            for place, (key, value) in enumerate(sensitivity.ranked(report, output, SENSITIVITY_TOP), start=1)
+        )
+        text += f"\n🔹 {SENSITIVITY_LABELS[output]}:\n{lines}\n"
+    return text
+
 def calculate_results(context):
-    """Расчет параметров БПЛА"""
-    data = context.user_data
-    g = 9.81  # м/с²
-    
-    # Основные параметры
-    payload = data['payload']
-    plane_mass_coeff = data['plane_mass']
-    aero_quality = data['aero_quality']
-    thrust_reserve = data['thrust_reserve']
-    maneuver_time = data['maneuver_time'] / 100
-    speed_kmh = data['speed']
-    speed_ms = speed_kmh / 3.6
-    propeller_eff = data['propeller_eff']
-    takeoff_coeff = data['takeoff_type']
-    flight_time_h = data['flight_time']
-    ceiling = data.get('ceiling', 0)  # Практический потолок, м
-    
-    # Расчет плотности воздуха
-    air_density = calculate_air_density(ceiling)
-    
-    # Расчет взлетной массы
-    takeoff_mass = payload / (1 - plane_mass_coeff)
-    
-    # Расчет подъемной силы и площади крыла
-    lift = takeoff_mass * g
-    C_L = 1.0  # Предполагаемый коэффициент подъемной силы
-    wing_area = lift / (0.5 * air_density * speed_ms**2 * C_L)
-    
-    # Удлинение крыла в зависимости от аэродинамического качества
-    aspect_ratio_map = {6: 6, 8: 7, 12: 8, 14: 9}
-    aspect_ratio = aspect_ratio_map[aero_quality]
-    
-    # Расчет размаха крыла
-    wingspan = (wing_area * aspect_ratio) ** 0.5
-    
-    # Расчет тяги
-    thrust_cruise = takeoff_mass * g / aero_quality
-    thrust_max = thrust_cruise * thrust_reserve
-    thrust_takeoff = thrust_max * takeoff_coeff
-    
-    # Расчет мощности
-    power_cruise = thrust_cruise * speed_ms / propeller_eff
-    power_max = thrust_max * speed_ms / propeller_eff
-    
-    # Расчет батареи
-    battery_capacity = data['battery_capacity']
-    battery_voltage = 48 if battery_capacity == 300 else 36
-    energy_required = power_cruise * flight_time_h * 3600 * (1 + maneuver_time * (thrust_reserve - 1))
-    battery_capacity_ah = energy_required / (battery_voltage * 3600)
-    battery_mass = energy_required / (battery_capacity * 3600)
-    
-    # Сохранение результатов
-    data.update({
-        'takeoff_mass': takeoff_mass,
-        'thrust_cruise': thrust_cruise / g,
-        'thrust_max': thrust_max / g,
-        'power_cruise': power_cruise,
-        'power_max': power_max,
-        'battery_mass': battery_mass,
-        'battery_voltage': battery_voltage,
-        'battery_capacity_ah': battery_capacity_ah,
-        'battery_capacity_recommended': battery_capacity_ah * 1.2,
-        'battery_type': "Li-ion" if flight_time_h > 1 else "LiPo",
-        'battery_info': f"{battery_capacity_ah:.2f} А·ч ({battery_voltage} В, {battery_mass:.2f} кг)",
-        'rotor_info': f"{power_max/1000:.2f} кВт, {thrust_max/g:.2f} кгс",
-        'wing_area': wing_area,
-        'wingspan': wingspan,
-        'air_density': air_density,
-        'ceiling': ceiling
-    })
+    """Расчет параметров БПЛА по данным сессии.
+
+    Возвращает новый словарь входных параметров и результатов без служебных
+    данных сессии; результаты также копируются в context.user_data для
+    последующих шагов диалога.
+    """
+    data, _ = result_cache.get(context.user_data)
+    data = dict(data)
+    context.user_data.update(data)
+    logger.debug(f"Кэш результатов: {result_cache.stats()}")
     return data
 
+def make_config_record(data):
+    """Компактная запись конфигурации для истории: только входные параметры"""
+    return {
+        'schema': CONFIG_SCHEMA_VERSION,
+        'id': new_config_id(),
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'inputs': {key: data[key] for key in DESIGN_INPUT_KEYS if key in data}
+    }
+
+def expand_config_record(record):
+    """Результаты расчета для сохраненной конфигурации (пересчет по входным параметрам)"""
+    # Записи старого формата содержат входные параметры вместе с результатами
+    inputs = record['inputs'] if record.get('schema') == CONFIG_SCHEMA_VERSION else record
+    config = dict(result_cache.get(inputs)[0])
+    config['created_at'] = record['created_at']
+    return config
+
+async def toggle_model(update: Update, context: ContextTypes.DEFAULT_TYPE, option) -> int:
+    """Переключение модели расчета option (см. MODEL_TOGGLES) и пересчет"""
+    labels, title = MODEL_TOGGLES[option]
+    default, other = labels
+    model = other if context.user_data.get(option, default) == default else default
+    context.user_data[option] = model
+    data = calculate_results(context)
+    context.user_data['current_config'] = data
+    await send_message(
+        update, context,
+        format_result(data, "📊 Результаты расчета:"),
+        reply_markup=result_keyboard(),
+        parse_mode="Markdown"
+    )
+    logger.info(f"Пользователь {update.effective_user.id} выбрал {title}: {model}")
+    return CALCULATE
+
 async def calculate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработка действий после расчета"""
     query = update.callback_query
@@ -1315,6 +1508,10 @@ async def calculate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             [InlineKeyboardButton("Крейсерская скорость", callback_data="change_speed")],
             [InlineKeyboardButton("Аэродинамическое качество", callback_data="change_aero_quality")],
             [InlineKeyboardButton("Время маневрирования", callback_data="change_maneuver_time")],
+            [InlineKeyboardButton("Нагрузка на крыло (поляра)", callback_data="change_wing_loading")],
+            *([InlineKeyboardButton(labels[context.user_data.get(option, next(iter(labels)))],
+                                    callback_data=f"toggle_{option}")]
+              for option, (labels, _) in MODEL_TOGGLES.items()),
             [InlineKeyboardButton("⬅ Назад", callback_data="back_to_current")]
         ]
         await send_message(
@@ -1324,6 +1521,9 @@ async def calculate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         )
         return CALCULATE
     
+    if query.data.startswith("toggle_") and query.data[len("toggle_"):] in MODEL_TOGGLES:
+        return await toggle_model(update, context, query.data[len("toggle_"):])
+
     if query.data == "change_flight_time":
         prompt = ("Введите новое время полета в часах (например: 2.5):" 
                   if context.user_data['type'] == "loitering" 
@@ -1343,6 +1543,15 @@ async def calculate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         )
         return CHANGE_SPEED
     
+    if query.data == "change_wing_loading":
+        await send_message(
+            update, context,
+            f"Введите нагрузку на крыло в Н/м² (например: {design.WING_LOADING:.0f}). "
+            "Используется моделью аэродинамики «поляра»:",
+            reply_markup=ReplyKeyboardRemove()
+        )
+        return CHANGE_WING_LOADING
+
     if query.data == "change_aero_quality":
         keyboard = [
             [InlineKeyboardButton("6 (Плохое)", callback_data="6")],
@@ -1379,26 +1588,33 @@ async def calculate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         return INPUT_CONFIG_NAME
     
     if query.data == "history":
-        configs = load_configs()
-        user_configs = configs.get(str(user_id), {})
-        if not user_configs:
-            await send_message(
-                update, context,
-                "⏳ У вас пока нет сохранённых конфигураций. Создайте свою первую конфигурацию для расчета параметров БПЛА!",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🛠 Создать конфигурацию", callback_data="new_config")],
-                    [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")]
-                ])
-            )
-            return WELCOME_STATE
+        return await send_history(update, context, user_id)
 
-        keyboard = [
-            [InlineKeyboardButton(f"{name} ({data['created_at']})", callback_data=f"config_{name}")]
-            for name, data in user_configs.items()
-        ]
-        keyboard.append([InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")])
-        await send_message(update, context, "📜 Выберите конфигурацию из списка:", reply_markup=InlineKeyboardMarkup(keyboard))
-        return SHOW_HISTORY
+    if query.data == "robustness":
+        data = context.user_data.get('current_config')
+        back = InlineKeyboardMarkup([[InlineKeyboardButton("⬅ Назад", callback_data="back_to_current")]])
+        if not data:
+            await send_message(update, context, "⚠️ Текущая конфигурация не найдена. Начните новый расчёт.", reply_markup=back)
+            return CALCULATE
+        if context.user_data.get('robustness_running'):
+            await update.callback_query.answer("⏳ Оценка разброса уже выполняется")
+            return CALCULATE
+        await send_message(update, context, "⏳ Оценка разброса результатов...")
+        # Оценка идет в фоновой задаче: обработчик сразу возвращается, и обновления других пользователей не ждут ее
+        context.user_data['robustness_running'] = True
+        context.application.create_task(report_robustness(update, context, data), update=update)
+        return CALCULATE
+
+    if query.data == "sensitivity":
+        data = context.user_data.get('current_config')
+        back = InlineKeyboardMarkup([[InlineKeyboardButton("⬅ Назад", callback_data="back_to_current")]])
+        if not data:
+            await send_message(update, context, "⚠️ Текущая конфигурация не найдена. Начните новый расчёт.", reply_markup=back)
+            return CALCULATE
+        report, feasible = sensitivity.elasticities(data)
+        logger.info(f"Пользователь {user_id} запросил чувствительность результатов")
+        await send_message(update, context, format_sensitivity(report, feasible), reply_markup=back)
+        return CALCULATE
 
     if query.data == "back_to_welcome":
         welcome_text = """
@@ -1436,42 +1652,11 @@ async def calculate(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
             )
             return CALCULATE
 
-        result_text = f"""
-📊 Результаты расчета:
-
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
-
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-        """
-        keyboard = [
-            [InlineKeyboardButton("📖 История", callback_data="history")],
-            [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
-            [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")]
-        ]
+        result_text = format_result(data, "📊 Результаты расчета:")
         await send_message(
             update, context,
             result_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=result_keyboard(),
             parse_mode="Markdown"
         )
         return CALCULATE
@@ -1496,42 +1681,11 @@ async def change_flight_time(update: Update, context: ContextTypes.DEFAULT_TYPE)
         data = calculate_results(context)
         context.user_data['current_config'] = data
         
-        result_text = f"""
-📊 Результаты расчета:
-
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
-
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-        """
-        keyboard = [
-            [InlineKeyboardButton("📖 История", callback_data="history")],
-            [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
-            [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")]
-        ]
+        result_text = format_result(data, "📊 Результаты расчета:")
         await send_message(
             update, context,
             result_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=result_keyboard(),
             parse_mode="Markdown"
         )
         logger.info(f"Пользователь {user_id} изменил время полета/дальность: {value}")
@@ -1568,47 +1722,51 @@ async def change_speed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
         data = calculate_results(context)
         context.user_data['current_config'] = data
         
-        result_text = f"""
-📊 Результаты расчета:
+        result_text = format_result(data, "📊 Результаты расчета:")
+        await send_message(
+            update, context,
+            result_text,
+            reply_markup=result_keyboard(),
+            parse_mode="Markdown"
+        )
+        logger.info(f"Пользователь {user_id} изменил скорость: {speed} км/ч")
+        return CALCULATE
+        
+    except ValueError:
+        prompt_msg = await send_message(
+            update, context,
+            "Ошибка! Введите положительное число:",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("🔄 Начать заново", callback_data="restart")]
+            ])
+        )
+        logger.debug(f"Добавлен message_id {prompt_msg.message_id} для сообщения об ошибке ввода")
+        return CHANGE_SPEED
 
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
+async def change_wing_loading(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Обработка изменения нагрузки на крыло"""
+    user_id = update.effective_user.id
 
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
+    try:
+        wing_loading = float(update.message.text.replace(',', '.'))
+        if wing_loading <= 0:
+            raise ValueError
 
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
+        context.user_data['wing_loading'] = wing_loading
 
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-        """
-        keyboard = [
-            [InlineKeyboardButton("📖 История", callback_data="history")],
-            [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
-            [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
-            [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")]
-        ]
+        data = calculate_results(context)
+        context.user_data['current_config'] = data
+
+        result_text = format_result(data, "📊 Результаты расчета:")
         await send_message(
             update, context,
             result_text,
-            reply_markup=InlineKeyboardMarkup(keyboard),
+            reply_markup=result_keyboard(),
             parse_mode="Markdown"
         )
-        logger.info(f"Пользователь {user_id} изменил скорость: {speed} км/ч")
+        logger.info(f"Пользователь {user_id} изменил нагрузку на крыло: {wing_loading} Н/м²")
         return CALCULATE
-        
+
     except ValueError:
         prompt_msg = await send_message(
             update, context,
@@ -1618,7 +1776,7 @@ async def change_speed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> in
             ])
         )
         logger.debug(f"Добавлен message_id {prompt_msg.message_id} для сообщения об ошибке ввода")
-        return CHANGE_SPEED
+        return CHANGE_WING_LOADING
 
 async def change_aero_quality(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Обработка изменения аэродинамического качества"""
@@ -1648,42 +1806,11 @@ async def change_aero_quality(update: Update, context: ContextTypes.DEFAULT_TYPE
     data = calculate_results(context)
     context.user_data['current_config'] = data
     
-    result_text = f"""
-📊 Результаты расчета:
-
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
-
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-    """
-    keyboard = [
-        [InlineKeyboardButton("📖 История", callback_data="history")],
-        [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
-        [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")]
-    ]
+    result_text = format_result(data, "📊 Результаты расчета:")
     await send_message(
         update, context,
         result_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=result_keyboard(),
         parse_mode="Markdown"
     )
     logger.info(f"Пользователь {user_id} изменил аэродинамическое качество: {query.data}")
@@ -1716,42 +1843,11 @@ async def change_maneuver_time(update: Update, context: ContextTypes.DEFAULT_TYP
     data = calculate_results(context)
     context.user_data['current_config'] = data
     
-    result_text = f"""
-📊 Результаты расчета:
-
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
-
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-    """
-    keyboard = [
-        [InlineKeyboardButton("📖 История", callback_data="history")],
-        [InlineKeyboardButton("💾 Сохранить конфигурацию", callback_data="save_config")],
-        [InlineKeyboardButton("🏠 Главное меню", callback_data="back_to_welcome")],
-        [InlineKeyboardButton("🔄 Изменить параметры", callback_data="change_params")]
-    ]
+    result_text = format_result(data, "📊 Результаты расчета:")
     await send_message(
         update, context,
         result_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
+        reply_markup=result_keyboard(),
         parse_mode="Markdown"
     )
     logger.info(f"Пользователь {user_id} изменил время маневрирования: {query.data}%")
@@ -1782,44 +1878,10 @@ async def save_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
         logger.debug(f"Добавлен message_id {prompt_msg.message_id} для сообщения об ошибке ввода названия")
         return INPUT_CONFIG_NAME
     
-    configs = load_configs()
-    if str(user_id) not in configs:
-        configs[str(user_id)] = {}
-    
-    data = context.user_data['current_config'].copy()
-    data['created_at'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    configs[str(user_id)][config_name] = data
-    save_configs(configs)
+    data = context.user_data['current_config']
+    await save_user_config(user_id, config_name, make_config_record(data))
     
-    if os.getenv('RENDER'):
-        update_repo()
-    
-    result_text = f"""
-📊 Конфигурация сохранена как: {config_name}
-
-🔹 Взлетная масса: {data['takeoff_mass']:.2f} кг
-🔹 Тяга: {data['thrust_cruise']:.2f} кгс (крейсер), {data['thrust_max']:.2f} кгс (макс)
-🔹 Мощность: {data['power_cruise']/1000:.2f} кВт (крейсер), {data['power_max']/1000:.2f} кВт (макс)
-🔹 Практический потолок: {data['ceiling']:.0f} м
-🔹 Плотность воздуха: {data['air_density']:.3f} кг/м³
-🔹 Размах крыла: {data['wingspan']:.2f} м
-🔹 Площадь крыла: {data['wing_area']:.2f} м²
-
-🔋 Аккумулятор {data['battery_type']}:
-- Масса: {data['battery_mass']:.2f} кг
-- Напряжение: {data['battery_voltage']} В
-- Емкость: {data['battery_capacity_ah']:.2f} А·ч (рекомендуется {data['battery_capacity_recommended']:.2f} А·ч)
-
-✈️ Параметры полета:
-- Дальность: {data.get('distance', 0):.2f} км
-- Время: {data.get('flight_time', 0):.2f} ч
-- Скорость: {data.get('speed', 0)} км/ч
-- Маневры: {data.get('maneuver_time', 0)}% времени
-
-🦾 Комплектация:
-- АКБ: {data['battery_info']}
-- Электромотор: {data['rotor_info']}
-    """
+    result_text = format_result(data, f"📊 Конфигурация сохранена как: {config_name}")
     keyboard = [
         [InlineKeyboardButton("📖 История", callback_data="history")],
         [InlineKeyboardButton("🛠 Новый расчёт", callback_data="restart")],
@@ -1834,9 +1896,181 @@ async def save_config(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     logger.info(f"Пользователь {user_id} сохранил конфигурацию: {config_name}")
     return CALCULATE
 
+def parse_sweep_args(args):
+    """Разбор аргументов /sweep: оси сетки и критерий"""
+    axes = []
+    objective, sense = 'takeoff_mass', 'min'
+    for arg in args:
+        key, sep, value = arg.partition('=')
+        key = key.strip().lower()
+        if not sep:
+            raise ValueError(f"Ожидается параметр=значение: {arg}")
+        if key in ("min", "max"):
+            if value not in SWEEP_OBJECTIVES:
+                raise ValueError(f"Неизвестный критерий: {value}")
+            objective, sense = value, key
+            continue
+        if key not in SWEEP_PARAMS:
+            raise ValueError(f"Неизвестный параметр: {key}")
+        if any(axis_key == key for axis_key, _ in axes):
+            raise ValueError(f"Параметр {key} указан дважды")
+        parts = value.replace(',', '.').split(':')
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Диапазон задается как начало:конец[:число_точек]: {arg}")
+        try:
+            start, stop = float(parts[0]), float(parts[1])
+            count = int(parts[2]) if len(parts) == 3 else 11
+        except ValueError:
+            raise ValueError(f"Некорректный диапазон: {arg}")
+        if start <= 0 or stop <= 0:
+            raise ValueError(f"Значения {key} должны быть положительными")
+        if not 2 <= count <= SWEEP_MAX_POINTS:
+            raise ValueError(f"Число точек должно быть от 2 до {SWEEP_MAX_POINTS}")
+        axes.append((key, np.linspace(start, stop, count)))
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("Укажите один или два диапазона")
+    total = int(np.prod([len(values) for _, values in axes]))
+    if total > SWEEP_MAX_TOTAL:
+        raise ValueError(f"Слишком большая сетка: {total} точек, допустимо не больше {SWEEP_MAX_TOTAL}")
+    return axes, objective, sense
+
+def run_sweep(base, axes):
+    """Пакетный расчет по сетке с теми же зависимостями и моделью (с подбором сборки АКБ), что и в диалоге"""
+    inputs = engine.grid_inputs(base, axes)
+    swept = {key for key, _ in axes}
+    # Для БВС дальнего действия дальность фиксирована, время полета зависит от скорости
+    if base['type'] == "long_range" and 'speed' in swept and 'flight_time' not in swept and base.get('distance'):
+        inputs['flight_time'] = base['distance'] / inputs['speed']
+    results = engine.calculate_batch(inputs)
+    return inputs, results
+
+def sweep_report(base, axes, objective, sense):
+    """Расчет по сетке и текст отчета: (текст, число точек)"""
+    inputs, results = run_sweep(base, axes)
+    return format_sweep(axes, inputs, results, objective, sense), results[objective].size
+
+def format_sweep(axes, inputs, results, objective, sense):
+    """Компактная таблица значений критерия и лучшая точка сетки"""
+    title = SWEEP_OBJECTIVES[objective]
+    feasible = results['mass_converged']
+    if not feasible.any():
+        return "⚠️ Ни одна точка сетки не замыкается по массе: батарея и двигатель тяжелее, чем позволяет планер. Уменьшите время полета или скорость."
+    # Невыполнимые точки не участвуют в выборе лучшей и показываются прочерком
+    values = np.where(feasible, results[objective], np.nan)
+    best = np.unravel_index(np.nanargmin(values) if sense == "min" else np.nanargmax(values), values.shape)
+    point = size_sweep_point(inputs, best)
+
+    # Выборка строк и столбцов, чтобы таблица поместилась в сообщение
+    def sample(count, limit):
+        return np.unique(np.linspace(0, count - 1, min(count, limit)).round().astype(int))
+
+    row_key, row_values = axes[0]
+    row_fmt = SWEEP_PARAMS[row_key][2]
+
+    def cell(value, width):
+        return f"{'—':>{width}}" if np.isnan(value) else f"{value:{width}.2f}"
+
+    lines = []
+    if len(axes) == 1:
+        lines.append(f"{row_key:>10} | {objective}")
+        for i in sample(len(row_values), SWEEP_TABLE_ROWS):
+            lines.append(f"{row_fmt.format(row_values[i]):>10} | {cell(values[i], 0).strip()}")
+    else:
+        col_key, col_values = axes[1]
+        col_fmt = SWEEP_PARAMS[col_key][2]
+        cols = sample(len(col_values), SWEEP_TABLE_COLS)
+        lines.append(f"{row_key[:5]}\\{col_key[:5]:<5}" + "".join(f"{col_fmt.format(col_values[j]):>9}" for j in cols))
+        for i in sample(len(row_values), SWEEP_TABLE_ROWS):
+            lines.append(f"{row_fmt.format(row_values[i]):>11}" + "".join(cell(values[i, j], 9) for j in cols))
+    table = "\n".join(lines)
+
+    best_params = "\n".join(
+        f"🔹 {SWEEP_PARAMS[key][0]}: {SWEEP_PARAMS[key][2].format(inputs[key][best])} {SWEEP_PARAMS[key][1]}"
+        for key, _ in axes
+    )
+    return f"""
+📈 {'Минимум' if sense == "min" else 'Максимум'}: {title}, сетка {' × '.join(str(len(v)) for _, v in axes)} точек
+
+```
+{table}
+```
+Лучшая точка:
+{best_params}
+🔹 Взлетная масса: {point.takeoff_mass:.2f} кг
+🔹 Масса батареи: {point.battery_mass:.2f} кг, двигателя: {point.motor_mass:.2f} кг
+🔹 Мощность: {point.power_cruise:.2f} Вт (крейсер), {point.power_max:.2f} Вт (макс)
+🔹 Площадь крыла: {point.wing_area:.2f} м², размах: {point.wingspan:.2f} м
+🔹 Сборка АКБ: {point.pack_info}
+{format_sweep_matches(results, point)}"""
+
+def size_sweep_point(inputs, best):
+    """Расчет лучшей точки сетки так же, как на экране результатов (совпадает с точкой сетки)"""
+    values = {key: value[best].item() if isinstance(value, np.ndarray) else value for key, value in inputs.items()}
+    return design.calculate(design.DesignInput.from_dict(values))
+
+def format_sweep_matches(results, point):
+    """Доля точек сетки, для которых в каталоге есть АКБ и мотор, и комплектующие лучшей точки"""
+    try:
+        matched = matching.match_batch(results, k=1)
+        best = matching.match(point.as_dict(), k=1)
+    except (ImportError, OSError, ValueError) as e:
+        logger.warning(f"Подбор из каталога недоступен: {e}")
+        return ""
+    covered = (matched['batteries'][..., 0] >= 0) & (matched['motors'][..., 0] >= 0) & results['mass_converged']
+    share = covered.sum() / results['mass_converged'].sum() * 100
+
+    def name(table):
+        return escape_markdown(best[table][0]['name'].strip()) if best[table] else "нет в каталоге"
+
+    return f"""🛒 Комплектующие из каталога есть для {share:.0f}% выполнимых точек (при напряжении сборки каждой точки)
+🔹 АКБ лучшей точки: {name('batteries')}
+🔹 Мотор лучшей точки: {name('motors')}
+"""
+
+async def sweep(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Обработка команды /sweep: расчет по сетке значений одного или двух параметров"""
+    user_id = update.effective_user.id
+    try:
+        axes, objective, sense = parse_sweep_args(context.args)
+    except ValueError as e:
+        await update.message.reply_text(f"Ошибка: {e}\n{SWEEP_USAGE}")
+        return
+
+    # Исходная точка - последний расчет пользователя
+    if 'takeoff_mass' in context.user_data:
+        base = {key: context.user_data[key] for key in DESIGN_INPUT_KEYS if key in context.user_data}
+    else:
+        base = dict(SWEEP_DEFAULTS)
+
+    # Расчет и подбор комплектующих - в отдельном потоке, чтобы не останавливать цикл событий
+    start_time = time.perf_counter()
+    text, size = await asyncio.to_thread(sweep_report, base, axes, objective, sense)
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Пользователь {user_id} выполнил /sweep по {[key for key, _ in axes]}: "
+                f"{size} точек за {elapsed * 1000:.1f} мс")
+
+    await update.message.reply_text(text, parse_mode="Markdown")
+
+async def shutdown(application: Application):
+    """Освобождение ресурсов при остановке бота"""
+    robustness.shutdown_executor()
+    if repo_sync is not None:
+        await asyncio.to_thread(repo_sync.stop)
+    close_config_store()
+
 def main():
     """Запуск бота"""
-    application = Application.builder().token(TOKEN).build()
+    global repo_sync
+    store = get_config_store()
+    if os.getenv('RENDER'):
+        repo_sync = RepoSyncWorker(store.sync_paths, interval=float(os.getenv('REPO_SYNC_INTERVAL', '60')))
+        repo_sync.start()
+    try:
+        # Каталог комплектующих собирается заранее, чтобы первый расчет не ждал чтения книги
+        catalog.get_catalog()
+    except (ImportError, OSError, ValueError) as e:
+        logger.error(f"Каталог комплектующих не загружен: {e}")
+    application = Application.builder().token(TOKEN).post_shutdown(shutdown).build()
     
     conv_handler = ConversationHandler(
         entry_points=[CommandHandler('start', start)],
@@ -1861,12 +2095,14 @@ def main():
             CHANGE_SPEED: [MessageHandler(filters.TEXT & ~filters.COMMAND, change_speed)],
             CHANGE_AERO_QUALITY: [CallbackQueryHandler(change_aero_quality)],
             CHANGE_MANEUVER_TIME: [CallbackQueryHandler(change_maneuver_time)],
+            CHANGE_WING_LOADING: [MessageHandler(filters.TEXT & ~filters.COMMAND, change_wing_loading)],
             INPUT_CONFIG_NAME: [MessageHandler(filters.TEXT & ~filters.COMMAND, save_config)]
         },
         fallbacks=[CommandHandler('start', start)]
     )
     
     application.add_handler(conv_handler)
+    application.add_handler(CommandHandler('sweep', sweep))
     application.run_polling()
 
 if __name__ == '__main__':
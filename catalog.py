@@ -0,0 +1,203 @@
+"""Каталог комплектующих из база.xlsx с кэшем столбцов на диске"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CATALOG_FILE = os.getenv('CATALOG_FILE', 'база.xlsx')
+CATALOG_CACHE = os.getenv('CATALOG_CACHE', 'catalog_cache.npz')
+# Версия формата кэша: при изменении состава столбцов кэш пересобирается
+CACHE_VERSION = 2
+
+# Таблицы каталога: {таблица: (лист книги, {столбец книги: поле})}
+SHEETS = {
+    'batteries': ("АКБ", {
+        'ID': 'id',
+        'Тип': 'airframe',
+        'Наименование': 'name',
+        'Емкость (mah)': 'capacity_mah',
+        'Вес (кг)': 'mass',
+        'Напряжение (В)': 'voltage',
+        'Ссылка': 'url'
+    }),
+    'motors': ("Электророторы", {
+        'ID': 'id',
+        'Наименование': 'name',
+        'Мощность (кВт)': 'power_kw',
+        'Напряжение (В)': 'voltage',
+        'Ссылка': 'url'
+    })
+}
+
+TEXT_FIELDS = ('airframe', 'name', 'url')
+
+# Поля с отсортированными индексами для поиска по значению
+INDEXED_FIELDS = {
+    'batteries': ('energy', 'capacity_ah', 'voltage', 'mass'),
+    'motors': ('power', 'voltage')
+}
+
+
+def derived_fields(table, columns):
+    """Расчетные поля в единицах СИ: энергия АКБ (Вт·ч), емкость (А·ч), мощность мотора (Вт)"""
+    if table == 'batteries':
+        columns['capacity_ah'] = columns['capacity_mah'] / 1000
+        columns['energy'] = columns['capacity_ah'] * columns['voltage']
+    elif table == 'motors':
+        columns['power'] = columns['power_kw'] * 1000
+    return columns
+
+
+class Catalog:
+    """Таблицы комплектующих в виде столбцов numpy с отсортированными индексами.
+
+    tables - {таблица: {поле: массив}}. Для каждого поля из INDEXED_FIELDS
+    хранится перестановка строк по возрастанию значения и сами
+    отсортированные значения, поэтому поиск - это np.searchsorted без
+    перебора строк.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+        self._orders = {}
+        self._sorted = {}
+        for table, fields in INDEXED_FIELDS.items():
+            for field in fields:
+                order = np.argsort(tables[table][field], kind='stable')
+                self._orders[table, field] = order
+                self._sorted[table, field] = tables[table][field][order]
+
+    def size(self, table):
+        return len(self.tables[table]['id'])
+
+    def row(self, table, index):
+        """Строка таблицы в виде словаря"""
+        return {field: column[index].item() for field, column in self.tables[table].items()}
+
+    def order(self, table, field):
+        """Номера строк по возрастанию field"""
+        return self._orders[table, field]
+
+    def at_least(self, table, field, value):
+        """Номера строк с field >= value по возрастанию field"""
+        start = np.searchsorted(self._sorted[table, field], value, side='left')
+        return self._orders[table, field][start:]
+
+    def smallest_at_least(self, table, field, values):
+        """Для каждого значения - строка с наименьшим field >= значения (-1, если такой нет).
+
+        values - число или массив, результат той же формы.
+        """
+        order = self._orders[table, field]
+        if len(order) == 0:
+            return np.full(np.shape(values), -1, dtype=np.int64)
+        index = np.searchsorted(self._sorted[table, field], values, side='left')
+        return np.where(index < len(order), order[np.minimum(index, len(order) - 1)], -1)
+
+
+def source_signature(path):
+    """Признак версии книги: версия формата кэша, время изменения и размер файла"""
+    stat = os.stat(path)
+    return np.array([CACHE_VERSION, stat.st_mtime_ns, stat.st_size], dtype=np.int64)
+
+
+def read_workbook(path):
+    """Таблицы каталога из книги Excel"""
+    import pandas as pd
+    tables = {}
+    for table, (sheet, names) in SHEETS.items():
+        frame = pd.read_excel(path, sheet_name=sheet, usecols=list(names)).rename(columns=names)
+        frame = frame.dropna(subset=[field for field in names.values() if field not in TEXT_FIELDS])
+        columns = {}
+        for field in names.values():
+            if field in TEXT_FIELDS:
+                columns[field] = frame[field].fillna("").astype(str).to_numpy(dtype=str)
+            elif field == 'id':
+                columns[field] = frame[field].to_numpy(dtype=np.int64)
+            else:
+                columns[field] = frame[field].to_numpy(dtype=np.float64)
+        tables[table] = derived_fields(table, columns)
+    return tables
+
+
+def write_cache(path, signature, tables):
+    """Запись столбцов в .npz (через временный файл, чтобы не оставить поврежденный кэш)"""
+    arrays = {f"{table}.{field}": column for table, columns in tables.items() for field, column in columns.items()}
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'wb') as file:
+        np.savez(file, signature=signature, **arrays)
+    os.replace(temp_path, path)
+
+
+def read_cache(path, signature=None):
+    """Столбцы из .npz или None, если кэша нет или он не соответствует книге"""
+    try:
+        with np.load(path, allow_pickle=False) as cache:
+            if signature is not None and not np.array_equal(cache['signature'], signature):
+                return None
+            if signature is None and cache['signature'][0] != CACHE_VERSION:
+                return None
+            tables = {table: {} for table in SHEETS}
+            for name in cache.files:
+                if name != 'signature':
+                    table, field = name.split('.', 1)
+                    tables[table][field] = cache[name]
+            return tables
+    except (OSError, KeyError, ValueError) as e:
+        logger.warning(f"Кэш каталога {path} не прочитан: {e}")
+        return None
+
+
+def load(path=CATALOG_FILE, cache_path=CATALOG_CACHE):
+    """Каталог из кэша, если книга не менялась, иначе из книги с пересборкой кэша"""
+    start = time.perf_counter()
+    if not os.path.exists(path):
+        tables = read_cache(cache_path) if os.path.exists(cache_path) else None
+        if tables is None:
+            raise FileNotFoundError(f"Не найден каталог комплектующих: {path}")
+        logger.warning(f"Книга {path} не найдена, каталог загружен из кэша {cache_path}")
+        return Catalog(tables), None
+
+    signature = source_signature(path)
+    tables = read_cache(cache_path, signature) if os.path.exists(cache_path) else None
+    if tables is None:
+        tables = read_workbook(path)
+        try:
+            write_cache(cache_path, signature, tables)
+        except OSError as e:
+            logger.warning(f"Не удалось записать кэш каталога {cache_path}: {e}")
+        logger.info(f"Каталог собран из {path} за {(time.perf_counter() - start) * 1000:.1f} мс")
+    else:
+        logger.info(f"Каталог загружен из кэша {cache_path} за {(time.perf_counter() - start) * 1000:.1f} мс")
+    return Catalog(tables), signature
+
+
+_catalog = None
+_signature = None
+_version = 0
+_lock = threading.Lock()
+
+
+def get_catalog():
+    """Общий каталог; перечитывается, если книга изменилась с момента загрузки"""
+    global _catalog, _signature, _version
+    with _lock:
+        if _catalog is not None:
+            try:
+                if _signature is None or np.array_equal(source_signature(CATALOG_FILE), _signature):
+                    return _catalog
+            except OSError:
+                return _catalog
+        _catalog, _signature = load()
+        _version += 1
+        return _catalog
+
+
+def version():
+    """Номер загрузки общего каталога: увеличивается при каждом перечитывании книги"""
+    get_catalog()
+    return _version
@@ -0,0 +1,278 @@
+"""Входные данные, результаты и расчет параметров БПЛА"""
+from dataclasses import dataclass, fields
+
+import aero
+import atmosphere
+import mass_closure
+import mission
+import packs
+import propellers
+
+G = 9.81  # м/с²
+C_L = 1.0  # Предполагаемый коэффициент подъемной силы
+WING_LOADING = 200.0  # Нагрузка на крыло по умолчанию для модели аэродинамики "polar", Н/м²
+
+# Запас емкости АКБ сверх расчетной (рекомендуемая емкость)
+BATTERY_RESERVE = 1.2
+
+# Удлинение крыла в зависимости от аэродинамического качества
+ASPECT_RATIO = {6: 6, 8: 7, 12: 8, 14: 9}
+
+# Входные параметры расчета, которые сохраняются в истории
+DESIGN_INPUT_KEYS = (
+    'type', 'flight_time', 'distance', 'speed', 'payload', 'aero_quality', 'thrust_reserve',
+    'maneuver_time', 'plane_mass', 'propeller_eff', 'takeoff_type', 'ceiling', 'battery_capacity',
+    'energy_model', 'propeller_model', 'aero_model', 'wing_loading'
+)
+
+# Модели расчета энергии: "lumped" - крейсерская мощность с поправкой на маневры,
+# "mission" - профиль полета по участкам (mission.py)
+ENERGY_MODELS = ('lumped', 'mission')
+
+
+@dataclass(frozen=True, slots=True)
+class DesignInput:
+    """Входные параметры расчета (неизменяемые, можно использовать как ключ кэша)"""
+    type: str
+    flight_time: float       # ч
+    speed: float             # км/ч
+    payload: float           # кг
+    aero_quality: float
+    thrust_reserve: float
+    maneuver_time: float     # % времени полета
+    plane_mass: float        # доля массы планера
+    propeller_eff: float
+    takeoff_type: float
+    battery_capacity: float  # Вт·ч/кг
+    ceiling: float = 0.0     # м
+    distance: float = None   # км, только для БВС дальнего действия
+    energy_model: str = 'lumped'
+    propeller_model: str = 'constant'  # см. propellers.PROPELLER_MODELS
+    aero_model: str = 'fixed'          # см. aero.AERO_MODELS
+    wing_loading: float = WING_LOADING  # Н/м², только для модели "polar"
+
+    @classmethod
+    def from_dict(cls, data):
+        """Входные параметры из словаря (данные сессии или запись истории)"""
+        return cls(**{name: data[name] for name in INPUT_FIELDS if name in data})
+
+    def as_dict(self):
+        """Словарь входных параметров без незаданных значений"""
+        return {name: getattr(self, name) for name in INPUT_FIELDS if getattr(self, name) is not None}
+
+    def normalized(self, precision=6):
+        """Копия с дробными значениями, округленными до precision знаков (ключ кэша)"""
+        values = (getattr(self, name) for name in INPUT_FIELDS)
+        return DesignInput(*(round(value, precision) if isinstance(value, float) else value for value in values))
+
+
+INPUT_FIELDS = tuple(field.name for field in fields(DesignInput))
+
+
+@dataclass(frozen=True, slots=True)
+class DesignResult:
+    """Результаты расчета вместе с входными параметрами"""
+    inputs: DesignInput
+    takeoff_mass: float                  # кг
+    motor_mass: float                    # кг
+    mass_converged: bool                 # False - масса не замыкается, показан расчет без батареи и двигателя
+    mass_iterations: int
+    thrust_cruise: float                 # кгс
+    thrust_max: float                    # кгс
+    power_cruise: float                  # Вт
+    power_max: float                     # Вт
+    battery_mass: float                  # кг, масса сборки, если она подобрана
+    battery_voltage: float               # В, напряжение подобранной сборки
+    battery_capacity_ah: float           # А·ч
+    battery_capacity_recommended: float  # А·ч
+    wing_area: float                     # м²
+    wingspan: float                      # м
+    air_density: float                   # кг/м³
+    segment_energy: tuple = ()           # ((участок, Вт·ч), ...) для модели "mission"
+    pack_cell: str = None                # элемент сборки АКБ, None - сборка не подобрана
+    pack_series: int = 0
+    pack_parallel: int = 0
+    pack_mass: float = None              # кг
+    pack_current: float = None           # А при максимальной мощности
+    propeller: str = None                # винт из таблиц, None - КПД задан propeller_eff
+    propeller_eta_cruise: float = None
+    propeller_eta_max: float = None
+    propeller_rpm_max: float = None      # об/мин на максимальной тяге
+    lift_to_drag: float = None           # качество на крейсерской скорости
+    lift_coefficient: float = None       # CL на крейсерской скорости
+    optimal_speed: float = None          # км/ч, только для модели "polar"
+    optimal_lift_to_drag: float = None
+    optimal_power_cruise: float = None   # Вт на оптимальной скорости
+
+    @property
+    def battery_type(self):
+        return "Li-ion" if self.inputs.flight_time > 1 else "LiPo"
+
+    @property
+    def battery_info(self):
+        return f"{self.battery_capacity_ah:.2f} А·ч ({self.battery_voltage:.1f} В, {self.battery_mass:.2f} кг)"
+
+    @property
+    def pack_info(self):
+        if not self.pack_cell:
+            return "не подобрана (нет сборки с допустимым током и числом элементов или с ней не замыкается масса)"
+        return (f"{self.pack_series}S{self.pack_parallel}P из {self.pack_cell} "
+                f"({self.pack_mass:.2f} кг, {self.pack_current:.1f} А при макс. мощности)")
+
+    @property
+    def rotor_info(self):
+        return f"{self.power_max/1000:.2f} кВт, {self.thrust_max:.2f} кгс"
+
+    @property
+    def propeller_info(self):
+        if self.inputs.propeller_model != 'table':
+            return f"КПД {self.inputs.propeller_eff:.2f}"
+        if not self.propeller:
+            return f"по таблицам не подобран, КПД {self.inputs.propeller_eff:.2f}"
+        return (f"{self.propeller}, КПД {self.propeller_eta_cruise:.2f} (крейсер) / "
+                f"{self.propeller_eta_max:.2f} (макс), до {self.propeller_rpm_max:.0f} об/мин")
+
+    def as_dict(self):
+        """Плоский словарь входных параметров и результатов для вывода пользователю"""
+        data = self.inputs.as_dict()
+        data.update({name: getattr(self, name) for name in RESULT_FIELDS})
+        data.update({
+            'battery_type': self.battery_type,
+            'battery_info': self.battery_info,
+            'pack_info': self.pack_info,
+            'propeller_info': self.propeller_info,
+            'rotor_info': self.rotor_info
+        })
+        return data
+
+
+RESULT_FIELDS = tuple(field.name for field in fields(DesignResult) if field.name != 'inputs')
+
+
+def calculate(inputs, mass_closure_enabled=True):
+    """Расчет параметров БПЛА: DesignInput -> DesignResult.
+
+    При mass_closure_enabled масса батареи и двигателя входит во взлетную
+    массу (замыкание решается итерационно), иначе взлетная масса считается
+    только по полезной нагрузке и массе планера.
+    """
+    speed_ms = inputs.speed / 3.6
+    maneuver_time = inputs.maneuver_time / 100
+
+    # Параметры атмосферы на высоте полета
+    atm = atmosphere.state(inputs.ceiling)
+
+    # Профиль полета для модели энергии по участкам
+    if inputs.energy_model not in ENERGY_MODELS:
+        raise ValueError(f"Неизвестная модель энергии: {inputs.energy_model}")
+    if inputs.propeller_model not in propellers.PROPELLER_MODELS:
+        raise ValueError(f"Неизвестная модель винта: {inputs.propeller_model}")
+    propeller = None
+    if inputs.propeller_model == 'table':
+        propeller = {'density': atm.density, 'speed_of_sound': atm.speed_of_sound}
+    # Качество: заданное (крыло рассчитано на C_L при крейсерской скорости) или по поляре
+    # при CL = W/(qS) для заданной нагрузки на крыло
+    if inputs.aero_model not in aero.AERO_MODELS:
+        raise ValueError(f"Неизвестная модель аэродинамики: {inputs.aero_model}")
+    aero_quality, drag_polar, lift_coefficient = inputs.aero_quality, None, C_L
+    if inputs.aero_model == 'polar':
+        drag_polar = aero.polar(inputs.aero_quality, ASPECT_RATIO[inputs.aero_quality])
+        lift_coefficient = float(aero.cruise_lift_coefficient(inputs.wing_loading, atm.density, speed_ms))
+        aero_quality = float(aero.lift_to_drag(lift_coefficient, *drag_polar))
+    segments = wing_loading = None
+    if inputs.energy_model == 'mission':
+        segments = mission.default_mission(
+            inputs.flight_time, inputs.speed, inputs.ceiling, inputs.maneuver_time, inputs.type
+        )
+        wing_loading = 0.5 * atm.density * speed_ms**2 * lift_coefficient
+
+    def propulsion(takeoff_mass, index=None, choice=None):
+        # Все аргументы - числа, поэтому номера вариантов index не нужны
+        return mass_closure.propulsion(
+            takeoff_mass, speed_ms, aero_quality, inputs.thrust_reserve, inputs.propeller_eff,
+            inputs.flight_time, maneuver_time, inputs.battery_capacity, segments, wing_loading,
+            propeller if choice is None else dict(propeller, propeller=choice), drag_polar
+        )
+
+    # Расчет взлетной массы
+    # Батарея - сборка из элементов с запасом емкости, ее масса входит во взлетную массу
+    battery_type = "Li-ion" if inputs.flight_time > 1 else "LiPo"
+    takeoff_mass, converged, iterations, choice, pack = mass_closure.close(
+        inputs.payload, inputs.plane_mass, propulsion, propeller is not None, mass_closure_enabled,
+        battery_type, BATTERY_RESERVE
+    )
+    takeoff_mass, converged, iterations = takeoff_mass.item(), converged.item(), iterations.item()
+    pack = {key: value.item() for key, value in pack.items()}
+    if choice is not None:
+        choice = choice.reshape(())
+
+    # Расчет подъемной силы и площади крыла
+    lift = takeoff_mass * G
+    wing_area = lift / (0.5 * atm.density * speed_ms**2 * lift_coefficient)
+
+    # Расчет размаха крыла
+    wingspan = (wing_area * ASPECT_RATIO[inputs.aero_quality]) ** 0.5
+
+    # Тяга, мощность, батарея и двигатель
+    parts = propulsion(takeoff_mass, choice=choice)
+
+    # Напряжение и масса батареи - как у сборки, если она подобрана
+    sized = pack['cell'] >= 0
+    battery_voltage = pack['voltage'] if sized else packs.FALLBACK_VOLTAGE
+    battery_mass = pack['mass'] if sized else float(parts['battery_mass'])
+    battery_capacity_ah = parts['energy_required'] / (battery_voltage * 3600)
+
+    # Оптимальная скорость для того же крыла; мощность пересчитывается при том же КПД винта
+    optimal = {}
+    if drag_polar is not None:
+        optimal_speed_ms, _, optimal_quality = aero.optimal_speed(lift, atm.density, wing_area, *drag_polar, inputs.type)
+        optimal = {
+            'optimal_speed': float(optimal_speed_ms * 3.6),
+            'optimal_lift_to_drag': float(optimal_quality),
+            'optimal_power_cruise': float(
+                parts['power_cruise'] * (optimal_speed_ms / optimal_quality) / (speed_ms / aero_quality)
+            )
+        }
+
+    return DesignResult(
+        inputs=inputs,
+        takeoff_mass=takeoff_mass,
+        motor_mass=float(parts['motor_mass']),
+        mass_converged=converged,
+        mass_iterations=iterations,
+        thrust_cruise=float(parts['thrust_cruise'] / G),
+        thrust_max=float(parts['thrust_max'] / G),
+        power_cruise=float(parts['power_cruise']),
+        power_max=float(parts['power_max']),
+        battery_mass=battery_mass,
+        battery_voltage=battery_voltage,
+        battery_capacity_ah=float(battery_capacity_ah),
+        battery_capacity_recommended=float(battery_capacity_ah * BATTERY_RESERVE),
+        wing_area=wing_area,
+        wingspan=wingspan,
+        air_density=atm.density,
+        segment_energy=tuple(
+            (seg['kind'], energy / 3600) for seg, energy in zip(segments, parts['segment_energy'].tolist())
+        ) if segments else (),
+        pack_cell=packs.CELL_TABLE['name'][pack['cell']].item() if pack['cell'] >= 0 else None,
+        pack_series=pack['series'],
+        pack_parallel=pack['parallel'],
+        pack_mass=pack['mass'] if sized else None,
+        pack_current=pack['current'] if sized else None,
+        lift_to_drag=aero_quality,
+        lift_coefficient=lift_coefficient,
+        **_propeller_fields(parts.get('propeller')),
+        **optimal
+    )
+
+
+def _propeller_fields(choice):
+    """Поля DesignResult для винта, подобранного по таблицам"""
+    if choice is None or choice['propeller'] < 0:
+        return {}
+    return {
+        'propeller': propellers.TABLES['name'][choice['propeller']].item(),
+        'propeller_eta_cruise': float(choice['eta_cruise']),
+        'propeller_eta_max': float(choice['eta_max']),
+        'propeller_rpm_max': float(choice['rpm_max'])
+    }
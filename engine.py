@@ -0,0 +1,230 @@
+"""Векторный расчет параметров БПЛА для массивов входных данных"""
+import numpy as np
+
+import aero
+import atmosphere
+import mass_closure
+import mission
+import packs
+import propellers
+from design import ASPECT_RATIO, BATTERY_RESERVE, C_L, ENERGY_MODELS, G, WING_LOADING
+
+# Удлинение крыла в зависимости от аэродинамического качества
+ASPECT_RATIO_KEYS = np.array(sorted(ASPECT_RATIO), dtype=np.float64)
+ASPECT_RATIO_VALUES = np.array([ASPECT_RATIO[key] for key in sorted(ASPECT_RATIO)], dtype=np.float64)
+
+# Входные параметры пакетного расчета (maneuver_time в процентах, как в диалоге)
+BATCH_INPUT_KEYS = (
+    'payload', 'speed', 'flight_time', 'aero_quality', 'thrust_reserve', 'maneuver_time',
+    'plane_mass', 'propeller_eff', 'takeoff_type', 'ceiling', 'battery_capacity'
+)
+
+# Необязательные параметры: модель энергии, тип БВС, модель винта, модель аэродинамики (скаляры)
+# и нагрузка на крыло для модели "polar" (число или столбец)
+BATCH_OPTION_KEYS = ('energy_model', 'type', 'propeller_model', 'aero_model', 'wing_loading')
+
+# Числовые результаты пакетного расчета
+BATCH_OUTPUT_KEYS = (
+    'takeoff_mass', 'motor_mass', 'mass_converged', 'mass_iterations', 'thrust_cruise', 'thrust_max', 'power_cruise', 'power_max',
+    'battery_mass', 'battery_voltage', 'battery_capacity_ah', 'battery_capacity_recommended',
+    'wing_area', 'wingspan', 'air_density', 'lift_to_drag', 'lift_coefficient'
+)
+
+
+def aspect_ratio(aero_quality):
+    """Удлинение крыла для массива значений аэродинамического качества"""
+    aero_quality = np.asarray(aero_quality, dtype=np.float64)
+    index = np.searchsorted(ASPECT_RATIO_KEYS, aero_quality)
+    index = np.minimum(index, len(ASPECT_RATIO_KEYS) - 1)
+    if not np.array_equal(ASPECT_RATIO_KEYS[index], aero_quality):
+        raise ValueError(f"Недопустимое аэродинамическое качество, допустимо: {ASPECT_RATIO_KEYS.astype(int).tolist()}")
+    return ASPECT_RATIO_VALUES[index]
+
+
+def calculate_batch(inputs, mass_closure_enabled=True, size_packs=True):
+    """Расчет для столбцов входных данных.
+
+    inputs - словарь {параметр: массив или число} с ключами BATCH_INPUT_KEYS,
+    числа и массивы приводятся к общей форме. Необязательный столбец
+    'aspect_ratio' заменяет выбор удлинения по качеству (нужно, когда
+    качество непрерывно, например при оценке разброса).
+    Как и в design.calculate, подбирается сборка АКБ: масса батареи - масса
+    сборки (см. mass_closure.close), и в результат добавляются
+    столбцы сборки: 'pack_cell' (номер элемента в
+    packs.CELL_TABLE, -1 - сборки нет), 'pack_series', 'pack_parallel',
+    'pack_mass', 'pack_current'. size_packs=False отключает подбор (расчет
+    примерно в 10 раз быстрее, но масса батареи - по удельной энергии, и
+    результаты расходятся с design.calculate): напряжение батареи тогда
+    берется из необязательного столбца 'battery_voltage' или равно
+    packs.FALLBACK_VOLTAGE. Необязательные столбцы 'pack_cell' и
+    'pack_series' задают сборку вместо подбора: P тогда не округляется, и
+    масса гладко зависит от входных параметров. Необязательные скаляры
+    'energy_model' и 'type' выбирают модель энергии, как в design.calculate;
+    для модели "mission" в результат добавляется 'segment_energy' (Дж) формы
+    (..., число участков). Для модели винта "table" добавляются 'propeller'
+    (номер в propellers.TABLES, -1 - КПД взят из propeller_eff),
+    'propeller_eta_cruise', 'propeller_eta_max' и 'propeller_rpm_max'. Для
+    модели аэродинамики "polar" CL в расчетной точке определяется
+    необязательным столбцом 'wing_loading' (Н/м², по умолчанию
+    design.WING_LOADING) и в результат добавляются 'optimal_speed' (км/ч),
+    'optimal_lift_to_drag' и 'optimal_power_cruise' (Вт).
+    Возвращает словарь массивов BATCH_OUTPUT_KEYS по
+    тем же формулам и с теми же значениями, что и design.calculate.
+    """
+    missing = [key for key in BATCH_INPUT_KEYS if key not in inputs]
+    if missing:
+        raise KeyError(f"Не заданы входные параметры: {', '.join(missing)}")
+    columns = np.broadcast_arrays(*(np.asarray(inputs[key], dtype=np.float64) for key in BATCH_INPUT_KEYS))
+    shape = columns[0].shape
+    # Расчет ведется на плоских массивах, чтобы замыкание по массе выбирало варианты по номерам
+    (payload, speed_kmh, flight_time_h, aero_quality, thrust_reserve, maneuver_time,
+     plane_mass_coeff, propeller_eff, takeoff_coeff, ceiling, battery_capacity) = (
+        np.ascontiguousarray(column).ravel() for column in columns
+    )
+    speed_ms = speed_kmh / 3.6
+    maneuver_time = maneuver_time / 100
+
+    # Параметры атмосферы
+    atm = atmosphere.state_array(ceiling)
+    rho = atm.density
+    ratio = _flat(inputs['aspect_ratio'], shape) if 'aspect_ratio' in inputs else aspect_ratio(aero_quality)
+
+    # Профиль полета для модели энергии по участкам
+    energy_model = inputs.get('energy_model', 'lumped')
+    if energy_model not in ENERGY_MODELS:
+        raise ValueError(f"Неизвестная модель энергии: {energy_model}")
+    propeller_model = inputs.get('propeller_model', 'constant')
+    if propeller_model not in propellers.PROPELLER_MODELS:
+        raise ValueError(f"Неизвестная модель винта: {propeller_model}")
+    propeller = {'density': rho, 'speed_of_sound': atm.speed_of_sound} if propeller_model == 'table' else None
+    # Качество по поляре в расчетной точке (CL по нагрузке на крыло) вместо заданного
+    aero_model = inputs.get('aero_model', 'fixed')
+    if aero_model not in aero.AERO_MODELS:
+        raise ValueError(f"Неизвестная модель аэродинамики: {aero_model}")
+    drag_polar, lift_coefficient = None, C_L
+    if aero_model == 'polar':
+        drag_polar = aero.polar(aero_quality, ratio)
+        lift_coefficient = aero.cruise_lift_coefficient(
+            _flat(inputs.get('wing_loading', WING_LOADING), shape), rho, speed_ms
+        )
+        aero_quality = aero.lift_to_drag(lift_coefficient, *drag_polar)
+    segments = wing_loading = None
+    if energy_model == 'mission':
+        segments = mission.default_mission(
+            flight_time_h, speed_kmh, ceiling, maneuver_time * 100, inputs.get('type', "loitering")
+        )
+        wing_loading = 0.5 * rho * speed_ms**2 * lift_coefficient
+
+    def propulsion(takeoff_mass, index=None, choice=None):
+        arguments = (speed_ms, aero_quality, thrust_reserve, propeller_eff, flight_time_h, maneuver_time,
+                     battery_capacity, segments, wing_loading, propeller, drag_polar)
+        if choice is not None:
+            arguments = arguments[:-2] + (dict(propeller, propeller=choice), drag_polar)
+        if index is not None:
+            arguments = _take(arguments, index)
+        return mass_closure.propulsion(takeoff_mass, *arguments)
+
+    # Взлетная масса; сборка подбирается или задана столбцами 'pack_cell' и 'pack_series'
+    chemistry = np.where(flight_time_h > 1, "Li-ion", "LiPo") if size_packs else None
+    fixed_pack = None
+    if 'pack_cell' in inputs:
+        fixed_pack = {key: _flat(inputs[f'pack_{key}'], shape).astype(np.int64) for key in ('cell', 'series')}
+    takeoff_mass, converged, iterations, choice, pack = mass_closure.close(
+        payload, plane_mass_coeff, propulsion, propeller is not None, mass_closure_enabled, chemistry, BATTERY_RESERVE,
+        pack=fixed_pack
+    )
+
+    # Площадь и размах крыла
+    lift = takeoff_mass * G
+    wing_area = lift / (0.5 * rho * speed_ms**2 * lift_coefficient)
+    wingspan = np.sqrt(wing_area * ratio)
+
+    # Тяга, мощность, батарея и двигатель
+    parts = propulsion(takeoff_mass, choice=choice)
+    battery_mass = parts['battery_mass']
+    if pack is not None:
+        sized = pack['cell'] >= 0
+        battery_mass = np.where(sized, pack['mass'], battery_mass)
+        battery_voltage = np.where(sized, pack['voltage'], packs.FALLBACK_VOLTAGE)
+    else:
+        battery_voltage = _flat(inputs.get('battery_voltage', packs.FALLBACK_VOLTAGE), shape)
+    battery_capacity_ah = parts['energy_required'] / (battery_voltage * 3600)
+
+    results = {
+        'takeoff_mass': takeoff_mass,
+        'motor_mass': parts['motor_mass'],
+        'mass_converged': converged,
+        'mass_iterations': iterations,
+        'thrust_cruise': parts['thrust_cruise'] / G,
+        'thrust_max': parts['thrust_max'] / G,
+        'power_cruise': parts['power_cruise'],
+        'power_max': parts['power_max'],
+        'battery_mass': battery_mass,
+        'battery_voltage': battery_voltage,
+        'battery_capacity_ah': battery_capacity_ah,
+        'battery_capacity_recommended': battery_capacity_ah * BATTERY_RESERVE,
+        'wing_area': wing_area,
+        'wingspan': wingspan,
+        'air_density': rho,
+        'lift_to_drag': np.broadcast_to(aero_quality, payload.shape),
+        'lift_coefficient': np.broadcast_to(lift_coefficient, payload.shape)
+    }
+    if segments is not None:
+        results['segment_energy'] = parts['segment_energy']
+    if drag_polar is not None:
+        optimal_speed_ms, _, optimal_quality = aero.optimal_speed(
+            lift, rho, wing_area, *drag_polar, inputs.get('type', "loitering")
+        )
+        results.update({
+            'optimal_speed': optimal_speed_ms * 3.6,
+            'optimal_lift_to_drag': optimal_quality,
+            'optimal_power_cruise': parts['power_cruise'] * (optimal_speed_ms / optimal_quality) / (speed_ms / aero_quality)
+        })
+    if propeller is not None:
+        choice = parts['propeller']
+        results.update({
+            'propeller': choice['propeller'],
+            'propeller_eta_cruise': choice['eta_cruise'],
+            'propeller_eta_max': choice['eta_max'],
+            'propeller_rpm_max': choice['rpm_max']
+        })
+    if pack is not None:
+        results.update({
+            'pack_cell': pack['cell'],
+            'pack_series': pack['series'],
+            'pack_parallel': pack['parallel'],
+            'pack_mass': pack['mass'],
+            'pack_current': pack['current']
+        })
+    return {key: value.reshape(shape + value.shape[1:]) for key, value in results.items()}
+
+
+def _flat(value, shape):
+    """Входной столбец в виде плоского массива для формы пакета shape"""
+    return np.ascontiguousarray(np.broadcast_to(np.asarray(value, dtype=np.float64), shape)).ravel()
+
+
+def _take(value, index):
+    """Аргументы расчета для вариантов index: плоские массивы выбираются по номерам, числа не меняются"""
+    if isinstance(value, dict):
+        return {key: _take(item, index) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_take(item, index) for item in value)
+    if isinstance(value, np.ndarray) and value.ndim == 1:
+        return value[index]
+    return value
+
+
+def grid_inputs(base, axes):
+    """Входные столбцы для сетки значений.
+
+    base - словарь скалярных входных параметров, axes - список пар
+    (параметр, массив значений), не более двух. Первая ось - строки сетки,
+    вторая - столбцы.
+    """
+    if not 1 <= len(axes) <= 2:
+        raise ValueError("Сетка строится по одному или двум параметрам")
+    mesh = np.meshgrid(*(np.asarray(values, dtype=np.float64) for _, values in axes), indexing='ij')
+    inputs = {key: base[key] for key in BATCH_INPUT_KEYS + BATCH_OPTION_KEYS if key in base}
+    inputs.update({key: column for (key, _), column in zip(axes, mesh)})
+    return inputs
@@ -0,0 +1,318 @@
+"""Замыкание по массе: батарея и двигатель входят во взлетную массу"""
+import numpy as np
+
+import mission
+import packs
+import propellers
+from atmosphere import G
+
+# Удельная мощность электродвигателя с регулятором, Вт/кг
+MOTOR_SPECIFIC_POWER = 4000.0
+
+MAX_ITERATIONS = 20
+TOLERANCE = 1e-10  # относительная точность взлетной массы
+# Наибольшее число повторных замыканий после смены выбранного винта
+PROPELLER_ROUNDS = 3
+
+
+def propulsion(takeoff_mass, speed_ms, aero_quality, thrust_reserve, propeller_eff,
+               flight_time_h, maneuver_time, battery_capacity, segments=None, wing_loading=None,
+               propeller=None, drag_polar=None):
+    """Тяга, мощность, энергия и массы батареи и двигателя для заданной взлетной массы.
+
+    Все аргументы - числа или массивы numpy одной формы, maneuver_time - доля
+    времени полета. Если заданы участки полета segments (см. mission.py) и
+    скоростной напор расчетной точки wing_loading, энергия считается по
+    участкам, иначе - по крейсерской мощности с поправкой на маневры.
+    Если задан propeller - словарь с плотностью 'density', скоростью звука
+    'speed_of_sound' и номерами винтов из таблиц 'propeller' (-1 - винт не
+    выбран), - КПД на крейсерском режиме и на максимальной тяге берется у
+    этого винта (propellers.operating_point), а propeller_eff остается для
+    вариантов без винта. Без 'propeller' винт выбирается заново
+    (propellers.select); так выбор делается только вне метода Ньютона, см. close().
+    drag_polar - коэффициенты поляры (CD0, k) для участков полета.
+    Возвращает словарь величин в единицах СИ (тяга в Н).
+    """
+    thrust_cruise = takeoff_mass * G / aero_quality
+    thrust_max = thrust_cruise * thrust_reserve
+    parts = {}
+    eta_cruise = eta_max = propeller_eff
+    if propeller is not None:
+        if 'propeller' in propeller:
+            choice = fixed_propeller(
+                propeller['propeller'], thrust_cruise, thrust_max, speed_ms, propeller['density'], propeller['speed_of_sound']
+            )
+        else:
+            choice = propellers.select(
+                thrust_cruise, thrust_max, speed_ms, propeller['density'], propeller['speed_of_sound']
+            )
+        found = choice['propeller'] >= 0
+        eta_cruise = np.where(found, choice['eta_cruise'], propeller_eff)
+        eta_max = np.where(found, choice['eta_max'], propeller_eff)
+        parts['propeller'] = choice
+    power_cruise = thrust_cruise * speed_ms / eta_cruise
+    power_max = thrust_max * speed_ms / eta_max
+    if segments is None:
+        energy_required = power_cruise * flight_time_h * 3600 * (1 + maneuver_time * (thrust_reserve - 1))
+    else:
+        parts['segment_energy'] = mission.segment_energy(
+            segments, takeoff_mass, wing_loading, aero_quality, thrust_reserve, eta_cruise, eta_max, drag_polar
+        )
+        energy_required = parts['segment_energy'].sum(axis=-1)
+    parts.update({
+        'thrust_cruise': thrust_cruise,
+        'thrust_max': thrust_max,
+        'power_cruise': power_cruise,
+        'power_max': power_max,
+        'energy_required': energy_required,
+        'battery_mass': energy_required / (battery_capacity * 3600),
+        'motor_mass': power_max / MOTOR_SPECIFIC_POWER
+    })
+    return parts
+
+
+def fixed_propeller(propeller, thrust_cruise, thrust_max, speed_ms, density, speed_of_sound):
+    """КПД и обороты заданных винтов (-1 - винт не выбран) в формате propellers.select.
+
+    'feasible' - винт работает и на крейсерском режиме, и на максимальной тяге.
+    """
+    propeller = np.asarray(propeller)
+    found = propeller >= 0
+    if not found.any():
+        missing = np.full(np.broadcast_shapes(found.shape, np.shape(thrust_cruise)), np.nan)
+        return {'propeller': propeller, 'eta_cruise': missing, 'eta_max': missing, 'rpm_max': missing,
+                'feasible': np.zeros(missing.shape, dtype=bool)}
+    cruise = propellers.operating_point(thrust_cruise, speed_ms, density, speed_of_sound, propeller)
+    maximum = propellers.operating_point(thrust_max, speed_ms, density, speed_of_sound, propeller)
+    return {
+        'propeller': propeller,
+        'eta_cruise': np.where(found, cruise['eta'], np.nan),
+        'eta_max': np.where(found, maximum['eta'], np.nan),
+        'rpm_max': np.where(found, maximum['rpm'], np.nan),
+        'feasible': found & cruise['feasible'] & maximum['feasible']
+    }
+
+
+def solve(payload, structure_fraction, component_mass,
+          max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE, start=None):
+    """Взлетная масса m из уравнения m = payload + structure_fraction·m + component_mass(m).
+
+    Метод Ньютона сразу для всего массива вариантов, производная
+    component_mass считается конечной разностью. Начальное приближение -
+    start или расчет без батареи и двигателя: payload / (1 - structure_fraction).
+    Вариант считается невыполнимым, если производная невязки не
+    положительна (каждый добавленный килограмм требует больше килограмма
+    батареи и двигателя) или масса перестает быть конечной и положительной.
+
+    component_mass(mass, index) считается только для вариантов, которые еще
+    не сошлись: index - их номера в плоском массиве (None - все варианты),
+    mass - массив формы (2, число вариантов) с массой и массой с приращением
+    для производной, результат той же формы.
+
+    Возвращает (масса, признак сходимости, число итераций). Для
+    несошедшихся вариантов возвращается расчет без батареи и двигателя.
+    """
+    payload, structure_fraction = np.broadcast_arrays(
+        np.asarray(payload, dtype=np.float64), np.asarray(structure_fraction, dtype=np.float64)
+    )
+    shape = payload.shape
+    payload = payload.ravel()
+    free_fraction = 1 - structure_fraction.ravel()
+    initial = payload / free_fraction
+    mass = initial.copy() if start is None else np.array(np.broadcast_to(start, shape), dtype=np.float64).ravel()
+    converged = np.zeros(mass.shape, dtype=bool)
+    iterations = np.zeros(mass.shape, dtype=np.int64)
+    index = np.flatnonzero(np.isfinite(mass) & (mass > 0))
+
+    for _ in range(max_iterations):
+        if not index.size:
+            break
+        current = mass[index]
+        h = current * 1e-6
+        # Для невыполнимых вариантов масса компонентов может быть бесконечной
+        with np.errstate(divide='ignore', invalid='ignore'):
+            extra, shifted = component_mass(np.stack([current, current + h]), None if index.size == mass.size else index)
+        free = free_fraction[index]
+        residual = current * free - payload[index] - extra
+        with np.errstate(invalid='ignore'):
+            slope = free - (shifted - extra) / h
+        feasible = slope > 0
+        step = residual / np.where(feasible, slope, 1)
+        updated = current - step
+        iterations[index] += feasible
+        feasible &= np.isfinite(updated) & (updated > 0)
+        mass[index] = np.where(feasible, updated, current)
+        done = feasible & (np.abs(step) <= tolerance * np.abs(updated))
+        converged[index[done]] = True
+        index = index[feasible & ~done]
+
+    return np.where(converged, mass, initial).reshape(shape), converged.reshape(shape), iterations.reshape(shape)
+
+
+def _subset(index, local):
+    """Номера вариантов в плоском массиве для номеров local внутри подмножества index (None - все)"""
+    if index is None:
+        return local
+    return index if local is None else index[local]
+
+
+def close(payload, structure_fraction, propulsion, table_propeller=False, enabled=True,
+          chemistry=None, reserve=1.0, max_iterations=MAX_ITERATIONS, tolerance=TOLERANCE, pack=None):
+    """Взлетная масса с винтом из таблиц и сборкой АКБ, выбранными вне метода Ньютона.
+
+    propulsion(takeoff_mass, index=None, choice=None) - словарь величин
+    propulsion() для вариантов index (номера в плоском массиве, None - все)
+    с винтами choice (плоский массив номеров для всех вариантов, -1 -
+    постоянный КПД; None - винт выбирается по propellers.select). Аргументы,
+    которые propulsion передает дальше, - числа или плоские массивы.
+
+    Выбор винта дискретный, и внутри метода Ньютона он привел бы к скачкам
+    массы двигателя и батареи. Поэтому масса сначала замыкается с
+    постоянным КПД, по ней выбирается винт, и замыкание повторяется с КПД
+    этого винта, который непрерывно зависит от тяги. Повторяется не больше
+    PROPELLER_ROUNDS раз и только для вариантов, у которых выбор изменился.
+    Если выбор так и не устоялся и последний выбранный винт не работает при
+    итоговой массе, для варианта остается постоянный КПД.
+
+    Если задана химия элементов chemistry (см. packs.configure), для
+    полученной массы подбирается сборка АКБ на энергию с запасом reserve, и
+    масса замыкается заново уже с массой этой сборки вместо батареи по
+    удельной энергии, см. close_pack(). Если вместо chemistry задана сборка
+    pack - словарь плоских массивов 'cell' и 'series', - элемент и S не
+    подбираются, а P остается непрерывным: масса тогда гладко зависит от
+    входных параметров (производные в sensitivity.py). При enabled=False
+    масса не замыкается: payload / (1 - structure_fraction).
+
+    Возвращает (масса, признак сходимости, число итераций, номера винтов или
+    None, сборка или None) - плоские массивы; сборка - словарь как у
+    packs.configure с массой и числом параллельных цепочек при итоговой массе.
+    """
+    payload, structure_fraction = (
+        value.ravel() for value in np.broadcast_arrays(
+            np.asarray(payload, dtype=np.float64), np.asarray(structure_fraction, dtype=np.float64)
+        )
+    )
+
+    def closure(battery_mass, index=None, start=None):
+        """Замыкание для вариантов index; battery_mass(parts, local) - масса батареи по величинам propulsion"""
+        selected = slice(None) if index is None else index
+        if not enabled:
+            mass = payload[selected] / (1 - structure_fraction[selected])
+            return mass, np.ones(mass.shape, dtype=bool), np.zeros(mass.shape, dtype=np.int64)
+
+        def component_mass(mass, local):
+            parts = propulsion(mass, _subset(index, local), choice)
+            return battery_mass(parts, local) + parts['motor_mass']
+
+        return solve(payload[selected], structure_fraction[selected], component_mass,
+                     max_iterations, tolerance, start)
+
+    def specific_energy(parts, local):
+        return parts['battery_mass']
+
+    def resolve(changed):
+        if changed.size:
+            changed_mass, changed_converged, changed_iterations = closure(specific_energy, changed, mass[changed])
+            mass[changed], converged[changed] = changed_mass, changed_converged
+            iterations[changed] += changed_iterations
+
+    choice = np.full(payload.shape, -1) if table_propeller else None
+    mass, converged, iterations = closure(specific_energy)
+    if table_propeller:
+        # Заново выбираются только варианты, масса которых изменилась
+        changed = None
+        for _ in range(PROPELLER_ROUNDS):
+            index = changed
+            selected = propulsion(mass if index is None else mass[index], index)['propeller']['propeller']
+            moved = selected != (choice if index is None else choice[index])
+            changed = np.flatnonzero(moved) if index is None else index[moved]
+            if not changed.size:
+                break
+            choice[changed] = selected[moved]
+            resolve(changed)
+        else:
+            # Выбор не устоялся: винт должен работать при итоговой массе, иначе остается постоянный КПД
+            works = propulsion(mass[changed], changed, choice)['propeller']['feasible']
+            rejected = changed[(choice[changed] >= 0) & ~works]
+            choice[rejected] = -1
+            resolve(rejected)
+
+    if chemistry is None and pack is None:
+        return mass, converged, iterations, choice, None
+    whole = pack is None
+    if whole:
+        parts = propulsion(mass, None, choice)
+        pack = packs.configure(parts['energy_required'] / 3600 * reserve, parts['power_max'], chemistry)
+    else:
+        pack = fixed_pack(pack['cell'], pack['series'], mass.shape)
+    if enabled:
+        close_pack(pack, closure, propulsion, choice, mass, converged, iterations, reserve, whole)
+    return mass, converged, iterations, choice, pack
+
+
+def fixed_pack(cell, series, shape):
+    """Заданная сборка в формате packs.configure; P, емкость, масса и ток определяются замыканием"""
+    cell, series = (np.broadcast_to(np.asarray(value, dtype=np.int64), shape).copy() for value in (cell, series))
+    voltage = packs.CELL_TABLE['voltage'][np.maximum(cell, 0)] * series
+    missing = np.full(shape, np.nan)
+    return {
+        'cell': cell, 'series': series, 'parallel': np.zeros(shape),
+        'voltage': np.where(cell >= 0, voltage, np.nan), 'capacity': missing.copy(),
+        'mass': missing.copy(), 'current': missing.copy()
+    }
+
+
+def close_pack(pack, closure, propulsion, choice, mass, converged, iterations, reserve, whole=True):
+    """Повторное замыкание с массой подобранной сборки АКБ (массивы mass, iterations и pack обновляются).
+
+    Элемент и S сборки остаются выбранными, а число параллельных цепочек P
+    зависит от массы. С целым P масса скачкообразна, поэтому сначала масса
+    замыкается с непрерывным P (оно непрерывно по массе); наименьшее целое
+    P, которое покрывает потребность при массе с этой же сборкой, - это P,
+    округленное вверх, и масса замыкается еще раз уже с ним. Если сборка при
+    новой массе не замыкается или выходит за ограничения packs.configure,
+    она считается не подобранной, а масса остается с батареей по удельной
+    энергии. При whole=False остается непрерывное P.
+    """
+    sized = np.flatnonzero((pack['cell'] >= 0) & converged)
+    if not sized.size:
+        return
+    cell, series = pack['cell'][sized], pack['series'][sized]
+    string_mass = series * packs.CELL_TABLE['mass'][cell]
+
+    def strings(parts, local):
+        """Непрерывное число параллельных цепочек"""
+        selected = slice(None) if local is None else local
+        return packs.parallel(parts['energy_required'] / 3600 * reserve, parts['power_max'],
+                              cell[selected], series[selected])
+
+    def continuous(parts, local):
+        return string_mass[slice(None) if local is None else local] * strings(parts, local)
+
+    continuous_mass, continuous_converged, continuous_iterations = closure(continuous, sized, mass[sized])
+    count = strings(propulsion(continuous_mass, sized, choice), None)
+    sized_mass, sized_converged, sized_iterations = continuous_mass, continuous_converged, 0
+    if whole:
+        count = np.ceil(count - 1e-9)
+
+        def integer(parts, local):
+            selected = slice(None) if local is None else local
+            return string_mass[selected] * count[selected]
+
+        sized_mass, sized_converged, sized_iterations = closure(integer, sized, continuous_mass)
+    parts = propulsion(sized_mass, sized, choice)
+    voltage = packs.CELL_TABLE['voltage'][cell] * series
+    current = parts['power_max'] / voltage
+    fits = (continuous_converged & sized_converged & (count <= packs.MAX_PARALLEL)
+            & (current <= packs.MAX_CURRENT) & (strings(parts, None) <= count + 1e-9))
+
+    accepted, rejected = sized[fits], sized[~fits]
+    mass[accepted] = sized_mass[fits]
+    iterations[sized] += continuous_iterations + sized_iterations
+    pack['parallel'][accepted] = count[fits]
+    pack['mass'][accepted] = (string_mass * count)[fits]
+    pack['capacity'][accepted] = (count * packs.CELL_TABLE['capacity'][cell])[fits]
+    pack['current'][accepted] = current[fits]
+    pack['cell'][rejected], pack['series'][rejected], pack['parallel'][rejected] = -1, 0, 0
+    for key in ('voltage', 'capacity', 'mass', 'current'):
+        pack[key][rejected] = np.nan
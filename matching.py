@@ -0,0 +1,120 @@
+"""Подбор комплектующих из каталога под результаты расчета"""
+import os
+import threading
+
+import numpy as np
+
+import catalog
+from mass_closure import MOTOR_SPECIFIC_POWER
+
+TOP_K = 3
+MAX_K = 8
+# Допустимое отклонение напряжения АКБ и мотора от расчетного напряжения
+VOLTAGE_TOLERANCE = float(os.getenv('MATCH_VOLTAGE_TOLERANCE', '0.25'))
+
+# Что подбирается: {таблица: (поле требования, масса компонента)}.
+# В каталоге нет массы моторов, она оценивается по удельной мощности, как в mass_closure.
+REQUIREMENTS = {
+    'batteries': ('energy', lambda columns: columns['mass']),
+    'motors': ('power', lambda columns: columns['power'] / MOTOR_SPECIFIC_POWER)
+}
+
+
+class TopKIndex:
+    """Многоключевой индекс таблицы каталога для поиска k самых легких компонентов.
+
+    Строки разбиты на группы по напряжению, внутри группы отсортированы по
+    полю требования. Для каждой позиции в этом порядке заранее хранятся
+    номера MAX_K самых легких строк среди всех строк с не меньшим значением
+    требования (суффиксный top-k). Запрос - np.searchsorted по группе и одна
+    выборка из таблицы, без перебора строк.
+    """
+
+    def __init__(self, voltage, requirement, mass, max_k=MAX_K):
+        self.mass = np.asarray(mass, dtype=np.float64)
+        self.max_k = max_k
+        self.voltages = np.unique(np.round(voltage, 1))
+        self.keys = []
+        self.top = []
+        for group_voltage in self.voltages:
+            rows = np.flatnonzero(np.round(voltage, 1) == group_voltage)
+            rows = rows[np.argsort(requirement[rows], kind='stable')]
+            top = np.full((len(rows) + 1, max_k), -1, dtype=np.int64)
+            for i in range(len(rows) - 1, -1, -1):
+                candidates = np.concatenate(([rows[i]], top[i + 1][top[i + 1] >= 0]))
+                candidates = candidates[np.argsort(self.mass[candidates], kind='stable')][:max_k]
+                top[i, :len(candidates)] = candidates
+            self.keys.append(requirement[rows])
+            self.top.append(top)
+
+    def query(self, required, voltage, k=TOP_K, tolerance=VOLTAGE_TOLERANCE):
+        """Номера k самых легких строк, удовлетворяющих требованию, формы (..., k).
+
+        required и voltage - числа или массивы одной формы. Подходят строки со
+        значением требования не меньше required и напряжением в пределах
+        ±tolerance от voltage. Недостающие места заполняются -1.
+        """
+        k = min(k, self.max_k)
+        required, voltage = np.broadcast_arrays(
+            np.asarray(required, dtype=np.float64), np.asarray(voltage, dtype=np.float64)
+        )
+        if len(self.voltages) == 0:
+            return np.full(required.shape + (k,), -1, dtype=np.int64)
+        # Кандидаты от каждой группы напряжения, затем общий выбор k самых легких
+        groups = []
+        for group_voltage, keys, top in zip(self.voltages, self.keys, self.top):
+            allowed = np.abs(group_voltage - voltage) <= tolerance * voltage
+            position = np.searchsorted(keys, required, side='left')
+            groups.append(np.where(allowed[..., None], top[position, :k], -1))
+        candidates = np.concatenate(groups, axis=-1)
+        masses = np.where(candidates >= 0, self.mass[candidates], np.inf)
+        order = np.argsort(masses, axis=-1, kind='stable')[..., :k]
+        return np.take_along_axis(candidates, order, axis=-1)
+
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def get_indexes():
+    """Индексы для текущего каталога (пересобираются вместе с каталогом)"""
+    current = catalog.get_catalog()
+    with _lock:
+        if _indexes.get('catalog') is not current:
+            _indexes.clear()
+            _indexes['catalog'] = current
+            for table, (field, mass) in REQUIREMENTS.items():
+                columns = current.tables[table]
+                _indexes[table] = TopKIndex(columns['voltage'], columns[field], mass(columns))
+        return current, {table: _indexes[table] for table in REQUIREMENTS}
+
+
+def requirements(results):
+    """Требования к комплектующим: энергия АКБ (Вт·ч) с рекомендуемым запасом и максимальная мощность (Вт).
+
+    results - словарь результатов design.calculate или engine.calculate_batch.
+    """
+    voltage = np.asarray(results['battery_voltage'], dtype=np.float64)
+    return {
+        'batteries': (np.asarray(results['battery_capacity_recommended']) * voltage, voltage),
+        'motors': (np.asarray(results['power_max'], dtype=np.float64), voltage)
+    }
+
+
+def match_batch(results, k=TOP_K):
+    """Номера подходящих строк каталога для массивов результатов: {таблица: массив (..., k)}"""
+    _, indexes = get_indexes()
+    return {
+        table: indexes[table].query(required, voltage, k)
+        for table, (required, voltage) in requirements(results).items()
+    }
+
+
+def match(results, k=TOP_K):
+    """Подходящие компоненты для одного расчета: {таблица: [строки каталога, от самой легкой]}"""
+    current, indexes = get_indexes()
+    matched = {}
+    for table, (required, voltage) in requirements(results).items():
+        rows = indexes[table].query(required, voltage, k)
+        matched[table] = [current.row(table, row) for row in rows.tolist() if row >= 0]
+    return matched
@@ -0,0 +1,119 @@
+"""Профиль полета из участков и энергия по каждому участку"""
+import numpy as np
+
+import atmosphere
+from atmosphere import G
+
+# Виды участков и их названия для вывода
+SEGMENT_NAMES = {
+    'takeoff': "Взлет",
+    'climb': "Набор высоты",
+    'cruise': "Крейсерский полет",
+    'loiter': "Барражирование",
+    'maneuver': "Маневрирование",
+    'descent': "Снижение"
+}
+
+# Участки с полной тягой
+FULL_THRUST_SEGMENTS = ('takeoff', 'maneuver')
+
+TAKEOFF_TIME = 1 / 60      # ч
+CLIMB_RATE = 3.0           # м/с
+MAX_CLIMB_SHARE = 0.25     # наибольшая доля времени полета на набор высоты и снижение
+
+
+def segment(kind, altitude, speed, duration=None, distance=None):
+    """Участок полета: высота в конце участка (м), скорость (км/ч), длительность (ч) или дальность (км)"""
+    if kind not in SEGMENT_NAMES:
+        raise ValueError(f"Неизвестный участок полета: {kind}")
+    if (duration is None) == (distance is None):
+        raise ValueError("Для участка задается либо длительность, либо дальность")
+    if duration is None:
+        duration = np.asarray(distance, dtype=np.float64) / np.asarray(speed, dtype=np.float64)
+    return {'kind': kind, 'altitude': altitude, 'speed': speed, 'duration': duration}
+
+
+def default_mission(flight_time, speed, ceiling, maneuver_time, mission_type="loitering"):
+    """Типовой профиль по входным параметрам расчета.
+
+    Взлет, набор высоты до ceiling, основной участок (барражирование или
+    крейсерский полет), маневрирование с долей maneuver_time (в процентах) от
+    основного времени и снижение. Сумма длительностей равна flight_time.
+    Аргументы - числа или массивы одной формы.
+    """
+    flight_time = np.asarray(flight_time, dtype=np.float64)
+    takeoff = np.minimum(TAKEOFF_TIME, 0.1 * flight_time)
+    climb = np.minimum(np.asarray(ceiling, dtype=np.float64) / CLIMB_RATE / 3600, MAX_CLIMB_SHARE * flight_time / 2)
+    main = flight_time - takeoff - 2 * climb
+    maneuver = main * np.asarray(maneuver_time, dtype=np.float64) / 100
+    return [
+        segment('takeoff', 0.0, speed, duration=takeoff),
+        segment('climb', ceiling, speed, duration=climb),
+        segment('loiter' if mission_type == "loitering" else 'cruise', ceiling, speed, duration=main - maneuver),
+        segment('maneuver', ceiling, speed, duration=maneuver),
+        segment('descent', 0.0, speed, duration=climb)
+    ]
+
+
+def segment_power(segments, takeoff_mass, wing_loading, aero_quality, thrust_reserve, propeller_eff,
+                  propeller_eff_max=None, drag_polar=None):
+    """Потребная мощность (Вт) на каждом участке, массив формы (..., число участков).
+
+    Поляра параболическая: CD = CD0 + k·CL². Если коэффициенты drag_polar =
+    (CD0, k) не заданы, при CL = 1 (расчетная точка) качество максимально и
+    равно aero_quality, поэтому CD0 = k = 1/(2K).
+    wing_loading - нагрузка на крыло mg/S, Н/м² (скоростной напор расчетной точки при CL = 1).
+    Высота участка - высота в его конце; плотность берется на середине
+    перепада высот. propeller_eff_max - КПД винта на участках с полной
+    тягой, если он отличается от крейсерского.
+    """
+    if propeller_eff_max is None:
+        propeller_eff_max = propeller_eff
+    if drag_polar is None:
+        drag_polar = (1 / (2 * aero_quality), 1 / (2 * aero_quality))
+    cd0, k = drag_polar
+    shape = _batch_shape(
+        segments, takeoff_mass, wing_loading, aero_quality, thrust_reserve, propeller_eff, propeller_eff_max
+    )
+    weight = takeoff_mass * G
+    thrust_max = weight / aero_quality * thrust_reserve
+    powers = []
+    previous_altitude = 0.0
+    for seg in segments:
+        altitude = np.asarray(seg['altitude'], dtype=np.float64)
+        speed_ms = np.asarray(seg['speed'], dtype=np.float64) / 3.6
+        duration_s = np.asarray(seg['duration'], dtype=np.float64) * 3600
+        if seg['kind'] in FULL_THRUST_SEGMENTS:
+            power = thrust_max * speed_ms / propeller_eff_max
+        else:
+            rho = atmosphere.state_array((altitude + previous_altitude) / 2).density
+            q = 0.5 * rho * speed_ms**2
+            drag = weight * (cd0 * q / wing_loading + k * wing_loading / q)
+            # Вертикальная скорость: набор высоты добавляет мощность, снижение - уменьшает (без рекуперации)
+            has_time = duration_s > 0
+            climb_rate = np.where(has_time, (altitude - previous_altitude) / np.where(has_time, duration_s, 1), 0)
+            power = np.maximum(drag * speed_ms + weight * climb_rate, 0) / propeller_eff
+        powers.append(np.broadcast_to(power, shape))
+        previous_altitude = altitude
+    return np.stack(powers, axis=-1)
+
+
+def segment_energy(segments, takeoff_mass, wing_loading, aero_quality, thrust_reserve, propeller_eff,
+                   propeller_eff_max=None, drag_polar=None):
+    """Энергия (Дж) на каждом участке, массив формы (..., число участков)"""
+    power = segment_power(
+        segments, takeoff_mass, wing_loading, aero_quality, thrust_reserve, propeller_eff, propeller_eff_max,
+        drag_polar
+    )
+    durations = np.stack(
+        [np.broadcast_to(np.asarray(seg['duration'], dtype=np.float64) * 3600, power.shape[:-1]) for seg in segments],
+        axis=-1
+    )
+    return power * durations
+
+
+def _batch_shape(segments, *arrays):
+    """Общая форма пакета для параметров участков и аппарата"""
+    shapes = [np.shape(array) for array in arrays]
+    shapes += [np.shape(seg[key]) for seg in segments for key in ('altitude', 'speed', 'duration')]
+    return np.broadcast_shapes(*shapes)
@@ -0,0 +1,140 @@
+"""Подбор сборки АКБ из элементов: число последовательных (S) и параллельных (P) элементов"""
+import os
+
+import numpy as np
+
+# Элементы: (название, химия, номинальное напряжение В, емкость А·ч, масса кг, максимальный ток разряда А)
+CELLS = (
+    ("Molicel P45B 21700", "Li-ion", 3.6, 4.5, 0.070, 45.0),
+    ("Molicel P42A 21700", "Li-ion", 3.6, 4.2, 0.070, 45.0),
+    ("Samsung 50S 21700", "Li-ion", 3.6, 5.0, 0.069, 25.0),
+    ("Samsung 40T 21700", "Li-ion", 3.6, 4.0, 0.067, 35.0),
+    ("LG M50LT 21700", "Li-ion", 3.63, 4.85, 0.068, 14.6),
+    ("Sony VTC6 18650", "Li-ion", 3.6, 3.0, 0.047, 30.0),
+    ("Panasonic NCR18650GA", "Li-ion", 3.6, 3.45, 0.048, 10.0),
+    ("LiPo 2200 мА·ч 30C", "LiPo", 3.7, 2.2, 0.060, 66.0),
+    ("LiPo 5000 мА·ч 25C", "LiPo", 3.7, 5.0, 0.133, 125.0),
+    ("LiPo 10000 мА·ч 25C", "LiPo", 3.7, 10.0, 0.240, 250.0),
+    ("LiPo 16000 мА·ч 15C", "LiPo", 3.7, 16.0, 0.350, 240.0),
+    ("LiPo 22000 мА·ч 25C", "LiPo", 3.7, 22.0, 0.470, 550.0)
+)
+
+# Допустимые числа последовательных элементов: классы напряжения АКБ и моторов каталога
+# (4S-6S - малые аппараты, 12S и 14S - 44-52 В), без напряжений, под которые нет комплектующих
+SERIES = tuple(int(value) for value in os.getenv('PACK_SERIES', '4,5,6,12,14').split(','))
+MAX_PARALLEL = int(os.getenv('PACK_MAX_PARALLEL', '64'))
+# Наибольший ток сборки (ограничение проводки и регулятора), А
+MAX_CURRENT = float(os.getenv('PACK_MAX_CURRENT', '200'))
+# Предпочтительный ток: из равных по массе сборок выбирается с током ближе к нему, А
+PREFERRED_CURRENT = float(os.getenv('PACK_PREFERRED_CURRENT', '20'))
+# Напряжение, если ни одна сборка не проходит по ограничениям (12S), В
+FALLBACK_VOLTAGE = 44.4
+# Сборки легче самой легкой не больше чем на эту долю (округление P до целого) считаются
+# равными по массе, и из них выбирается сборка с током ближе к предпочтительному
+MASS_TOLERANCE = float(os.getenv('PACK_MASS_TOLERANCE', '0.05'))
+# Порция вариантов при переборе сборок
+CHUNK_SIZE = 65536
+
+
+def cell_table(cells=CELLS):
+    """Таблица элементов в виде столбцов numpy"""
+    names, chemistry, voltage, capacity, mass, max_current = zip(*cells)
+    return {
+        'name': np.array(names, dtype=str),
+        'chemistry': np.array(chemistry, dtype=str),
+        'voltage': np.array(voltage, dtype=np.float64),
+        'capacity': np.array(capacity, dtype=np.float64),
+        'mass': np.array(mass, dtype=np.float64),
+        'max_current': np.array(max_current, dtype=np.float64)
+    }
+
+
+CELL_TABLE = cell_table()
+
+
+def parallel(energy, power, cell, series, cells=CELL_TABLE):
+    """Нужное число параллельных цепочек (не округленное) сборки cell×series.
+
+    Цепочек должно хватать и на энергию energy (Вт·ч), и на ток разряда при
+    мощности power (Вт). Аргументы - числа или массивы одной формы.
+    """
+    voltage = cells['voltage'][cell] * series
+    return np.maximum(np.maximum(energy / (voltage * cells['capacity'][cell]),
+                                 power / voltage / cells['max_current'][cell]), 1)
+
+
+def configure(energy, power, chemistry=None, cells=CELL_TABLE,
+              series=SERIES, max_parallel=MAX_PARALLEL, max_current=MAX_CURRENT):
+    """Самые легкие сборки S×P, запасающие energy (Вт·ч) и отдающие power (Вт).
+
+    energy, power и chemistry (химия элементов или None - любые) - числа
+    или массивы одной формы. S берется из series. Перебор векторный сразу
+    по всем элементам и всем S; для каждой пары (элемент, S) берется наименьшее P, при котором
+    хватает и энергии, и тока разряда, поэтому перебирать P не нужно: результат
+    совпадает с полным перебором S×P. Варианты обрабатываются порциями по
+    CHUNK_SIZE, чтобы промежуточные массивы (вариант, элемент, S) оставались
+    небольшими.
+    Из сборок, которые тяжелее самой легкой не больше чем на
+    MASS_TOLERANCE, выбирается та, у которой ток при power ближе
+    (в логарифмическом масштабе) к PREFERRED_CURRENT.
+
+    Возвращает словарь массивов формы аргументов: 'cell' (номер элемента,
+    -1 - сборки нет), 'series', 'parallel', 'voltage', 'capacity' (А·ч),
+    'mass' (кг), 'current' (ток при power, А).
+    """
+    energy, power = np.broadcast_arrays(np.asarray(energy, dtype=np.float64), np.asarray(power, dtype=np.float64))
+    shape = energy.shape
+    energy, power = energy.ravel(), power.ravel()
+    if chemistry is not None:
+        chemistry = np.broadcast_to(np.asarray(chemistry, dtype=str), shape).ravel()
+    chosen = {
+        'cell': np.full(energy.size, -1, dtype=np.int64),
+        'series': np.zeros(energy.size, dtype=np.int64),
+        'parallel': np.zeros(energy.size, dtype=np.int64)
+    }
+    for start in range(0, energy.size, CHUNK_SIZE):
+        part = slice(start, start + CHUNK_SIZE)
+        cell, chosen_series, count = _lightest(
+            energy[part], power[part], None if chemistry is None else chemistry[part],
+            cells, series, max_parallel, max_current
+        )
+        chosen['cell'][part], chosen['series'][part], chosen['parallel'][part] = cell, chosen_series, count
+
+    found = chosen['cell'] >= 0
+    cell = np.where(found, chosen['cell'], 0)
+    voltage = cells['voltage'][cell] * chosen['series']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        result = {
+            'cell': chosen['cell'],
+            'series': chosen['series'],
+            'parallel': chosen['parallel'],
+            'voltage': np.where(found, voltage, np.nan),
+            'capacity': np.where(found, chosen['parallel'] * cells['capacity'][cell], np.nan),
+            'mass': np.where(found, chosen['series'] * chosen['parallel'] * cells['mass'][cell], np.nan),
+            'current': np.where(found, power / voltage, np.nan)
+        }
+    return {key: value.reshape(shape) for key, value in result.items()}
+
+
+def _lightest(energy, power, chemistry, cells, series, max_parallel, max_current):
+    """Самая легкая сборка для порции плоских массивов: (элемент, S, P), элемент -1 - сборки нет"""
+    series = np.asarray(series, dtype=np.float64)
+    # Оси: (вариант, элемент, S)
+    voltage = cells['voltage'][:, None] * series
+    current = power[:, None, None] / voltage
+    count = np.ceil(parallel(energy[:, None, None], power[:, None, None],
+                             np.arange(len(cells['voltage']))[:, None], series) - 1e-9)
+    feasible = (count <= max_parallel) & (current <= max_current)
+    if chemistry is not None:
+        feasible &= (cells['chemistry'] == chemistry[:, None])[..., None]
+    # Масса округляется, чтобы равные по массе сборки из разных элементов не различались ошибкой округления
+    mass = np.where(feasible, np.round(series * count * cells['mass'][:, None], 9), np.inf).reshape(len(energy), -1)
+    # Из самых легких (с допуском) - с током ближе к предпочтительному, без полной сортировки
+    deviation = np.abs(np.log(current / PREFERRED_CURRENT)).reshape(len(energy), -1)
+    lightest = mass <= mass.min(axis=1, keepdims=True) * (1 + MASS_TOLERANCE)
+    best = np.argmin(np.where(lightest, deviation, np.inf), axis=1)
+    rows = np.arange(len(energy))
+    found = np.isfinite(mass[rows, best])
+    cell, series_index = np.divmod(best, len(series))
+    return (np.where(found, cell, -1), np.where(found, series[series_index], 0).astype(np.int64),
+            np.where(found, count.reshape(len(energy), -1)[rows, best], 0).astype(np.int64))
@@ -0,0 +1,188 @@
+"""Характеристики воздушных винтов по таблицам CT(J) и КПД(J)"""
+import os
+
+import numpy as np
+
+# Винты: (название, диаметр м, относительная поступь J, коэффициент тяги CT, КПД).
+# Характерные таблицы серийных электрических винтов (дюймы: диаметр x шаг);
+# точки J - кратные шагу сетки J_STEP, последняя точка - нулевая тяга.
+PROPELLERS = (
+    ("10x7", 0.254,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8),
+     (0.1165, 0.1113, 0.1019, 0.0897, 0.0752, 0.0588, 0.0407, 0.021, 0.0),
+     (0.0, 0.246, 0.459, 0.63, 0.75, 0.802, 0.757, 0.547, 0.0)),
+    ("13x8", 0.330,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.71),
+     (0.1127, 0.1067, 0.0958, 0.0816, 0.0649, 0.0459, 0.0249, 0.0),
+     (0.0, 0.262, 0.484, 0.652, 0.751, 0.752, 0.589, 0.0)),
+    ("15x10", 0.381,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.76),
+     (0.115, 0.1095, 0.0996, 0.0867, 0.0714, 0.054, 0.0349, 0.014, 0.0),
+     (0.0, 0.254, 0.473, 0.645, 0.76, 0.796, 0.714, 0.415, 0.0)),
+    ("17x12", 0.432,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.81),
+     (0.1168, 0.1117, 0.1023, 0.0902, 0.0759, 0.0596, 0.0417, 0.0221, 0.0),
+     (0.0, 0.249, 0.465, 0.64, 0.762, 0.818, 0.778, 0.576, 0.0)),
+    ("20x13", 0.508,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.75),
+     (0.1142, 0.1086, 0.0984, 0.0851, 0.0693, 0.0515, 0.0318, 0.0103, 0.0),
+     (0.0, 0.26, 0.483, 0.657, 0.768, 0.795, 0.689, 0.329, 0.0)),
+    ("22x10", 0.559,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.54),
+     (0.1055, 0.097, 0.0814, 0.0613, 0.0375, 0.0105, 0.0),
+     (0.0, 0.299, 0.528, 0.66, 0.641, 0.303, 0.0)),
+    ("24x16", 0.610,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.76),
+     (0.115, 0.1095, 0.0996, 0.0867, 0.0714, 0.054, 0.0349, 0.014, 0.0),
+     (0.0, 0.26, 0.484, 0.66, 0.776, 0.814, 0.73, 0.424, 0.0)),
+    ("27x13", 0.686,
+     (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.57),
+     (0.1067, 0.0987, 0.0842, 0.0654, 0.0432, 0.0179, 0.0),
+     (0.0, 0.297, 0.531, 0.676, 0.691, 0.459, 0.0))
+)
+
+# Модели КПД винта: "constant" - заданный propeller_eff, "table" - подбор винта по таблицам
+PROPELLER_MODELS = ('constant', 'table')
+
+J_STEP = 0.01
+# Наибольшее число Маха конца лопасти
+MAX_TIP_MACH = float(os.getenv('PROPELLER_MAX_TIP_MACH', '0.8'))
+
+# Граница значений -ln(CT/J²) для точек вне рабочей части таблицы
+_BOUND = 50.0
+# Наибольший шаг равномерной сетки ключей в таблице быстрого поиска
+LOOKUP_STEP = 0.005
+
+
+def build_tables(propellers=PROPELLERS):
+    """Таблицы винтов на общей сетке J в непрерывных массивах (винт, точка J).
+
+    Кроме CT и КПД хранится ключ -ln(CT/J²): при заданных тяге, скорости и
+    диаметре CT/J² = T/(ρV²D²) известно, а вдоль таблицы ключ возрастает.
+    Поиск отрезка таблицы - не бинарный: для равномерной сетки ключей
+    заранее записан номер отрезка, а шаг сетки меньше наименьшего шага
+    ключей, так что в ячейку попадает не больше одной границы и поиск
+    сводится к выборке и одному сравнению. Для отрезка, который
+    заканчивается в точке i, посчитаны коэффициенты линейных CT(J) и
+    КПД(J); все массивы плоские, номер отрезка общий для всех винтов.
+    """
+    names, diameters, j_tables, ct_tables, eta_tables = zip(*propellers)
+    j_max = max(max(j) for j in j_tables)
+    grid = np.round(np.arange(0.0, j_max + J_STEP / 2, J_STEP), 10)
+    ct = np.array([np.interp(grid, j, c, right=0.0) for j, c in zip(j_tables, ct_tables)])
+    eta = np.array([np.interp(grid, j, e, right=0.0) for j, e in zip(j_tables, eta_tables)])
+    count, points = ct.shape
+
+    valid = (ct > 0) & (grid > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        key = np.where(valid, -np.log(ct / grid**2), 0.0)
+    # Нулевая поступь - левее рабочей части, нулевая тяга - правее
+    key = np.where(valid, key, np.where(grid == 0, -_BOUND, _BOUND))
+
+    def segments(values):
+        """Наклон и свободный член линейной функции J на отрезке, оканчивающемся в каждой точке"""
+        slope = np.zeros_like(values)
+        slope[:, 1:] = np.diff(values, axis=1) / J_STEP
+        return slope.ravel(), (values - slope * grid).ravel()
+
+    segment_valid = np.zeros_like(valid)
+    segment_valid[:, 1:] = valid[:, 1:] & valid[:, :-1]
+    ct_slope, ct_intercept = segments(ct)
+    eta_slope, eta_intercept = segments(eta)
+    # Недопустимые отрезки помечены нулевыми коэффициентами CT: решение J = 0
+    ct_slope = np.where(segment_valid.ravel(), ct_slope, 0.0)
+    ct_intercept = np.where(segment_valid.ravel(), ct_intercept, 0.0)
+
+    # Таблица быстрого поиска по равномерной сетке ключей
+    low, high = key[valid].min(), key[valid].max()
+    step = min(LOOKUP_STEP, np.diff(key, axis=1)[segment_valid[:, 1:]].min() / 2)
+    edges = low + np.arange(int(np.ceil((high - low) / step)) + 1) * step
+    lookup = np.stack([np.searchsorted(row, edges, side='right') for row in key])
+    lookup += np.arange(count)[:, None] * points
+    return {
+        'name': np.array(names, dtype=str),
+        'diameter': np.array(diameters, dtype=np.float64),
+        'j': grid,
+        'ct': ct,
+        'eta': eta,
+        'key': np.ascontiguousarray(key.ravel()),
+        'key_range': (low, high),
+        'lookup': np.ascontiguousarray(lookup.ravel()),
+        'lookup_step': step,
+        'ct_slope': np.ascontiguousarray(ct_slope),
+        'ct_intercept': np.ascontiguousarray(ct_intercept),
+        'eta_slope': np.ascontiguousarray(eta_slope),
+        'eta_intercept': np.ascontiguousarray(eta_intercept)
+    }
+
+
+TABLES = build_tables()
+
+
+def operating_point(thrust, speed_ms, density, speed_of_sound, propeller=None, tables=TABLES):
+    """Рабочая точка каждого винта при тяге thrust (Н) и скорости speed_ms.
+
+    Аргументы - числа или массивы одной формы. Возвращает словарь массивов
+    формы (..., число винтов): 'j', 'eta', 'rpm' и 'feasible' (тяга
+    достижима в пределах таблицы и число Маха конца лопасти не больше
+    MAX_TIP_MACH). Если задан propeller - номер винта для каждого варианта
+    (массив той же формы), считается только этот винт и массивы имеют
+    форму аргументов.
+    """
+    thrust, speed_ms, density, speed_of_sound = np.broadcast_arrays(*(
+        np.asarray(value, dtype=np.float64) for value in (thrust, speed_ms, density, speed_of_sound)
+    ))
+    count = len(tables['diameter'])
+    number = np.arange(count) if propeller is None else np.maximum(np.asarray(propeller), 0)[..., None]
+    diameter = tables['diameter'][number]
+    low, high = tables['key_range']
+    cells = len(tables['lookup']) // count
+    # Требуемое CT/J² = T/(ρV²D²) для каждого винта, в виде ключа поиска
+    with np.errstate(divide='ignore', invalid='ignore'):
+        loading = (thrust / (density * speed_ms**2))[..., None]
+        query = 2 * np.log(diameter) - np.log(loading)
+    inside = (query >= low) & (query <= high)
+    cell = np.clip((np.where(inside, query, low) - low) / tables['lookup_step'], 0, cells - 1).astype(np.int64)
+    segment = tables['lookup'][cell + number * cells]
+    segment += tables['key'][segment] <= query
+
+    # На найденном отрезке CT = b + s·J линейна, и b + s·J = target·J² решается точно
+    target = loading / diameter**2
+    ct_slope = tables['ct_slope'][segment]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        j = (ct_slope + np.sqrt(np.maximum(ct_slope**2 + 4 * target * tables['ct_intercept'][segment], 0))) / (2 * target)
+    eta = tables['eta_intercept'][segment] + tables['eta_slope'][segment] * j
+    feasible = inside & (j > 0)
+
+    # Ограничение по числу Маха конца лопасти: (πV/J)² + V² <= (M·a)², то есть J >= π / sqrt((M·a/V)² - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        j_min = np.pi / np.sqrt(np.maximum((MAX_TIP_MACH * speed_of_sound / speed_ms)**2 - 1, 0))
+        rpm = speed_ms[..., None] / j / diameter * 60
+    feasible &= j >= j_min[..., None]
+    point = {'j': j, 'eta': eta, 'rpm': rpm, 'feasible': feasible}
+    if propeller is not None:
+        point = {key: value[..., 0] for key, value in point.items()}
+    return point
+
+
+def select(thrust_cruise, thrust_max, speed_ms, density, speed_of_sound, tables=TABLES):
+    """Винт с наибольшим КПД на крейсерском режиме, работающий и на максимальной тяге.
+
+    Возвращает словарь массивов: 'propeller' (номер винта, -1 - ни один не
+    подходит), 'eta_cruise', 'eta_max', 'rpm_max'.
+    """
+    cruise = operating_point(thrust_cruise, speed_ms, density, speed_of_sound, tables=tables)
+    maximum = operating_point(thrust_max, speed_ms, density, speed_of_sound, tables=tables)
+    feasible = cruise['feasible'] & maximum['feasible']
+    best = np.argmax(np.where(feasible, cruise['eta'], -1.0), axis=-1)[..., None]
+    found = np.take_along_axis(feasible, best, axis=-1)[..., 0]
+
+    def pick(values):
+        return np.where(found, np.take_along_axis(values, best, axis=-1)[..., 0], np.nan)
+
+    return {
+        'propeller': np.where(found, best[..., 0], -1),
+        'eta_cruise': pick(cruise['eta']),
+        'eta_max': pick(maximum['eta']),
+        'rpm_max': pick(maximum['rpm'])
+    }
@@ -0,0 +1,110 @@
+"""Фоновая синхронизация сохранённых конфигураций с репозиторием GitHub"""
+import logging
+import subprocess
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class RepoSyncWorker:
+    """Поток, который объединяет серии сохранений в один коммит и пуш.
+
+    Обработчики только вызывают notify() и сразу продолжают работу. Поток
+    ждет первое уведомление, затем еще interval секунд собирает остальные
+    и отправляет все изменения одним коммитом. Неудачный пуш повторяется
+    с экспоненциальной задержкой, накопленные сохранения при этом не теряются.
+    """
+
+    def __init__(self, paths_provider, interval=60, max_backoff=900, branch='main'):
+        self.paths_provider = paths_provider
+        self.interval = interval
+        self.max_backoff = max_backoff
+        self.branch = branch
+        self._pending = 0
+        self._stopping = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='repo-sync', daemon=True)
+        # Метрики
+        self.pushes = 0
+        self.failures = 0
+        self.saves_per_push = deque(maxlen=100)
+
+    def start(self):
+        self._thread.start()
+        logger.info(f"Запущена фоновая синхронизация с репозиторием (интервал {self.interval} с)")
+
+    def notify(self):
+        """Сообщить о сохранении или удалении конфигурации"""
+        with self._cond:
+            self._pending += 1
+            self._cond.notify()
+
+    def stop(self, timeout=30):
+        """Остановка потока с отправкой накопленных изменений"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+
+    def metrics(self):
+        """Число пушей, ошибок и сохранений, покрытых каждым пушем"""
+        with self._cond:
+            covered = list(self.saves_per_push)
+            return {
+                'pushes': self.pushes,
+                'failures': self.failures,
+                'pending': self._pending,
+                'last_saves_per_push': covered[-1] if covered else 0,
+                'avg_saves_per_push': sum(covered) / len(covered) if covered else 0.0
+            }
+
+    def _wait(self, seconds):
+        """Пауза, прерываемая остановкой"""
+        with self._cond:
+            self._cond.wait_for(lambda: self._stopping, timeout=seconds)
+
+    def _run(self):
+        backoff = self.interval
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._stopping)
+                if self._stopping and not self._pending:
+                    return
+            # Собираем серию сохранений в течение интервала
+            self._wait(self.interval)
+            with self._cond:
+                batch, self._pending = self._pending, 0
+                stopping = self._stopping
+            try:
+                self._push()
+            except (subprocess.SubprocessError, OSError) as e:
+                with self._cond:
+                    self._pending += batch
+                    self.failures += 1
+                logger.error(f"Ошибка при пушe в репозиторий: {e}, повтор через {backoff} с")
+                if stopping:
+                    return
+                self._wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+                continue
+            backoff = self.interval
+            with self._cond:
+                self.pushes += 1
+                self.saves_per_push.append(batch)
+            logger.info(f"Конфигурации успешно отправлены в репозиторий ({batch} сохранений за пуш)")
+            if stopping:
+                return
+
+    def _push(self):
+        """Коммит и пуш файлов хранилища"""
+        paths = self.paths_provider()
+        if not paths:
+            return
+        subprocess.run(['git', 'config', '--global', 'user.email', 'bot@example.com'], check=True)
+        subprocess.run(['git', 'config', '--global', 'user.name', 'Bot'], check=True)
+        subprocess.run(['git', 'add', '-A', *paths], check=True)
+        # Нечего коммитить - например, сохранение и удаление взаимно компенсировались
+        if subprocess.run(['git', 'diff', '--cached', '--quiet']).returncode != 0:
+            subprocess.run(['git', 'commit', '-m', 'Обновлены конфигурации'], check=True)
+        subprocess.run(['git', 'push', 'origin', self.branch], check=True, timeout=120)
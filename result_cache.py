@@ -0,0 +1,87 @@
+"""Общий кэш результатов расчета и готового текста для одинаковых входных данных"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from design import DesignInput
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """LRU-кэш с ограничением времени жизни записей.
+
+    Ключ - входные параметры расчета с дробными значениями, округленными до
+    precision знаков. Значение - пара (словарь результатов, текст
+    результатов): повторный расчет и форматирование для одинаковых
+    конфигураций пропускаются. Кэш общий для всех пользователей и потоков.
+
+    Если текст зависит от внешних данных (например, подбор из каталога
+    комплектующих), version() возвращает их текущую версию; она входит в
+    ключ, и после смены версии текст формируется заново.
+    """
+
+    def __init__(self, compute, render, maxsize=4096, ttl=3600, precision=6, version=None):
+        self.compute = compute
+        self.render = render
+        self.version = version
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.precision = precision
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Метрики
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def key(self, data):
+        """Нормализованный ключ для словаря входных параметров"""
+        return DesignInput.from_dict(data).normalized(self.precision)
+
+    def get(self, data):
+        """Результаты и текст для входных параметров (расчет при промахе)"""
+        design_input = self.key(data)
+        key = design_input if self.version is None else (design_input, self.version())
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+                self.expired += 1
+            self.misses += 1
+
+        # Расчет вне блокировки: совпадающие промахи из разных потоков дадут одинаковый результат
+        result = self.compute(design_input)
+        value = (result, self.render(result))
+        with self._lock:
+            self._entries[key] = (now + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Число попаданий, промахов и доля попаданий"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / requests if requests else 0.0
+            }
@@ -0,0 +1,126 @@
+"""Оценка разброса результатов методом Монте-Карло на пуле процессов"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import engine
+
+logger = logging.getLogger(__name__)
+
+# Неопределенность входных параметров: (вид отклонения, СКО, допустимый диапазон).
+# "rel" - относительное отклонение от номинала, "abs" - абсолютное.
+UNCERTAINTY = {
+    'aero_quality': ('rel', 0.08, (2.0, 30.0)),
+    'propeller_eff': ('abs', 0.04, (0.3, 0.95)),
+    'battery_capacity': ('rel', 0.07, (50.0, 500.0)),  # удельная энергия батареи, Вт·ч/кг
+    'plane_mass': ('abs', 0.03, (0.1, 0.9))
+}
+
+PERCENTILES = (5, 25, 50, 75, 95)
+HISTOGRAM_BINS = 10
+CHUNK_SIZE = 125000
+DEFAULT_SAMPLES = int(os.getenv('ROBUSTNESS_SAMPLES', '1000000'))
+WORKERS = int(os.getenv('ROBUSTNESS_WORKERS', '0')) or os.cpu_count() or 1
+
+_executor = None
+
+
+def get_executor():
+    """Пул процессов (создается при первом обращении).
+
+    Процессы запускаются через spawn: бот многопоточный, и fork копировал бы
+    захваченные другими потоками блокировки.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        logger.info(f"Запущен пул процессов для оценки робастности ({WORKERS} процессов)")
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def sample_inputs(base, count, rng):
+    """Столбцы входных данных: номинал с отклонениями по UNCERTAINTY"""
+    inputs = {key: base[key] for key in engine.BATCH_INPUT_KEYS + engine.BATCH_OPTION_KEYS if key in base}
+    for key, (kind, sigma, (low, high)) in UNCERTAINTY.items():
+        noise = rng.standard_normal(count) * sigma
+        values = base[key] * (1 + noise) if kind == 'rel' else base[key] + noise
+        inputs[key] = np.clip(values, low, high)
+    # Геометрия крыла выбрана по номинальному качеству, разбрасывается только само качество
+    inputs['aspect_ratio'] = float(engine.aspect_ratio(base['aero_quality']))
+    return inputs
+
+
+def nominal_mass(base):
+    """Взлетная масса номинального варианта по той же модели, что и выборка (None - не замыкается)"""
+    results = engine.calculate_batch({key: base[key] for key in engine.BATCH_INPUT_KEYS + engine.BATCH_OPTION_KEYS if key in base})
+    return results['takeoff_mass'].item() if results['mass_converged'] else None
+
+
+def evaluate_chunk(base, count, seed):
+    """Расчет одной порции выборки (выполняется в процессе пула).
+
+    Модель та же, что и в design.calculate: масса замыкается с подобранной сборкой АКБ.
+    """
+    rng = np.random.default_rng(seed)
+    results = engine.calculate_batch(sample_inputs(base, count, rng))
+    converged = results['mass_converged']
+    return (
+        results['takeoff_mass'][converged].astype(np.float32),
+        results['battery_mass'][converged].astype(np.float32),
+        int(count - converged.sum())
+    )
+
+
+def summarize(takeoff_mass, battery_mass, infeasible, nominal=None):
+    """Процентили и гистограмма взлетной массы.
+
+    nominal - взлетная масса номинального варианта; 'nominal_inside' -
+    лежит ли она между крайними процентилями выборки.
+    """
+    total = takeoff_mass.size + infeasible
+    summary = {'samples': total, 'infeasible': infeasible, 'nominal': nominal}
+    if takeoff_mass.size == 0:
+        return summary
+    summary['takeoff_mass'] = dict(zip(PERCENTILES, np.percentile(takeoff_mass, PERCENTILES).tolist()))
+    if nominal is not None:
+        summary['nominal_inside'] = summary['takeoff_mass'][PERCENTILES[0]] <= nominal <= summary['takeoff_mass'][PERCENTILES[-1]]
+    summary['battery_mass'] = dict(zip(PERCENTILES, np.percentile(battery_mass, PERCENTILES).tolist()))
+    # Гистограмма по центральным 98%, чтобы редкие выбросы не сжимали остальные столбцы
+    low, high = np.percentile(takeoff_mass, (1, 99))
+    counts, edges = np.histogram(np.clip(takeoff_mass, low, high), bins=HISTOGRAM_BINS, range=(low, high or low + 1))
+    summary['histogram'] = (counts.tolist(), edges.tolist())
+    return summary
+
+
+async def run(base, samples=DEFAULT_SAMPLES, seed=None):
+    """Монте-Карло для входных параметров base без блокировки цикла событий"""
+    executor = get_executor()
+    loop = asyncio.get_running_loop()
+    counts = [CHUNK_SIZE] * (samples // CHUNK_SIZE)
+    if samples % CHUNK_SIZE:
+        counts.append(samples % CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    base = {key: base[key] for key in engine.BATCH_INPUT_KEYS + engine.BATCH_OPTION_KEYS if key in base}
+    parts = await asyncio.gather(
+        loop.run_in_executor(executor, nominal_mass, base),
+        *(loop.run_in_executor(executor, evaluate_chunk, base, count, chunk_seed)
+          for count, chunk_seed in zip(counts, seeds))
+    )
+    nominal, parts = parts[0], parts[1:]
+    return summarize(
+        np.concatenate([part[0] for part in parts]),
+        np.concatenate([part[1] for part in parts]),
+        sum(part[2] for part in parts),
+        nominal
+    )
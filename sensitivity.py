@@ -0,0 +1,68 @@
+"""Чувствительность результатов расчета к входным параметрам"""
+import numpy as np
+
+import engine
+import packs
+
+# Входные параметры, по которым считается чувствительность
+SENSITIVITY_INPUTS = (
+    'payload', 'speed', 'flight_time', 'aero_quality', 'thrust_reserve', 'maneuver_time',
+    'plane_mass', 'propeller_eff', 'battery_capacity', 'ceiling'
+)
+SENSITIVITY_OUTPUTS = ('takeoff_mass', 'power_cruise', 'battery_mass', 'wingspan')
+
+RELATIVE_STEP = 1e-4
+# Шаг для параметров, номинал которых может быть нулевым
+ABSOLUTE_STEP = {'ceiling': 1.0, 'maneuver_time': 0.01}
+
+
+def elasticities(data):
+    """Эластичности выходов по входам: (dy/y) / (dx/x) в номинальной точке.
+
+    Все производные считаются центральными разностями за один пакетный
+    расчет на 2N+1 точках по той же модели, что и design.calculate: масса
+    замыкается со сборкой АКБ номинального расчета (тот же элемент и S), но
+    P не округляется - у ступенчатой массы сборки производные были бы
+    нулевыми или бесконечными. Если сборка не подобрана, батарея, как и в
+    расчете, - по удельной энергии. Для БВС дальнего действия вместо времени полета
+    варьируется дальность, а время полета пересчитывается по скорости, как
+    в диалоге. Возвращает ({выход: {вход: эластичность}}, признак того, что
+    все точки замыкаются по массе).
+    """
+    long_range = data.get('type') == "long_range" and data.get('distance')
+    keys = [('distance' if key == 'flight_time' and long_range else key) for key in SENSITIVITY_INPUTS]
+    base = {key: float(data[key]) for key in engine.BATCH_INPUT_KEYS}
+    if long_range:
+        base['distance'] = float(data['distance'])
+
+    count = 2 * len(keys) + 1
+    columns = {key: np.full(count, value) for key, value in base.items()}
+    steps = np.empty(len(keys))
+    for i, key in enumerate(keys):
+        steps[i] = max(abs(base[key]) * RELATIVE_STEP, ABSOLUTE_STEP.get(key, 0.0))
+        columns[key][2 * i + 1] += steps[i]
+        columns[key][2 * i + 2] -= steps[i]
+    if long_range:
+        columns['flight_time'] = columns.pop('distance') / columns['speed']
+    # Удлинение остается номинальным: качество варьируется непрерывно
+    columns['aspect_ratio'] = float(engine.aspect_ratio(base['aero_quality']))
+    columns.update({key: data[key] for key in engine.BATCH_OPTION_KEYS if key in data})
+    if data.get('pack_cell'):
+        columns['pack_cell'] = int(np.flatnonzero(packs.CELL_TABLE['name'] == data['pack_cell'])[0])
+        columns['pack_series'] = data['pack_series']
+
+    results = engine.calculate_batch(columns, size_packs=False)
+    nominal = np.array([base[key] for key in keys])
+    report = {}
+    for output in SENSITIVITY_OUTPUTS:
+        values = results[output]
+        derivatives = (values[1::2] - values[2::2]) / (2 * steps)
+        report[output] = dict(zip(keys, (derivatives * nominal / values[0]).tolist()))
+    return report, bool(results['mass_converged'].all())
+
+
+def ranked(report, output, limit=None, threshold=0.005):
+    """Входы, отсортированные по модулю эластичности выхода output"""
+    items = sorted(report[output].items(), key=lambda item: abs(item[1]), reverse=True)
+    items = [(key, value) for key, value in items if abs(value) >= threshold]
+    return items[:limit] if limit else items
@@ -0,0 +1,1048 @@
+"""Хранилище сохранённых конфигураций БПЛА"""
+import asyncio
+import json
+import logging
+import os
+import re
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from pymongo import ASCENDING, DESCENDING, MongoClient, ReplaceOne, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+# Версия формата каталога с шардами (2 - шард хранит версию документа пользователя)
+STORE_FORMAT_VERSION = 2
+
+# Максимальное число шардов, удерживаемых в памяти
+CACHE_MAX_ENTRIES = 10000
+
+_USER_ID_RE = re.compile(r"^-?\d+$")
+
+
+class ConfigError(Exception):
+    """Ошибка хранилища конфигураций"""
+
+
+class ConfigVersionConflict(ConfigError):
+    """Документ пользователя изменился после чтения (оптимистическая блокировка)"""
+
+
+def read_legacy_configs(path):
+    """Чтение общего configurations.json в формате {user_id: {name: config}}.
+
+    Пользователи с нечисловым user_id или конфигурациями не в виде объекта
+    пропускаются с ошибкой в логе, чтобы одна испорченная запись не
+    останавливала миграцию и запуск бота.
+    """
+    with open(path, 'r') as f:
+        configs = json.load(f)
+    if not isinstance(configs, dict):
+        raise ConfigError(f"Неожиданный формат {path}: ожидается объект")
+    valid = {}
+    for user_id, user_configs in configs.items():
+        if not _USER_ID_RE.match(user_id):
+            logger.error(f"Пропущен пользователь с некорректным user_id {user_id!r} в {path}")
+        elif not isinstance(user_configs, dict) or not all(isinstance(data, dict) for data in user_configs.values()):
+            logger.error(f"Пропущены конфигурации пользователя {user_id} в {path}: неожиданный формат")
+        else:
+            valid[user_id] = user_configs
+    return valid
+
+
+def write_json_atomic(path, data, indent=None):
+    """Атомарная запись JSON: временный файл, fsync и переименование"""
+    # Сериализация до открытия файла, чтобы ошибка не оставила его обрезанным
+    text = json.dumps(data, indent=indent)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def new_config_id():
+    """Короткий идентификатор конфигурации (8 символов, пригоден для callback_data)"""
+    return secrets.token_urlsafe(6)
+
+
+def page_key(data):
+    """Ключ сортировки истории: время создания и идентификатор"""
+    return data.get('created_at', ''), data.get('id', '')
+
+
+def page_order(user_configs):
+    """Пары (ключ сортировки истории, имя) по возрастанию ключа - индекс для list_page"""
+    return sorted((page_key(data), name) for name, data in user_configs.items())
+
+
+def ensure_config_ids(user_configs):
+    """Копия {имя: конфигурация}, где конфигурациям без идентификатора присвоен новый (исходные не меняются)"""
+    return {
+        name: data if data.get('id') else dict(data, id=new_config_id())
+        for name, data in user_configs.items()
+    }
+
+
+class ConfigStore:
+    """Базовый интерфейс хранилища конфигураций.
+
+    Конфигурации каждого пользователя образуют один документ со счетчиком
+    версии, который увеличивается при каждом изменении. Методы изменения
+    принимают expected_version и выбрасывают ConfigVersionConflict, если
+    документ успел измениться (например, другой репликой бота).
+    """
+
+    def __init__(self):
+        self._user_locks = weakref.WeakValueDictionary()
+        self._user_locks_guard = threading.Lock()
+
+    def _user_lock(self, user_id):
+        """Блокировка потоков для пользователя; разные пользователи не конкурируют.
+
+        Блокировка живет, пока на нее есть ссылки (пока ее удерживают или
+        ждут), после этого удаляется из словаря, так что он не растет с
+        числом пользователей.
+        """
+        with self._user_locks_guard:
+            lock = self._user_locks.get(str(user_id))
+            if lock is None:
+                lock = self._user_locks[str(user_id)] = threading.RLock()
+            return lock
+
+    @staticmethod
+    def _check_version(user_id, version, expected_version):
+        if expected_version is not None and version != expected_version:
+            raise ConfigVersionConflict(
+                f"Конфигурации пользователя {user_id} изменены: версия {version}, ожидалась {expected_version}"
+            )
+
+    def load_user_versioned(self, user_id):
+        """Конфигурации пользователя и версия его документа"""
+        raise NotImplementedError
+
+    def save_user(self, user_id, user_configs, expected_version=None):
+        """Замена документа пользователя целиком; возвращает новую версию"""
+        raise NotImplementedError
+
+    def user_ids(self):
+        raise NotImplementedError
+
+    def load_user(self, user_id):
+        """Загрузка всех конфигураций пользователя"""
+        return self.load_user_versioned(user_id)[0]
+
+    def get_version(self, user_id):
+        """Текущая версия документа пользователя (0 - документа нет)"""
+        return self.load_user_versioned(user_id)[1]
+
+    def get_config(self, user_id, name):
+        """Одна конфигурация пользователя или None"""
+        return self.load_user(user_id).get(name)
+
+    def get_config_by_id(self, user_id, config_id):
+        """Пара (имя, конфигурация) по идентификатору или None"""
+        for name, data in self.load_user(user_id).items():
+            if data.get('id') == config_id:
+                return name, data
+        return None
+
+    def list_page(self, user_id, limit, older_than=None, newer_than=None):
+        """Страница истории, от новых к старым.
+
+        older_than / newer_than - курсор (created_at, id) соседней страницы.
+        Возвращает список пар (имя, конфигурация) и признак того, что в
+        направлении листания есть еще записи.
+        """
+        user_configs = self.load_user(user_id)
+        return self._page(page_order(user_configs), user_configs, limit, older_than, newer_than)
+
+    @staticmethod
+    def _page(order, user_configs, limit, older_than=None, newer_than=None):
+        """Страница истории по индексу page_order(): границы ищутся бинарным поиском"""
+        if newer_than is not None:
+            start = bisect_right(order, tuple(newer_than), key=lambda entry: entry[0])
+            end = min(start + limit, len(order))
+            more = len(order) - start > limit
+        else:
+            end = len(order)
+            if older_than is not None:
+                end = bisect_left(order, tuple(older_than), key=lambda entry: entry[0])
+            start = max(end - limit, 0)
+            more = end > limit
+        return [(name, user_configs[name]) for _, name in reversed(order[start:end])], more
+
+    def save_config(self, user_id, name, data, expected_version=None):
+        """Сохранение одной конфигурации пользователя"""
+        with self._user_lock(user_id):
+            user_configs, version = self.load_user_versioned(user_id)
+            self._check_version(user_id, version, expected_version)
+            user_configs[name] = data
+            self.save_user(user_id, user_configs, expected_version=version)
+            return user_configs
+
+    def delete_config(self, user_id, name, expected_version=None):
+        """Удаление одной конфигурации; возвращает оставшиеся конфигурации пользователя"""
+        with self._user_lock(user_id):
+            user_configs, version = self.load_user_versioned(user_id)
+            self._check_version(user_id, version, expected_version)
+            if name in user_configs:
+                del user_configs[name]
+                self.save_user(user_id, user_configs, expected_version=version)
+            return user_configs
+
+    def load_all(self):
+        """Загрузка конфигураций всех пользователей (для экспорта и миграций)"""
+        configs = {user_id: self.load_user(user_id) for user_id in self.user_ids()}
+        return {user_id: user_configs for user_id, user_configs in configs.items() if user_configs}
+
+    def save_all(self, configs):
+        """Замена содержимого хранилища целиком"""
+        for user_id in list(self.user_ids()):
+            if user_id not in configs:
+                self.save_user(user_id, {})
+        for user_id, user_configs in configs.items():
+            self.save_user(user_id, user_configs)
+
+    def import_configs(self, configs):
+        """Импорт конфигураций в формате configurations.json (существующие перезаписываются)"""
+        for user_id, user_configs in configs.items():
+            if user_configs:
+                with self._user_lock(user_id):
+                    merged = self.load_user(user_id)
+                    merged.update(ensure_config_ids(user_configs))
+                    self.save_user(user_id, merged)
+
+    def sync_paths(self):
+        """Файлы, которые нужно отправлять в репозиторий"""
+        return []
+
+    def cache_stats(self):
+        """Счетчики кэша (если хранилище его использует)"""
+        return {}
+
+    def close(self):
+        pass
+
+
+class ShardedConfigStore(ConfigStore):
+    """Хранилище конфигураций: один файл (шард) на пользователя и небольшой индекс.
+
+    Структура каталога:
+        <root>/index.json                 - версия формата и отметка о миграции
+        <root>/users/<xx>/<user_id>.json  - конфигурации одного пользователя
+
+    Сохранение и удаление затрагивают только шард пользователя, поэтому их
+    стоимость не зависит от общего числа пользователей.
+
+    Шард хранит {"version": N, "configs": {...}}; при удалении последней
+    конфигурации шард остается пустым, чтобы версия не сбрасывалась.
+
+    Прочитанные шарды кэшируются в памяти. Запись обновляет кэш сразу
+    (write-through), а повторное чтение с диска происходит только если
+    mtime или размер файла изменились извне.
+    """
+
+    def __init__(self, root_dir, legacy_file=None, cache_max_entries=CACHE_MAX_ENTRIES):
+        super().__init__()
+        self.root_dir = root_dir
+        self.users_dir = os.path.join(root_dir, 'users')
+        self.index_file = os.path.join(root_dir, 'index.json')
+        self._index_lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_max_entries = cache_max_entries
+        self.cache_hits = 0
+        self.cache_misses = 0
+        os.makedirs(self.users_dir, exist_ok=True)
+        self.index = self._read_index()
+        if self.index.get('format', 1) < STORE_FORMAT_VERSION:
+            self._upgrade_format()
+        if legacy_file and not self.index.get('migrated_from'):
+            self._migrate_legacy(legacy_file)
+
+    def _read_index(self):
+        """Чтение индекса хранилища"""
+        if os.path.exists(self.index_file):
+            with open(self.index_file, 'r') as f:
+                return json.load(f)
+        index = {'format': STORE_FORMAT_VERSION}
+        self._write_json(self.index_file, index)
+        return index
+
+    def _upgrade_format(self):
+        """Перевод шардов формата 1 (только конфигурации) в формат с версией"""
+        for user_id in list(self.user_ids()):
+            path = self._shard_path(user_id)
+            with open(path, 'r') as f:
+                user_configs = json.load(f)
+            self._write_json(path, {'version': 1, 'configs': ensure_config_ids(user_configs)})
+        with self._index_lock:
+            self.index['format'] = STORE_FORMAT_VERSION
+            self._write_json(self.index_file, self.index)
+        logger.info(f"Шарды {self.root_dir} переведены в формат {STORE_FORMAT_VERSION}")
+
+    def _migrate_legacy(self, legacy_file):
+        """Однократный перенос данных из общего configurations.json в шарды"""
+        if not os.path.exists(legacy_file):
+            return
+        try:
+            configs = read_legacy_configs(legacy_file)
+        except (json.JSONDecodeError, ConfigError) as e:
+            logger.error(f"Не удалось прочитать {legacy_file}, миграция в шарды пропущена: {e}")
+            return
+        self.import_configs(configs)
+        with self._index_lock:
+            self.index['migrated_from'] = os.path.basename(legacy_file)
+            self._write_json(self.index_file, self.index)
+        logger.info(f"Перенесены конфигурации {len(configs)} пользователей из {legacy_file}")
+
+    def _shard_path(self, user_id):
+        """Путь к шарду пользователя"""
+        user_id = str(user_id)
+        if not _USER_ID_RE.match(user_id):
+            raise ValueError(f"Некорректный user_id: {user_id!r}")
+        return os.path.join(self.users_dir, user_id[-2:].rjust(2, '0'), f"{user_id}.json")
+
+    @staticmethod
+    def _write_json(path, data):
+        write_json_atomic(path, data, indent=4)
+
+    def _cache_get(self, user_id, stat):
+        """Получение шарда и его индексов из кэша, если файл не изменился"""
+        with self._cache_lock:
+            entry = self._cache.get(user_id)
+            if entry is not None and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+                self._cache.move_to_end(user_id)
+                self.cache_hits += 1
+                return entry[2:]
+            self.cache_misses += 1
+            return None, None, None
+
+    def _cache_put(self, user_id, stat, shard):
+        """Запись шарда и его индексов в кэш с вытеснением давно не использованных.
+
+        Индексы - идентификаторы {id: имя} и порядок истории page_order();
+        возвращается тройка (шард, идентификаторы, порядок).
+        """
+        ids = {data.get('id'): name for name, data in shard['configs'].items()}
+        order = page_order(shard['configs'])
+        with self._cache_lock:
+            self._cache[user_id] = (stat.st_mtime_ns, stat.st_size, shard, ids, order)
+            self._cache.move_to_end(user_id)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
+        return shard, ids, order
+
+    def _cache_drop(self, user_id):
+        with self._cache_lock:
+            self._cache.pop(user_id, None)
+
+    def cache_stats(self):
+        """Счетчики попаданий и промахов кэша"""
+        with self._cache_lock:
+            total = self.cache_hits + self.cache_misses
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'hit_rate': self.cache_hits / total if total else 0.0,
+                'entries': len(self._cache)
+            }
+
+    def _load_shard(self, user_id):
+        """Шард пользователя, индекс идентификаторов и порядок истории (из кэша, если файл не менялся)"""
+        user_id = str(user_id)
+        path = self._shard_path(user_id)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self._cache_drop(user_id)
+            return {'version': 0, 'configs': {}}, {}, []
+        shard, ids, order = self._cache_get(user_id, stat)
+        if shard is None:
+            with open(path, 'r') as f:
+                shard = json.load(f)
+            shard, ids, order = self._cache_put(user_id, stat, shard)
+        return shard, ids, order
+
+    def load_user_versioned(self, user_id):
+        shard, _, _ = self._load_shard(user_id)
+        return dict(shard['configs']), shard['version']
+
+    def get_config_by_id(self, user_id, config_id):
+        shard, ids, _ = self._load_shard(user_id)
+        name = ids.get(config_id)
+        return (name, shard['configs'][name]) if name is not None else None
+
+    def list_page(self, user_id, limit, older_than=None, newer_than=None):
+        shard, _, order = self._load_shard(user_id)
+        return self._page(order, shard['configs'], limit, older_than, newer_than)
+
+    def save_user(self, user_id, user_configs, expected_version=None):
+        """Запись шарда пользователя целиком"""
+        user_id = str(user_id)
+        path = self._shard_path(user_id)
+        with self._user_lock(user_id):
+            version = self.get_version(user_id)
+            self._check_version(user_id, version, expected_version)
+            shard = {'version': version + 1, 'configs': dict(user_configs)}
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._write_json(path, shard)
+            self._cache_put(user_id, os.stat(path), shard)
+            return shard['version']
+
+    def user_ids(self):
+        """Перечисление пользователей, у которых есть шард"""
+        for bucket in sorted(os.listdir(self.users_dir)):
+            bucket_dir = os.path.join(self.users_dir, bucket)
+            if not os.path.isdir(bucket_dir):
+                continue
+            for filename in sorted(os.listdir(bucket_dir)):
+                if filename.endswith('.json'):
+                    yield filename[:-len('.json')]
+
+    def sync_paths(self):
+        return [self.root_dir]
+
+
+class SQLiteConfigStore(ConfigStore):
+    """Хранилище конфигураций в SQLite (режим WAL).
+
+    Конфигурации лежат в одной таблице с первичным ключом (user_id, name)
+    и индексом (user_id, created_at) для упорядоченного вывода истории.
+    Версии документов пользователей хранятся в таблице user_versions и
+    меняются в той же транзакции, что и конфигурации.
+    Каждый поток использует собственное соединение.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS configurations (
+            user_id TEXT NOT NULL,
+            name TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            data TEXT NOT NULL,
+            config_id TEXT,
+            PRIMARY KEY (user_id, name)
+        );
+        CREATE INDEX IF NOT EXISTS idx_configurations_user_created
+            ON configurations (user_id, created_at);
+        CREATE TABLE IF NOT EXISTS user_versions (
+            user_id TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        );
+    """
+
+    def __init__(self, db_path):
+        super().__init__()
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript(self.SCHEMA)
+        self._migrate_config_ids(conn)
+        conn.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_configurations_user_config_id '
+            'ON configurations (user_id, config_id)'
+        )
+        conn.execute(
+            'CREATE INDEX IF NOT EXISTS idx_configurations_user_page '
+            'ON configurations (user_id, created_at, config_id)'
+        )
+
+    def _connect(self):
+        """Соединение текущего потока"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _migrate_config_ids(self, conn):
+        """Добавление столбца config_id в базы, созданные до появления идентификаторов"""
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(configurations)')]
+        if 'config_id' in columns:
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('ALTER TABLE configurations ADD COLUMN config_id TEXT')
+        for user_id, name, data in conn.execute('SELECT user_id, name, data FROM configurations').fetchall():
+            data = json.loads(data)
+            data['id'] = data.get('id') or new_config_id()
+            conn.execute(
+                'UPDATE configurations SET config_id = ?, data = ? WHERE user_id = ? AND name = ?',
+                (data['id'], json.dumps(data), user_id, name)
+            )
+        conn.execute('COMMIT')
+
+    @staticmethod
+    def _row(user_id, name, data):
+        return str(user_id), name, data.get('created_at', ''), json.dumps(data), data.get('id')
+
+    def _write(self, user_id, expected_version, apply):
+        """Транзакция записи с проверкой и увеличением версии пользователя"""
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = self._version(conn, user_id)
+            self._check_version(user_id, version, expected_version)
+            apply(conn)
+            conn.execute(
+                'INSERT INTO user_versions (user_id, version) VALUES (?, 1) '
+                'ON CONFLICT (user_id) DO UPDATE SET version = version + 1',
+                (str(user_id),)
+            )
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        return version + 1
+
+    @staticmethod
+    def _version(conn, user_id):
+        row = conn.execute('SELECT version FROM user_versions WHERE user_id = ?', (str(user_id),)).fetchone()
+        return row[0] if row else 0
+
+    def load_user_versioned(self, user_id):
+        """Конфигурации пользователя в порядке создания и версия документа"""
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            rows = conn.execute(
+                'SELECT name, data FROM configurations WHERE user_id = ? ORDER BY created_at, rowid',
+                (str(user_id),)
+            ).fetchall()
+            version = self._version(conn, user_id)
+        finally:
+            conn.execute('COMMIT')
+        return {name: json.loads(data) for name, data in rows}, version
+
+    def load_user(self, user_id):
+        rows = self._connect().execute(
+            'SELECT name, data FROM configurations WHERE user_id = ? ORDER BY created_at, rowid',
+            (str(user_id),)
+        ).fetchall()
+        return {name: json.loads(data) for name, data in rows}
+
+    def get_version(self, user_id):
+        return self._version(self._connect(), user_id)
+
+    def get_config(self, user_id, name):
+        row = self._connect().execute(
+            'SELECT data FROM configurations WHERE user_id = ? AND name = ?',
+            (str(user_id), name)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_config_by_id(self, user_id, config_id):
+        row = self._connect().execute(
+            'SELECT name, data FROM configurations WHERE user_id = ? AND config_id = ?',
+            (str(user_id), config_id)
+        ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def list_page(self, user_id, limit, older_than=None, newer_than=None):
+        if newer_than is not None:
+            rows = self._connect().execute(
+                'SELECT name, data FROM configurations WHERE user_id = ? AND (created_at, config_id) > (?, ?) '
+                'ORDER BY created_at, config_id LIMIT ?',
+                (str(user_id), *newer_than, limit + 1)
+            ).fetchall()
+            page = [(name, json.loads(data)) for name, data in rows[:limit]]
+            return page[::-1], len(rows) > limit
+        if older_than is not None:
+            rows = self._connect().execute(
+                'SELECT name, data FROM configurations WHERE user_id = ? AND (created_at, config_id) < (?, ?) '
+                'ORDER BY created_at DESC, config_id DESC LIMIT ?',
+                (str(user_id), *older_than, limit + 1)
+            ).fetchall()
+        else:
+            rows = self._connect().execute(
+                'SELECT name, data FROM configurations WHERE user_id = ? '
+                'ORDER BY created_at DESC, config_id DESC LIMIT ?',
+                (str(user_id), limit + 1)
+            ).fetchall()
+        return [(name, json.loads(data)) for name, data in rows[:limit]], len(rows) > limit
+
+    def save_user(self, user_id, user_configs, expected_version=None):
+        def apply(conn):
+            conn.execute('DELETE FROM configurations WHERE user_id = ?', (str(user_id),))
+            conn.executemany(
+                'INSERT INTO configurations (user_id, name, created_at, data, config_id) VALUES (?, ?, ?, ?, ?)',
+                [self._row(user_id, name, data) for name, data in user_configs.items()]
+            )
+        return self._write(user_id, expected_version, apply)
+
+    def save_config(self, user_id, name, data, expected_version=None):
+        def apply(conn):
+            conn.execute(
+                'INSERT INTO configurations (user_id, name, created_at, data, config_id) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (user_id, name) DO UPDATE SET '
+                'created_at = excluded.created_at, data = excluded.data, config_id = excluded.config_id',
+                self._row(user_id, name, data)
+            )
+        self._write(user_id, expected_version, apply)
+        return self.load_user(user_id)
+
+    def delete_config(self, user_id, name, expected_version=None):
+        def apply(conn):
+            conn.execute('DELETE FROM configurations WHERE user_id = ? AND name = ?', (str(user_id), name))
+        self._write(user_id, expected_version, apply)
+        return self.load_user(user_id)
+
+    def user_ids(self):
+        rows = self._connect().execute('SELECT DISTINCT user_id FROM configurations ORDER BY user_id').fetchall()
+        return [row[0] for row in rows]
+
+    def import_configs(self, configs):
+        for user_id, user_configs in configs.items():
+            if not user_configs:
+                continue
+            def apply(conn, user_id=user_id, user_configs=user_configs):
+                conn.executemany(
+                    'INSERT OR REPLACE INTO configurations (user_id, name, created_at, data, config_id) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    [self._row(user_id, name, data) for name, data in ensure_config_ids(user_configs).items()]
+                )
+            self._write(user_id, None, apply)
+
+    def sync_paths(self):
+        # Переносим WAL в основной файл, чтобы в репозиторий попало актуальное состояние
+        self._connect().execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        return [self.db_path]
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class JournalConfigStore(ConfigStore):
+    """Хранилище конфигураций на основе журнала операций.
+
+    Каждое сохранение или удаление дописывает в journal.log одну строку JSON
+    с порядковым номером, поэтому стоимость записи пропорциональна изменению.
+    Состояние держится в памяти и при запуске восстанавливается из снимка
+    snapshot.json и журнала. Фоновое уплотнение атомарно записывает новый
+    снимок и начинает журнал заново.
+
+    Поврежденные снимок или запись в середине журнала не пропускаются, а
+    приводят к ConfigError. Недописанная последняя строка (сбой во время
+    записи) откладывается в отдельный файл с предупреждением в логе.
+    """
+
+    def __init__(self, root_dir, compact_every=1000, fsync=True):
+        super().__init__()
+        self.root_dir = root_dir
+        self.snapshot_file = os.path.join(root_dir, 'snapshot.json')
+        self.journal_file = os.path.join(root_dir, 'journal.log')
+        self.rotated_file = os.path.join(root_dir, 'journal.log.old')
+        self.compact_every = compact_every
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+        self._compactor = None
+        os.makedirs(root_dir, exist_ok=True)
+        self.state, self.versions, self.seq = self._recover()
+        # Индексы идентификаторов и порядок истории по пользователям, строятся при первом обращении
+        self._ids = {}
+        self._orders = {}
+        self.records_since_snapshot = 0
+        self._journal = open(self.journal_file, 'a')
+
+    def _recover(self):
+        """Восстановление состояния: снимок и воспроизведение журнала"""
+        state, versions, seq = {}, {}, 0
+        if os.path.exists(self.snapshot_file):
+            try:
+                with open(self.snapshot_file, 'r') as f:
+                    snapshot = json.load(f)
+                state, versions, seq = snapshot['configs'], snapshot.get('versions', {}), snapshot['seq']
+            except (json.JSONDecodeError, KeyError, TypeError) as e:
+                raise ConfigError(f"Поврежден снимок {self.snapshot_file}: {e}") from e
+        replayed = 0
+        for path in (self.rotated_file, self.journal_file):
+            if os.path.exists(path):
+                for record in self._read_journal(path):
+                    if record['seq'] > seq:
+                        self._apply(state, versions, record)
+                        seq = record['seq']
+                        replayed += 1
+        logger.info(f"Хранилище {self.root_dir} восстановлено: {len(state)} пользователей, {replayed} записей журнала")
+        return state, versions, seq
+
+    def _read_journal(self, path):
+        """Чтение записей журнала с проверкой целостности"""
+        with open(path, 'r') as f:
+            lines = f.read().split('\n')
+        # После последней полной записи всегда идет перевод строки
+        complete, tail = lines[:-1], lines[-1]
+        records = []
+        for number, line in enumerate(complete, 1):
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ConfigError(f"Повреждена запись {number} журнала {path}: {e}") from e
+        if tail:
+            torn_path = f"{path}.torn-{int(time.time())}"
+            with open(torn_path, 'w') as f:
+                f.write(tail)
+            with open(path, 'w') as f:
+                f.write(''.join(line + '\n' for line in complete))
+            logger.warning(f"Недописанная запись в конце {path} перенесена в {torn_path}")
+        return records
+
+    @staticmethod
+    def _apply(state, versions, record):
+        """Применение одной записи журнала к состоянию"""
+        user_id = record['user_id']
+        versions[user_id] = versions.get(user_id, 0) + 1
+        if record['op'] == 'save':
+            state.setdefault(user_id, {})[record['name']] = record['data']
+        elif record['op'] == 'delete':
+            user_configs = state.get(user_id, {})
+            user_configs.pop(record['name'], None)
+            if not user_configs:
+                state.pop(user_id, None)
+        elif record['op'] == 'replace':
+            if record['data']:
+                state[user_id] = dict(record['data'])
+            else:
+                state.pop(user_id, None)
+        else:
+            raise ConfigError(f"Неизвестная операция журнала: {record['op']}")
+
+    def _append(self, op, user_id, name=None, data=None):
+        """Запись операции в журнал и применение к состоянию (под self._lock)"""
+        self.seq += 1
+        record = {'seq': self.seq, 'op': op, 'user_id': str(user_id), 'name': name, 'data': data}
+        self._journal.write(json.dumps(record) + '\n')
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        self._apply(self.state, self.versions, record)
+        self._ids.pop(str(user_id), None)
+        self._orders.pop(str(user_id), None)
+        self.records_since_snapshot += 1
+        if self.records_since_snapshot >= self.compact_every:
+            self._start_compaction()
+
+    def load_user_versioned(self, user_id):
+        with self._lock:
+            return dict(self.state.get(str(user_id), {})), self.versions.get(str(user_id), 0)
+
+    def load_user(self, user_id):
+        with self._lock:
+            return dict(self.state.get(str(user_id), {}))
+
+    def get_config(self, user_id, name):
+        with self._lock:
+            return self.state.get(str(user_id), {}).get(name)
+
+    def get_config_by_id(self, user_id, config_id):
+        user_id = str(user_id)
+        with self._lock:
+            user_configs = self.state.get(user_id, {})
+            ids = self._ids.get(user_id)
+            if ids is None:
+                ids = self._ids[user_id] = {data.get('id'): name for name, data in user_configs.items()}
+            name = ids.get(config_id)
+            return (name, user_configs[name]) if name is not None else None
+
+    def list_page(self, user_id, limit, older_than=None, newer_than=None):
+        user_id = str(user_id)
+        with self._lock:
+            user_configs = self.state.get(user_id, {})
+            order = self._orders.get(user_id)
+            if order is None:
+                order = self._orders[user_id] = page_order(user_configs)
+            return self._page(order, user_configs, limit, older_than, newer_than)
+
+    def save_user(self, user_id, user_configs, expected_version=None):
+        with self._lock:
+            self._check_version(user_id, self.versions.get(str(user_id), 0), expected_version)
+            self._append('replace', user_id, data=user_configs)
+            return self.versions[str(user_id)]
+
+    def save_config(self, user_id, name, data, expected_version=None):
+        with self._lock:
+            self._check_version(user_id, self.versions.get(str(user_id), 0), expected_version)
+            self._append('save', user_id, name, data)
+            return dict(self.state.get(str(user_id), {}))
+
+    def delete_config(self, user_id, name, expected_version=None):
+        with self._lock:
+            self._check_version(user_id, self.versions.get(str(user_id), 0), expected_version)
+            if name in self.state.get(str(user_id), {}):
+                self._append('delete', user_id, name)
+            return dict(self.state.get(str(user_id), {}))
+
+    def user_ids(self):
+        with self._lock:
+            return sorted(self.state)
+
+    def _start_compaction(self):
+        """Запуск уплотнения в фоновом потоке (под self._lock)"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, name='journal-compaction', daemon=True)
+        self._compactor.start()
+
+    def compact(self):
+        """Запись нового снимка и сброс журнала"""
+        with self._compact_lock:
+            with self._lock:
+                # Фиксируем состояние и начинаем новый журнал; старый нужен до записи снимка
+                snapshot = {
+                    'seq': self.seq,
+                    'configs': {u: dict(c) for u, c in self.state.items()},
+                    'versions': dict(self.versions)
+                }
+                self._journal.close()
+                if os.path.exists(self.rotated_file):
+                    # Предыдущее уплотнение не завершилось: дописываем его журнал к текущему
+                    with open(self.rotated_file, 'a') as old, open(self.journal_file, 'r') as cur:
+                        old.write(cur.read())
+                    os.remove(self.journal_file)
+                else:
+                    os.replace(self.journal_file, self.rotated_file)
+                self._journal = open(self.journal_file, 'a')
+                self.records_since_snapshot = 0
+            write_json_atomic(self.snapshot_file, snapshot)
+            os.remove(self.rotated_file)
+        logger.info(f"Журнал конфигураций уплотнен до снимка (seq {snapshot['seq']})")
+
+    def sync_paths(self):
+        return [self.root_dir]
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        self.compact()
+        with self._lock:
+            self._journal.close()
+
+
+class MongoConfigStore(ConfigStore):
+    """Хранилище конфигураций в MongoDB, общее для нескольких реплик бота.
+
+    Один документ на конфигурацию: {user_id, name, created_at, data}.
+    MongoClient содержит собственный пул соединений и потокобезопасен,
+    поэтому хранилище создается один раз и используется из пула потоков.
+    Для тестов можно передать готовый client (например, mongomock.MongoClient).
+
+    Версии документов пользователей лежат в коллекции user_versions и
+    увеличиваются условным обновлением, поэтому одновременная запись
+    одного пользователя с разных реплик обнаруживается как конфликт.
+    """
+
+    def __init__(self, uri=None, db_name='dronedesigner', client=None, max_pool_size=50):
+        super().__init__()
+        self.client = client if client is not None else MongoClient(uri, maxPoolSize=max_pool_size)
+        self.collection = self.client[db_name]['configurations']
+        self.versions = self.client[db_name]['user_versions']
+        self.collection.create_index([('user_id', ASCENDING), ('name', ASCENDING)], unique=True)
+        self.collection.create_index([('user_id', ASCENDING), ('created_at', ASCENDING)])
+        self.collection.create_index([('user_id', ASCENDING), ('config_id', ASCENDING)])
+        self.collection.create_index([('user_id', ASCENDING), ('created_at', DESCENDING), ('config_id', DESCENDING)])
+
+    def load_user(self, user_id):
+        cursor = self.collection.find({'user_id': str(user_id)}, {'_id': 0, 'name': 1, 'data': 1})
+        return {doc['name']: doc['data'] for doc in cursor.sort([('created_at', ASCENDING), ('_id', ASCENDING)])}
+
+    def get_config(self, user_id, name):
+        doc = self.collection.find_one({'user_id': str(user_id), 'name': name}, {'_id': 0, 'data': 1})
+        return doc['data'] if doc else None
+
+    def get_config_by_id(self, user_id, config_id):
+        doc = self.collection.find_one({'user_id': str(user_id), 'config_id': config_id}, {'_id': 0, 'name': 1, 'data': 1})
+        return (doc['name'], doc['data']) if doc else None
+
+    def list_page(self, user_id, limit, older_than=None, newer_than=None):
+        query = {'user_id': str(user_id)}
+        order = DESCENDING
+        cursor = older_than
+        if newer_than is not None:
+            order, cursor = ASCENDING, newer_than
+        if cursor is not None:
+            op = '$gt' if order == ASCENDING else '$lt'
+            query['$or'] = [
+                {'created_at': {op: cursor[0]}},
+                {'created_at': cursor[0], 'config_id': {op: cursor[1]}}
+            ]
+        docs = list(
+            self.collection.find(query, {'_id': 0, 'name': 1, 'data': 1})
+            .sort([('created_at', order), ('config_id', order)])
+            .limit(limit + 1)
+        )
+        page = [(doc['name'], doc['data']) for doc in docs[:limit]]
+        if order == ASCENDING:
+            page.reverse()
+        return page, len(docs) > limit
+
+    def get_version(self, user_id):
+        doc = self.versions.find_one({'_id': str(user_id)})
+        return doc['version'] if doc else 0
+
+    def load_user_versioned(self, user_id):
+        version = self.get_version(user_id)
+        return self.load_user(user_id), version
+
+    def _bump_version(self, user_id, expected_version):
+        """Условное увеличение версии документа пользователя"""
+        if expected_version is None:
+            doc = self.versions.find_one_and_update(
+                {'_id': str(user_id)}, {'$inc': {'version': 1}}, upsert=True, return_document=ReturnDocument.AFTER
+            )
+            return doc['version']
+        if expected_version == 0:
+            try:
+                self.versions.insert_one({'_id': str(user_id), 'version': 1})
+                return 1
+            except DuplicateKeyError:
+                doc = None
+        else:
+            doc = self.versions.find_one_and_update(
+                {'_id': str(user_id), 'version': expected_version}, {'$inc': {'version': 1}},
+                return_document=ReturnDocument.AFTER
+            )
+        if doc is None:
+            self._check_version(user_id, self.get_version(user_id), expected_version)
+            raise ConfigVersionConflict(f"Конфигурации пользователя {user_id} изменены одновременно")
+        return doc['version']
+
+    def save_user(self, user_id, user_configs, expected_version=None):
+        # Сначала записываются новые конфигурации, затем удаляются лишние: при сбое между
+        # запросами у пользователя не пропадают все конфигурации сразу
+        version = self._bump_version(user_id, expected_version)
+        if user_configs:
+            self.collection.bulk_write([
+                ReplaceOne({'user_id': str(user_id), 'name': name}, self._document(user_id, name, data), upsert=True)
+                for name, data in user_configs.items()
+            ], ordered=False)
+        self.collection.delete_many({'user_id': str(user_id), 'name': {'$nin': list(user_configs)}})
+        return version
+
+    def save_config(self, user_id, name, data, expected_version=None):
+        self._bump_version(user_id, expected_version)
+        self.collection.replace_one({'user_id': str(user_id), 'name': name}, self._document(user_id, name, data), upsert=True)
+        return self.load_user(user_id)
+
+    def delete_config(self, user_id, name, expected_version=None):
+        self._bump_version(user_id, expected_version)
+        self.collection.delete_one({'user_id': str(user_id), 'name': name})
+        return self.load_user(user_id)
+
+    def user_ids(self):
+        return sorted(self.collection.distinct('user_id'))
+
+    def import_configs(self, configs):
+        requests = [
+            ReplaceOne({'user_id': str(user_id), 'name': name}, self._document(user_id, name, data), upsert=True)
+            for user_id, user_configs in configs.items()
+            for name, data in ensure_config_ids(user_configs).items()
+        ]
+        if requests:
+            self.collection.bulk_write(requests, ordered=False)
+            for user_id in configs:
+                self._bump_version(user_id, None)
+
+    @staticmethod
+    def _document(user_id, name, data):
+        return {
+            'user_id': str(user_id), 'name': name, 'config_id': data.get('id'),
+            'created_at': data.get('created_at', ''), 'data': data
+        }
+
+    def close(self):
+        self.client.close()
+
+
+class UserLocks:
+    """Асинхронные блокировки по пользователям.
+
+    Изменения одного пользователя выполняются по очереди, разные
+    пользователи не ждут друг друга. Блокировка удаляется, когда ее
+    больше никто не удерживает и не ожидает.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._holders = {}
+
+    @asynccontextmanager
+    async def hold(self, user_id):
+        key = str(user_id)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._holders[key] = self._holders.get(key, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            self._holders[key] -= 1
+            if not self._holders[key]:
+                del self._holders[key]
+                del self._locks[key]
+
+    def __len__(self):
+        return len(self._locks)
+
+
+def call_with_version(method, user_id, *args, retries=3):
+    """Вызов изменяющего метода хранилища с проверкой версии и повтором при конфликте"""
+    store = method.__self__
+    for attempt in range(1, retries + 1):
+        version = store.get_version(user_id)
+        try:
+            return method(user_id, *args, expected_version=version)
+        except ConfigVersionConflict as e:
+            if attempt == retries:
+                raise
+            logger.warning(f"{e}, повтор {attempt}/{retries}")
+
+
+def create_config_store(backend=None, legacy_file='configurations.json'):
+    """Создание хранилища по имени бэкенда (по умолчанию из CONFIG_BACKEND)"""
+    backend = backend or os.getenv('CONFIG_BACKEND', 'files')
+    if backend == 'files':
+        return ShardedConfigStore(os.getenv('CONFIG_DIR', 'configs'), legacy_file=legacy_file)
+    if backend == 'sqlite':
+        return SQLiteConfigStore(os.getenv('CONFIG_DB', 'configurations.db'))
+    if backend == 'journal':
+        return JournalConfigStore(os.getenv('CONFIG_JOURNAL_DIR', 'configs_journal'))
+    if backend == 'mongo':
+        return MongoConfigStore(
+            os.getenv('MONGO_URI', 'mongodb://localhost:27017'),
+            os.getenv('MONGO_DB', 'dronedesigner'),
+            max_pool_size=int(os.getenv('MONGO_POOL_SIZE', '50'))
+        )
+    raise ConfigError(f"Неизвестный бэкенд хранилища: {backend}")
+
+
+def main(argv):
+    """Однократный импорт configurations.json: python storage.py import-json [путь] [бэкенд]"""
+    if len(argv) < 2 or argv[1] != 'import-json':
+        print(main.__doc__)
+        return 1
+    path = argv[2] if len(argv) > 2 else 'configurations.json'
+    store = create_config_store(argv[3] if len(argv) > 3 else None, legacy_file=None)
+    configs = read_legacy_configs(path)
+    store.import_configs(configs)
+    store.close()
+    logger.info(f"Импортированы конфигурации {len(configs)} пользователей из {path}")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(sys.argv))
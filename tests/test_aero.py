@@ -0,0 +1,46 @@
+"""Параболическая поляра и оптимальная скорость"""
+import numpy as np
+import pytest
+
+import aero
+
+
+@pytest.mark.parametrize('aero_quality, aspect_ratio', [(6, 5.0), (12, 10.0), (14, 16.0)])
+def test_polar_max_lift_to_drag(aero_quality, aspect_ratio):
+    cd0, k = aero.polar(aero_quality, aspect_ratio)
+    assert k == pytest.approx(1 / (np.pi * aero.OSWALD * aspect_ratio))
+    cl = np.linspace(0.01, 3, 30001)
+    quality = aero.lift_to_drag(cl, cd0, k)
+    assert quality.max() == pytest.approx(aero_quality, rel=1e-6)
+    assert cl[np.argmax(quality)] == pytest.approx(np.sqrt(cd0 / k), abs=1e-3)
+
+
+@pytest.mark.parametrize('mission_type, factor', [("long_range", 1.0), ("loitering", 3.0)])
+def test_optimal_speed(mission_type, factor):
+    cd0, k = aero.polar(12, 6.0)
+    weight, density, area = 200.0, 1.1, 1.0
+    speed, cl, quality = aero.optimal_speed(weight, density, area, cd0, k, mission_type)
+    assert cl == pytest.approx(np.sqrt(factor * cd0 / k))
+    assert aero.lift_coefficient(weight, density, speed, area) == pytest.approx(cl)
+    assert quality == pytest.approx(aero.lift_to_drag(cl, cd0, k))
+    # Барражирование: наименьшая мощность D·V на сетке скоростей, дальность - наименьшее D
+    speeds = np.linspace(speed * 0.5, speed * 1.5, 20001)
+    lift = aero.lift_coefficient(weight, density, speeds, area)
+    drag = weight / aero.lift_to_drag(lift, cd0, k)
+    objective = drag if mission_type == "long_range" else drag * speeds
+    assert speeds[np.argmin(objective)] == pytest.approx(speed, rel=1e-3)
+
+
+def test_optimal_speed_limited_by_cl_max():
+    cd0, k = aero.polar(8, 10.0)
+    assert np.sqrt(cd0 / k) > aero.CL_MAX
+    _, cl, _ = aero.optimal_speed(200.0, 1.1, 1.0, cd0, k, "long_range")
+    assert cl == aero.CL_MAX
+
+
+def test_cruise_lift_coefficient():
+    density = 1.0
+    speed = np.array([10.0, 20.0, 40.0])
+    cl = aero.cruise_lift_coefficient(200.0, density, speed)
+    np.testing.assert_allclose(cl, np.minimum(200.0 / (0.5 * density * speed**2), aero.CL_MAX))
+    assert cl[0] == aero.CL_MAX and cl[-1] < aero.CL_MAX
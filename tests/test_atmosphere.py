@@ -0,0 +1,61 @@
+"""Стандартная атмосфера ISA и таблица плотности"""
+import math
+
+import numpy as np
+import pytest
+
+import atmosphere
+
+# Справочные значения ISA: высота м -> (температура К, давление Па, плотность кг/м³)
+ISA_REFERENCE = {
+    0.0: (288.15, 101325.0, 1.2250),
+    1000.0: (281.65, 89876.0, 1.1117),
+    5000.0: (255.65, 54048.0, 0.73643),
+    11000.0: (216.65, 22632.0, 0.36392),
+    15000.0: (216.65, 12045.0, 0.19367)
+}
+
+
+@pytest.mark.parametrize('altitude', sorted(ISA_REFERENCE))
+def test_state_matches_reference(altitude):
+    temperature, pressure, density = ISA_REFERENCE[altitude]
+    state = atmosphere.state(altitude)
+    assert state.temperature == pytest.approx(temperature, abs=0.01)
+    assert state.density == pytest.approx(density, rel=2e-3)
+    assert state.pressure == pytest.approx(pressure, rel=2e-3)
+    assert state.speed_of_sound == pytest.approx(math.sqrt(1.4 * 287.05 * temperature))
+
+
+def test_density_continuous_at_tropopause():
+    below = atmosphere.density_analytic(atmosphere.H_TROPOPAUSE - 1e-6)
+    above = atmosphere.density_analytic(atmosphere.H_TROPOPAUSE + 1e-6)
+    assert above == pytest.approx(below, rel=1e-9)
+
+
+def test_table_error_within_bound():
+    table = atmosphere.DensityTable(step=10)
+    altitudes = np.linspace(0, 25000, 100001)
+    error = np.abs(table.density_array(altitudes) - atmosphere.density_analytic_array(altitudes))
+    assert error.max() <= table.max_error * (1 + 1e-6)
+    # Оценка из docstring: step²/8·max|ρ''| при шаге 10 м - 1.2e-7 кг/м³
+    assert table.max_error < 1.2e-7
+
+
+def test_scalar_and_array_paths_agree():
+    altitudes = np.array([-100.0, 0.0, 3.5, 999.9, 11000.0, 19999.99, 20000.0, 30000.0])
+    scalar = [atmosphere.state(float(h), delta_t=5.0) for h in altitudes]
+    array = atmosphere.state_array(altitudes, delta_t=5.0)
+    for field in atmosphere.AtmosphereState._fields:
+        np.testing.assert_allclose(getattr(array, field), [getattr(s, field) for s in scalar], rtol=1e-12)
+
+
+def test_temperature_offset_keeps_pressure():
+    hot = atmosphere.state(2000.0, delta_t=15.0)
+    standard = atmosphere.state(2000.0)
+    assert hot.pressure == pytest.approx(standard.pressure, rel=1e-12)
+    assert hot.density < standard.density
+
+
+def test_invalid_table_step():
+    with pytest.raises(ValueError):
+        atmosphere.DensityTable(step=0)
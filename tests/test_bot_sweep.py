@@ -0,0 +1,37 @@
+"""/sweep считает по той же модели, что и экран результатов"""
+import numpy as np
+import pytest
+
+import bot1
+import design
+
+
+def test_grid_matches_result_screen():
+    base = dict(bot1.SWEEP_DEFAULTS)
+    axes, _, _ = bot1.parse_sweep_args(["speed=60:160:6", "payload=1:10:3"])
+    inputs, results = bot1.run_sweep(base, axes)
+    for index in np.ndindex(results['takeoff_mass'].shape):
+        point = bot1.size_sweep_point(inputs, index)
+        expected = design.calculate(design.DesignInput.from_dict(dict(
+            base, speed=inputs['speed'][index].item(), payload=inputs['payload'][index].item()
+        )))
+        assert point == expected
+        np.testing.assert_allclose(results['takeoff_mass'][index], expected.takeoff_mass, rtol=1e-9)
+        np.testing.assert_allclose(results['battery_voltage'][index], expected.battery_voltage, rtol=1e-9)
+
+
+def test_report_shows_best_point_mass():
+    base = dict(bot1.SWEEP_DEFAULTS)
+    axes, objective, sense = bot1.parse_sweep_args(["speed=60:160:11"])
+    inputs, results = bot1.run_sweep(base, axes)
+    text, size = bot1.sweep_report(base, axes, objective, sense)
+    values = np.where(results['mass_converged'], results['takeoff_mass'], np.nan)
+    best = np.unravel_index(np.nanargmin(values), values.shape)
+    assert size == 11
+    assert f"Взлетная масса: {results['takeoff_mass'][best]:.2f} кг" in text
+    assert "взлетная масса с ней" not in text
+
+
+def test_grid_size_limit():
+    with pytest.raises(ValueError, match="Слишком большая сетка"):
+        bot1.parse_sweep_args(["speed=60:160:200", "payload=1:10:200"])
@@ -0,0 +1,105 @@
+"""Каталог комплектующих: чтение книги, кэш .npz и поиск по индексам"""
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import catalog
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'база.xlsx')
+
+pytest.importorskip('openpyxl')
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / 'база.xlsx'
+    shutil.copy(WORKBOOK, path)
+    return str(path), str(tmp_path / 'cache.npz')
+
+
+def assert_same_tables(left, right):
+    assert left.keys() == right.keys()
+    for table in left:
+        assert left[table].keys() == right[table].keys()
+        for field in left[table]:
+            np.testing.assert_array_equal(left[table][field], right[table][field])
+
+
+def test_cache_round_trip(workbook):
+    path, cache_path = workbook
+    built, signature = catalog.load(path, cache_path)
+    assert os.path.exists(cache_path)
+    cached, cached_signature = catalog.load(path, cache_path)
+    np.testing.assert_array_equal(signature, cached_signature)
+    assert_same_tables(built.tables, cached.tables)
+    assert built.size('batteries') > 0 and built.size('motors') > 0
+    energy = built.tables['batteries']['energy']
+    np.testing.assert_allclose(energy, built.tables['batteries']['capacity_mah'] / 1000 * built.tables['batteries']['voltage'])
+
+
+def test_cache_rebuilt_when_workbook_changes(workbook, monkeypatch):
+    path, cache_path = workbook
+    catalog.load(path, cache_path)
+    os.utime(path, ns=(0, 0))
+    calls = []
+    read_workbook = catalog.read_workbook
+    monkeypatch.setattr(catalog, 'read_workbook', lambda p: calls.append(p) or read_workbook(p))
+    _, signature = catalog.load(path, cache_path)
+    assert calls == [path]
+    np.testing.assert_array_equal(catalog.read_cache(cache_path)['batteries']['id'],
+                                  catalog.read_workbook(path)['batteries']['id'])
+    assert signature[1] == 0
+
+
+def test_cache_without_workbook(workbook):
+    path, cache_path = workbook
+    built, _ = catalog.load(path, cache_path)
+    os.remove(path)
+    cached, signature = catalog.load(path, cache_path)
+    assert signature is None
+    assert_same_tables(built.tables, cached.tables)
+
+
+def test_missing_workbook_and_cache(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        catalog.load(str(tmp_path / 'нет.xlsx'), str(tmp_path / 'нет.npz'))
+
+
+def test_corrupt_cache_ignored(tmp_path):
+    path = tmp_path / 'cache.npz'
+    path.write_bytes(b'not a zip')
+    assert catalog.read_cache(str(path)) is None
+
+
+def test_smallest_at_least_matches_scan():
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 100, 50)
+    tables = {
+        'batteries': {field: rng.uniform(0, 100, 50) for field in catalog.INDEXED_FIELDS['batteries']},
+        'motors': {'power': values, 'voltage': rng.uniform(10, 50, 50), 'id': np.arange(50)}
+    }
+    tables['batteries']['id'] = np.arange(50)
+    index = catalog.Catalog(tables)
+    queries = np.linspace(-5, 105, 200)
+    found = index.smallest_at_least('motors', 'power', queries)
+    for query, row in zip(queries, found):
+        candidates = values[values >= query]
+        if candidates.size:
+            assert values[row] == candidates.min()
+        else:
+            assert row == -1
+    assert np.all(values[index.at_least('motors', 'power', 50.0)] >= 50.0)
+
+
+def test_version_changes_on_reload(workbook, monkeypatch):
+    path, cache_path = workbook
+    load = catalog.load
+    monkeypatch.setattr(catalog, 'CATALOG_FILE', path)
+    monkeypatch.setattr(catalog, 'load', lambda: load(path, cache_path))
+    monkeypatch.setattr(catalog, '_catalog', None)
+    first = catalog.version()
+    assert catalog.version() == first
+    os.utime(path, ns=(0, 0))
+    assert catalog.version() == first + 1
@@ -0,0 +1,59 @@
+"""Входные данные, результаты и расчет design.calculate"""
+import dataclasses
+
+import pytest
+
+import design
+
+BASE = dict(type="loitering", flight_time=2.0, speed=120.0, payload=5.0, aero_quality=12, thrust_reserve=2.0,
+            maneuver_time=15.0, plane_mass=0.45, propeller_eff=0.8, takeoff_type=0.4, battery_capacity=300.0,
+            ceiling=1000.0)
+
+
+def test_input_round_trip():
+    inputs = design.DesignInput(**BASE)
+    assert design.DesignInput.from_dict(inputs.as_dict()) == inputs
+    # Лишние ключи сессии пропускаются, незаданная дальность не попадает в словарь
+    assert design.DesignInput.from_dict(dict(BASE, user_name="x")) == inputs
+    assert 'distance' not in inputs.as_dict()
+    assert set(inputs.as_dict()) <= set(design.DESIGN_INPUT_KEYS)
+
+
+def test_normalized_is_cache_key():
+    inputs = design.DesignInput(**BASE)
+    noisy = dataclasses.replace(inputs, speed=120.0 + 1e-9, payload=5.0 - 1e-10)
+    assert noisy != inputs
+    assert noisy.normalized() == inputs.normalized()
+    assert hash(noisy.normalized()) == hash(inputs.normalized())
+
+
+@pytest.mark.parametrize('option', ['energy_model', 'propeller_model', 'aero_model'])
+def test_unknown_model(option):
+    with pytest.raises(ValueError):
+        design.calculate(design.DesignInput(**BASE, **{option: 'unknown'}))
+
+
+def test_result_as_dict():
+    result = design.calculate(design.DesignInput(**BASE))
+    data = result.as_dict()
+    assert data['takeoff_mass'] == result.takeoff_mass
+    assert data['payload'] == BASE['payload']
+    assert set(design.RESULT_FIELDS) <= set(data)
+    for key in ('battery_type', 'battery_info', 'pack_info', 'propeller_info', 'rotor_info'):
+        assert isinstance(data[key], str)
+    assert result.battery_type == "Li-ion"
+
+
+def test_closure_disabled():
+    result = design.calculate(design.DesignInput(**BASE), mass_closure_enabled=False)
+    assert result.takeoff_mass == pytest.approx(BASE['payload'] / (1 - BASE['plane_mass']))
+    assert result.mass_iterations == 0
+
+
+def test_polar_lift_coefficient():
+    result = design.calculate(design.DesignInput(**BASE, aero_model='polar', wing_loading=150.0))
+    q = 0.5 * result.air_density * (BASE['speed'] / 3.6) ** 2
+    assert result.lift_coefficient == pytest.approx(150.0 / q)
+    # Крыло считается по тому же CL
+    assert result.takeoff_mass * design.G / result.wing_area == pytest.approx(150.0)
+    assert design.calculate(design.DesignInput(**BASE)).lift_coefficient == design.C_L
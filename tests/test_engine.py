@@ -0,0 +1,76 @@
+"""Пакетный расчет engine.calculate_batch против design.calculate"""
+import itertools
+
+import numpy as np
+import pytest
+
+import design
+import engine
+
+COUNT = 40
+
+
+def random_inputs(rng, count=COUNT):
+    """Столбцы случайных входных данных в допустимых диапазонах"""
+    return {
+        'payload': rng.uniform(0.5, 15, count),
+        'speed': rng.uniform(50, 180, count),
+        'flight_time': rng.uniform(0.3, 4, count),
+        'aero_quality': rng.choice([6, 8, 12, 14], count).astype(float),
+        'thrust_reserve': rng.choice([1.5, 2.0, 3.0], count),
+        'maneuver_time': rng.choice([10.0, 15.0, 30.0], count),
+        'plane_mass': rng.choice([0.40, 0.45, 0.50], count),
+        'propeller_eff': rng.choice([0.75, 0.80], count),
+        'takeoff_type': rng.choice([0.3, 0.4, 0.6], count),
+        'ceiling': rng.uniform(0, 4000, count),
+        'battery_capacity': rng.uniform(150, 350, count),
+        'wing_loading': rng.uniform(80, 400, count)
+    }
+
+
+def scalar(columns, options, i):
+    values = {key: float(column[i]) for key, column in columns.items()}
+    values['aero_quality'] = int(values['aero_quality'])
+    return design.calculate(design.DesignInput(**values, **options))
+
+
+MODELS = list(itertools.product(design.ENERGY_MODELS, ('constant', 'table'), ('fixed', 'polar')))
+
+
+@pytest.mark.parametrize('energy_model, propeller_model, aero_model', MODELS)
+def test_batch_matches_scalar(energy_model, propeller_model, aero_model):
+    rng = np.random.default_rng(MODELS.index((energy_model, propeller_model, aero_model)))
+    columns = random_inputs(rng)
+    options = {'type': "long_range" if rng.random() < 0.5 else "loitering", 'energy_model': energy_model,
+               'propeller_model': propeller_model, 'aero_model': aero_model}
+    batch = engine.calculate_batch(dict(columns, **options))
+    assert batch['mass_converged'].any()
+    for i in range(COUNT):
+        result = scalar(columns, options, i)
+        for key in engine.BATCH_OUTPUT_KEYS:
+            np.testing.assert_allclose(batch[key][i], getattr(result, key), rtol=1e-9, err_msg=key)
+        expected_cell = -1 if result.pack_cell is None else list(engine.packs.CELL_TABLE['name']).index(result.pack_cell)
+        assert batch['pack_cell'][i] == expected_cell
+        assert (batch['pack_series'][i], batch['pack_parallel'][i]) == (result.pack_series, result.pack_parallel)
+        if propeller_model == 'table':
+            np.testing.assert_allclose(batch['propeller_eta_cruise'][i], result.propeller_eta_cruise or np.nan, rtol=1e-9)
+        if aero_model == 'polar':
+            np.testing.assert_allclose(batch['optimal_speed'][i], result.optimal_speed, rtol=1e-9)
+
+
+def test_grid_shape():
+    base = dict(payload=5.0, speed=120.0, flight_time=2.0, aero_quality=12, thrust_reserve=2.0,
+                maneuver_time=15.0, plane_mass=0.45, propeller_eff=0.8, takeoff_type=0.4,
+                ceiling=1000.0, battery_capacity=300)
+    inputs = engine.grid_inputs(base, [('speed', np.linspace(60, 160, 6)), ('payload', np.linspace(1, 10, 4))])
+    results = engine.calculate_batch(inputs)
+    assert results['takeoff_mass'].shape == (6, 4)
+    # Взлетная масса растет с полезной нагрузкой (строки, где для всех точек подобрана сборка)
+    sized = (results['mass_converged'] & (results['pack_cell'] >= 0)).all(axis=1)
+    assert sized.any()
+    assert np.all(np.diff(results['takeoff_mass'][sized], axis=1) > 0)
+
+
+def test_unknown_aero_quality():
+    with pytest.raises(ValueError):
+        engine.aspect_ratio([12, 10])
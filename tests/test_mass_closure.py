@@ -0,0 +1,138 @@
+"""Замыкание по массе: метод Ньютона, выбор винта и сборки АКБ"""
+import numpy as np
+import pytest
+
+import mass_closure
+import packs
+from atmosphere import G
+
+COUNT = 60
+
+
+@pytest.fixture
+def variants():
+    rng = np.random.default_rng(7)
+    return {
+        'payload': rng.uniform(0.5, 15, COUNT),
+        'plane_mass': rng.choice([0.40, 0.45, 0.50], COUNT),
+        'speed_ms': rng.uniform(15, 50, COUNT),
+        'aero_quality': rng.choice([6.0, 8.0, 12.0, 14.0], COUNT),
+        'flight_time': rng.uniform(0.3, 4, COUNT)
+    }
+
+
+def make_propulsion(data, propeller=None):
+    """propulsion(takeoff_mass, index, choice) для плоских массивов вариантов, как в engine.calculate_batch"""
+    def propulsion(takeoff_mass, index=None, choice=None):
+        selected = slice(None) if index is None else index
+        table = None
+        if propeller is not None:
+            table = dict(propeller) if choice is None else dict(propeller, propeller=choice[selected])
+        return mass_closure.propulsion(
+            takeoff_mass, data['speed_ms'][selected], data['aero_quality'][selected], 2.0, 0.8,
+            data['flight_time'][selected], 0.15, 250.0, propeller=table
+        )
+    return propulsion
+
+
+def residual(data, mass, battery_mass, motor_mass):
+    return mass - data['payload'] - data['plane_mass'] * mass - battery_mass - motor_mass
+
+
+def test_solve_quadratic():
+    payload = np.array([1.0, 2.0, 5.0, 1.0])
+    fraction = np.array([0.4, 0.5, 0.45, 0.9])
+    a, b = 0.1, 0.01
+
+    def component_mass(mass, index):
+        return a * mass + b * mass**2
+
+    mass, converged, iterations = mass_closure.solve(payload, fraction, component_mass)
+    # Корень (1 - f - a)·m - b·m² = payload, ближайший к payload / (1 - f)
+    free = 1 - fraction - a
+    discriminant = free**2 - 4 * b * payload
+    expected = (free - np.sqrt(np.maximum(discriminant, 0))) / (2 * b)
+    ok = discriminant > 0
+    np.testing.assert_allclose(mass[ok], expected[ok], rtol=1e-9)
+    assert np.all(converged == ok) and np.all(iterations[ok] > 0)
+    # Несошедшиеся варианты - расчет без компонентов
+    np.testing.assert_allclose(mass[~ok], payload[~ok] / (1 - fraction[~ok]))
+
+
+def test_close_residual(variants):
+    propulsion = make_propulsion(variants)
+    mass, converged, _, choice, pack = mass_closure.close(variants['payload'], variants['plane_mass'], propulsion)
+    assert choice is None and pack is None
+    assert converged.any() and not converged.all()
+    parts = propulsion(mass)
+    np.testing.assert_allclose(residual(variants, mass, parts['battery_mass'], parts['motor_mass'])[converged],
+                               0, atol=1e-8)
+    # Невыполнимые варианты: каждый килограмм требует больше килограмма батареи и двигателя
+    lean = variants['payload'] / (1 - variants['plane_mass'])
+    np.testing.assert_array_equal(mass[~converged], lean[~converged])
+    specific = propulsion(lean)
+    share = (specific['battery_mass'] + specific['motor_mass']) / lean
+    assert np.all(share[~converged] + variants['plane_mass'][~converged] >= 1 - 1e-9)
+
+
+def test_disabled(variants):
+    mass, converged, iterations, _, pack = mass_closure.close(
+        variants['payload'], variants['plane_mass'], make_propulsion(variants), enabled=False, chemistry="LiPo"
+    )
+    np.testing.assert_allclose(mass, variants['payload'] / (1 - variants['plane_mass']))
+    assert converged.all() and not iterations.any()
+    assert pack is not None
+
+
+def test_table_propeller(variants):
+    propeller = {'density': 1.112, 'speed_of_sound': 336.4}
+    propulsion = make_propulsion(variants, propeller)
+    mass, converged, _, choice, _ = mass_closure.close(variants['payload'], variants['plane_mass'], propulsion, True)
+    assert (choice >= 0).any()
+    parts = propulsion(mass, None, choice)
+    np.testing.assert_allclose(residual(variants, mass, parts['battery_mass'], parts['motor_mass'])[converged],
+                               0, atol=1e-8)
+    chosen = choice >= 0
+    assert np.all(parts['propeller']['feasible'][chosen & converged])
+
+
+def test_whole_pack(variants):
+    propulsion = make_propulsion(variants)
+    mass, converged, _, _, pack = mass_closure.close(
+        variants['payload'], variants['plane_mass'], propulsion, chemistry="Li-ion", reserve=1.2
+    )
+    # Для несошедшихся вариантов сборка подобрана при массе без компонентов и не замыкается
+    sized = (pack['cell'] >= 0) & converged
+    assert sized.any()
+    assert np.all(pack['parallel'][sized] == np.round(pack['parallel'][sized]))
+    parts = propulsion(mass)
+    np.testing.assert_allclose(residual(variants, mass, pack['mass'], parts['motor_mass'])[sized], 0, atol=1e-8)
+    # Сборка покрывает энергию с запасом при итоговой массе
+    assert np.all(pack['capacity'][sized] * pack['voltage'][sized] * 3600
+                  >= parts['energy_required'][sized] * 1.2 * (1 - 1e-9))
+    assert np.all(np.isnan(pack['mass'][converged & ~sized]))
+
+
+def test_fixed_pack_is_continuous(variants):
+    propulsion = make_propulsion(variants)
+    _, _, _, _, sized = mass_closure.close(variants['payload'], variants['plane_mass'], propulsion, chemistry="Li-ion")
+    fixed = {'cell': sized['cell'], 'series': sized['series']}
+    mass, converged, _, _, pack = mass_closure.close(variants['payload'], variants['plane_mass'], propulsion,
+                                                     pack=fixed)
+    found = (pack['cell'] >= 0) & converged
+    assert found.any()
+    assert np.any(pack['parallel'][found] != np.round(pack['parallel'][found]))
+    np.testing.assert_array_equal(pack['series'][found], sized['series'][found])
+    parts = propulsion(mass)
+    np.testing.assert_allclose(residual(variants, mass, pack['mass'], parts['motor_mass'])[found], 0, atol=1e-8)
+    # Масса гладко зависит от полезной нагрузки: малое приращение - малое изменение массы
+    shifted, _, _, _, _ = mass_closure.close(variants['payload'] * (1 + 1e-6), variants['plane_mass'], propulsion,
+                                             pack=fixed)
+    relative = (shifted - mass)[found] / mass[found]
+    assert np.all((relative > 0) & (relative < 1e-4))
+
+
+def test_fixed_pack_voltage():
+    pack = mass_closure.fixed_pack([0, -1], [6, 0], (2,))
+    assert pack['voltage'][0] == packs.CELL_TABLE['voltage'][0] * 6
+    assert np.isnan(pack['voltage'][1]) and not pack['parallel'].any()
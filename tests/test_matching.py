@@ -0,0 +1,58 @@
+"""Подбор комплектующих: TopKIndex против полного перебора"""
+import numpy as np
+import pytest
+
+import matching
+
+
+def brute_force(voltage, requirement, mass, required, target, k, tolerance):
+    """k самых легких строк перебором всех строк каталога"""
+    allowed = (requirement >= required) & (np.abs(np.round(voltage, 1) - target) <= tolerance * target)
+    rows = np.flatnonzero(allowed)
+    return rows[np.argsort(mass[rows], kind='stable')][:k]
+
+
+@pytest.fixture
+def table():
+    rng = np.random.default_rng(3)
+    count = 300
+    voltage = rng.choice([11.1, 14.8, 22.2, 44.4], count) + rng.uniform(-0.02, 0.02, count)
+    requirement = rng.uniform(10, 2000, count)
+    mass = rng.uniform(0.05, 10, count)
+    return voltage, requirement, mass
+
+
+@pytest.mark.parametrize('k', [1, matching.TOP_K, matching.MAX_K])
+def test_query_matches_brute_force(table, k):
+    voltage, requirement, mass = table
+    index = matching.TopKIndex(voltage, requirement, mass)
+    rng = np.random.default_rng(k)
+    required = rng.uniform(0, 2200, 500)
+    target = rng.choice([12.0, 16.0, 22.2, 30.0, 44.4, 100.0], 500)
+    found = index.query(required, target, k)
+    assert found.shape == (500, k)
+    for i in range(500):
+        expected = brute_force(voltage, requirement, mass, required[i], target[i], k, matching.VOLTAGE_TOLERANCE)
+        np.testing.assert_array_equal(found[i, :len(expected)], expected)
+        # Недостающие места заполнены -1
+        assert np.all(found[i, len(expected):] == -1)
+
+
+def test_query_shape_and_k_limit(table):
+    index = matching.TopKIndex(*table)
+    assert index.query(100.0, 22.2).shape == (matching.TOP_K,)
+    assert index.query(np.full((2, 3), 100.0), 22.2, k=50).shape == (2, 3, matching.MAX_K)
+    assert np.all(index.query(1e9, 22.2) == -1)
+
+
+def test_empty_table():
+    index = matching.TopKIndex(np.array([]), np.array([]), np.array([]))
+    np.testing.assert_array_equal(index.query([1.0, 2.0], 22.2, k=2), np.full((2, 2), -1))
+
+
+def test_requirements_from_results():
+    results = {'battery_voltage': [22.2, 44.4], 'battery_capacity_recommended': [10.0, 5.0], 'power_max': [800.0, 1200.0]}
+    required = matching.requirements(results)
+    np.testing.assert_allclose(required['batteries'][0], [222.0, 222.0])
+    np.testing.assert_allclose(required['motors'][0], [800.0, 1200.0])
+    np.testing.assert_allclose(required['motors'][1], [22.2, 44.4])
@@ -0,0 +1,68 @@
+"""Профиль полета и энергия по участкам"""
+import numpy as np
+import pytest
+
+import atmosphere
+import mission
+
+
+def test_default_mission_durations():
+    flight_time = np.array([0.1, 0.5, 2.0, 6.0])
+    segments = mission.default_mission(flight_time, 100.0, np.array([0.0, 500.0, 3000.0, 8000.0]), 15.0)
+    np.testing.assert_allclose(sum(seg['duration'] for seg in segments), flight_time)
+    assert [seg['kind'] for seg in segments] == ['takeoff', 'climb', 'loiter', 'maneuver', 'descent']
+    for seg in segments:
+        assert np.all(seg['duration'] >= 0)
+    climb = segments[1]['duration']
+    assert np.all(2 * climb <= mission.MAX_CLIMB_SHARE * flight_time + 1e-12)
+    assert segments[1]['duration'][0] == 0
+    main = segments[2]['duration'] + segments[3]['duration']
+    np.testing.assert_allclose(segments[3]['duration'], main * 0.15)
+    assert mission.default_mission(1.0, 100.0, 0.0, 10.0, "long_range")[2]['kind'] == 'cruise'
+
+
+def test_segment_validation():
+    with pytest.raises(ValueError):
+        mission.segment('hover', 0.0, 100.0, duration=1.0)
+    with pytest.raises(ValueError):
+        mission.segment('cruise', 0.0, 100.0)
+    with pytest.raises(ValueError):
+        mission.segment('cruise', 0.0, 100.0, duration=1.0, distance=100.0)
+    assert mission.segment('cruise', 0.0, 80.0, distance=200.0)['duration'] == pytest.approx(2.5)
+
+
+def test_energy_is_power_times_duration():
+    segments = mission.default_mission(np.array([1.0, 2.5]), np.array([90.0, 140.0]), 1000.0, 20.0)
+    args = (np.array([10.0, 25.0]), 200.0, 12, 2.0, 0.8)
+    power = mission.segment_power(segments, *args, propeller_eff_max=0.7)
+    energy = mission.segment_energy(segments, *args, propeller_eff_max=0.7)
+    assert energy.shape == (2, len(segments))
+    durations = np.stack([seg['duration'] * 3600 for seg in segments], axis=-1)
+    np.testing.assert_allclose(energy, power * durations)
+
+
+def test_level_and_full_thrust_power():
+    mass, wing_loading, quality, reserve, eff = 20.0, 200.0, 12, 2.0, 0.8
+    segments = [mission.segment('cruise', 0.0, 108.0, duration=1.0), mission.segment('takeoff', 0.0, 108.0, duration=0.1)]
+    power = mission.segment_power(segments, mass, wing_loading, quality, reserve, eff)
+    weight = mass * atmosphere.G
+    speed_ms = 30.0
+    q = 0.5 * atmosphere.state(0.0).density * speed_ms**2
+    cd = 1 / (2 * quality)
+    np.testing.assert_allclose(power[0], weight * cd * (q / wing_loading + wing_loading / q) * speed_ms / eff)
+    np.testing.assert_allclose(power[1], weight / quality * reserve * speed_ms / eff)
+    # В расчетной точке (q = W/S, CL = 1) качество равно aero_quality
+    at_design = mission.segment_power([mission.segment('cruise', 0.0, 108.0, duration=1.0)],
+                                      mass, q, quality, reserve, eff)
+    np.testing.assert_allclose(at_design[0], weight / quality * speed_ms / eff)
+
+
+def test_climb_adds_and_descent_does_not_recover():
+    level = mission.segment_power([mission.segment('cruise', 0.0, 100.0, duration=0.1)], 10.0, 200.0, 12, 2.0, 0.8)
+    climb = mission.segment_power([mission.segment('climb', 1000.0, 100.0, duration=0.1)], 10.0, 200.0, 12, 2.0, 0.8)
+    descent = mission.segment_power(
+        [mission.segment('climb', 5000.0, 100.0, duration=0.0), mission.segment('descent', 0.0, 100.0, duration=0.01)],
+        10.0, 200.0, 12, 2.0, 0.8
+    )
+    assert climb[0] > level[0]
+    assert descent[1] == 0
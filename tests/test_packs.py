@@ -0,0 +1,69 @@
+"""Подбор сборок АКБ (packs.configure)"""
+import numpy as np
+import pytest
+
+import packs
+
+
+def brute_force_mass(energy, power, chemistry=None):
+    """Масса самой легкой допустимой сборки полным перебором элементов, S и P (nan - сборки нет)"""
+    best = np.inf
+    table = packs.CELL_TABLE
+    for cell in range(len(table['name'])):
+        if chemistry is not None and table['chemistry'][cell] != chemistry:
+            continue
+        for series in packs.SERIES:
+            voltage = table['voltage'][cell] * series
+            if power / voltage > packs.MAX_CURRENT:
+                continue
+            for count in range(1, packs.MAX_PARALLEL + 1):
+                if (count * table['capacity'][cell] * voltage >= energy * (1 - 1e-9)
+                        and count * table['max_current'][cell] >= power / voltage * (1 - 1e-9)):
+                    best = min(best, series * count * table['mass'][cell])
+                    break
+    return best if np.isfinite(best) else np.nan
+
+
+@pytest.fixture
+def mixed():
+    """Энергии и мощности разных порядков, чтобы сборки в разных порциях отличались по S"""
+    rng = np.random.default_rng(1)
+    energy = 10 ** rng.uniform(1, 3.5, 200)
+    power = energy * rng.uniform(0.5, 4, 200)
+    return energy, power
+
+
+def test_chunks_search_all_series(mixed, monkeypatch):
+    energy, power = mixed
+    whole = packs.configure(energy, power)
+    monkeypatch.setattr(packs, 'CHUNK_SIZE', 7)
+    chunked = packs.configure(energy, power)
+    for key in whole:
+        np.testing.assert_array_equal(chunked[key], whole[key])
+    # Каждая порция ищет по всем S, а не по S, выбранным для первой порции
+    single = [packs.configure(e, p) for e, p in zip(energy[-20:], power[-20:])]
+    np.testing.assert_array_equal(chunked['series'][-20:], [pack['series'] for pack in single])
+    np.testing.assert_array_equal(chunked['mass'][-20:], [pack['mass'] for pack in single])
+
+
+def test_lightest_within_tolerance(mixed):
+    energy, power = mixed
+    pack = packs.configure(energy, power)
+    expected = np.array([brute_force_mass(e, p) for e, p in zip(energy, power)])
+    np.testing.assert_array_equal(np.isnan(pack['mass']), np.isnan(expected))
+    found = ~np.isnan(expected)
+    assert np.all(pack['mass'][found] <= expected[found] * (1 + packs.MASS_TOLERANCE) + 1e-9)
+
+
+def test_pack_meets_energy_and_current(mixed):
+    energy, power = mixed
+    pack = packs.configure(energy, power, chemistry="Li-ion")
+    found = pack['cell'] >= 0
+    assert found.any()
+    cell = pack['cell'][found]
+    assert np.all(packs.CELL_TABLE['chemistry'][cell] == "Li-ion")
+    assert np.all(pack['capacity'][found] * pack['voltage'][found] >= energy[found] * (1 - 1e-9))
+    assert np.all(pack['current'][found] <= packs.CELL_TABLE['max_current'][cell] * pack['parallel'][found] + 1e-9)
+    assert np.all(pack['current'][found] <= packs.MAX_CURRENT)
+    assert np.all(np.isin(pack['series'][found], packs.SERIES))
+    assert np.all(pack['parallel'][~found] == 0)
@@ -0,0 +1,79 @@
+"""Рабочие точки и подбор винтов по таблицам CT(J) и КПД(J)"""
+import numpy as np
+import pytest
+
+import propellers
+
+TABLES = propellers.TABLES
+DENSITY = 1.112
+SPEED_OF_SOUND = 336.4
+
+
+@pytest.fixture
+def conditions():
+    rng = np.random.default_rng(5)
+    return rng.uniform(5, 150, 400), rng.uniform(10, 50, 400)
+
+
+def table_value(values, number, j):
+    return np.array([np.interp(jj, TABLES['j'], values[n]) for n, jj in zip(number.ravel(), j.ravel())]).reshape(j.shape)
+
+
+def test_operating_point_gives_required_thrust(conditions):
+    thrust, speed = conditions
+    point = propellers.operating_point(thrust, speed, DENSITY, SPEED_OF_SOUND)
+    feasible = point['feasible']
+    assert feasible.any() and not feasible.all()
+    number = np.broadcast_to(np.arange(len(TABLES['diameter'])), feasible.shape)[feasible]
+    j = point['j'][feasible]
+    # T = CT·ρ·n²·D⁴ при n = V/(J·D), CT и КПД - линейная интерполяция таблицы
+    diameter = TABLES['diameter'][number]
+    revolutions = np.broadcast_to(speed[:, None], feasible.shape)[feasible] / (j * diameter)
+    produced = table_value(TABLES['ct'], number, j) * DENSITY * revolutions**2 * diameter**4
+    np.testing.assert_allclose(produced, np.broadcast_to(thrust[:, None], feasible.shape)[feasible], rtol=1e-9)
+    np.testing.assert_allclose(point['eta'][feasible], table_value(TABLES['eta'], number, j), atol=1e-12)
+    np.testing.assert_allclose(point['rpm'][feasible], revolutions * 60)
+
+
+def test_single_propeller_matches_all(conditions):
+    thrust, speed = conditions
+    every = propellers.operating_point(thrust, speed, DENSITY, SPEED_OF_SOUND)
+    number = np.arange(len(thrust)) % len(TABLES['diameter'])
+    single = propellers.operating_point(thrust, speed, DENSITY, SPEED_OF_SOUND, propeller=number)
+    for key in every:
+        np.testing.assert_array_equal(single[key], every[key][np.arange(len(thrust)), number])
+
+
+def test_tip_mach_limit(conditions, monkeypatch):
+    thrust, speed = conditions
+    point = propellers.operating_point(thrust, speed, DENSITY, SPEED_OF_SOUND)
+    feasible = point['feasible']
+    tip_speed = np.hypot(np.pi * TABLES['diameter'] * point['rpm'] / 60, speed[:, None])
+    assert np.all(tip_speed[feasible] <= propellers.MAX_TIP_MACH * SPEED_OF_SOUND * (1 + 1e-9))
+    monkeypatch.setattr(propellers, 'MAX_TIP_MACH', 0.3)
+    limited = propellers.operating_point(thrust, speed, DENSITY, SPEED_OF_SOUND)['feasible']
+    assert limited.sum() < feasible.sum()
+    assert not np.any(limited & ~feasible)
+
+
+def test_select_picks_best_feasible(conditions):
+    thrust, speed = conditions
+    selected = propellers.select(thrust, thrust * 2, speed, DENSITY, SPEED_OF_SOUND)
+    cruise = propellers.operating_point(thrust, speed, DENSITY, SPEED_OF_SOUND)
+    maximum = propellers.operating_point(thrust * 2, speed, DENSITY, SPEED_OF_SOUND)
+    for i in range(len(thrust)):
+        feasible = np.flatnonzero(cruise['feasible'][i] & maximum['feasible'][i])
+        if feasible.size == 0:
+            assert selected['propeller'][i] == -1 and np.isnan(selected['eta_cruise'][i])
+            continue
+        best = feasible[np.argmax(cruise['eta'][i, feasible])]
+        assert selected['propeller'][i] == best
+        assert selected['eta_cruise'][i] == cruise['eta'][i, best]
+        assert selected['eta_max'][i] == maximum['eta'][i, best]
+        assert selected['rpm_max'][i] == maximum['rpm'][i, best]
+    assert (selected['propeller'] == -1).any() and (selected['propeller'] >= 0).any()
+
+
+def test_unreachable_thrust_infeasible():
+    point = propellers.operating_point(1e6, 30.0, DENSITY, SPEED_OF_SOUND)
+    assert not point['feasible'].any()
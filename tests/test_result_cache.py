@@ -0,0 +1,59 @@
+"""Общий кэш результатов расчета и текста"""
+import pytest
+
+from result_cache import ResultCache
+
+INPUTS = dict(type="loitering", flight_time=2.0, speed=120.0, payload=5.0, aero_quality=12, thrust_reserve=2.0,
+              maneuver_time=15.0, plane_mass=0.45, propeller_eff=0.8, takeoff_type=0.4, battery_capacity=300.0)
+
+
+class Counter:
+    def __init__(self):
+        self.computed = 0
+        self.version = 1
+
+    def compute(self, design_input):
+        self.computed += 1
+        return {'payload': design_input.payload}
+
+
+def test_hits_for_rounded_inputs():
+    counter = Counter()
+    cache = ResultCache(counter.compute, lambda result: f"{result['payload']}")
+    first = cache.get(INPUTS)
+    assert cache.get(dict(INPUTS, payload=5.0 + 1e-9)) is first
+    assert cache.get(dict(INPUTS, payload=6.0))[1] == "6.0"
+    assert counter.computed == 2
+    assert cache.stats()['hits'] == 1
+
+
+def test_expired_entry(monkeypatch):
+    counter = Counter()
+    cache = ResultCache(counter.compute, str, ttl=10)
+    now = [100.0]
+    monkeypatch.setattr('result_cache.time.monotonic', lambda: now[0])
+    cache.get(INPUTS)
+    now[0] += 11
+    cache.get(INPUTS)
+    assert counter.computed == 2 and cache.stats()['expired'] == 1
+
+
+def test_version_in_key():
+    counter = Counter()
+    cache = ResultCache(counter.compute, lambda result: f"каталог {counter.version}", version=lambda: counter.version)
+    assert cache.get(INPUTS)[1] == "каталог 1"
+    assert cache.get(INPUTS)[1] == "каталог 1"
+    # После перезагрузки каталога текст формируется заново
+    counter.version = 2
+    assert cache.get(INPUTS)[1] == "каталог 2"
+    assert counter.computed == 2
+
+
+@pytest.mark.parametrize('maxsize', [1, 3])
+def test_eviction(maxsize):
+    counter = Counter()
+    cache = ResultCache(counter.compute, str, maxsize=maxsize)
+    for payload in range(1, 6):
+        cache.get(dict(INPUTS, payload=float(payload)))
+    assert cache.stats()['size'] == maxsize
+    assert cache.stats()['evictions'] == 5 - maxsize
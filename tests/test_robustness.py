@@ -0,0 +1,40 @@
+"""Оценка разброса: выборка по той же модели, что и design.calculate"""
+import asyncio
+
+import numpy as np
+import pytest
+
+import bot1
+import design
+import robustness
+
+
+@pytest.fixture(params=['constant', 'table'])
+def base(request):
+    inputs = design.DesignInput.from_dict(dict(bot1.SWEEP_DEFAULTS, propeller_model=request.param))
+    return design.calculate(inputs).as_dict()
+
+
+def test_nominal_matches_design(base):
+    np.testing.assert_allclose(robustness.nominal_mass(base), base['takeoff_mass'], rtol=1e-9)
+
+
+def test_nominal_inside_band(base):
+    takeoff_mass, battery_mass, infeasible = robustness.evaluate_chunk(base, 20000, 1)
+    summary = robustness.summarize(takeoff_mass, battery_mass, infeasible, robustness.nominal_mass(base))
+    assert summary['samples'] == 20000
+    assert summary['nominal_inside']
+    band = summary['takeoff_mass']
+    assert band[5] <= band[50] <= band[95]
+    # Медиана выборки близка к номиналу, а не к расчету без подбора сборки
+    assert abs(band[50] / base['takeoff_mass'] - 1) < 0.1
+
+
+def test_run_in_process_pool(base):
+    try:
+        summary = asyncio.run(robustness.run(base, samples=3000, seed=1))
+    finally:
+        robustness.shutdown_executor()
+    assert summary['samples'] == 3000
+    assert summary['nominal_inside']
+    assert "вне диапазона" not in bot1.format_robustness(summary)
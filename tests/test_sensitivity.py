@@ -0,0 +1,47 @@
+"""Чувствительность по той же модели со сборкой АКБ, что и design.calculate"""
+import numpy as np
+import pytest
+
+import bot1
+import design
+import engine
+import packs
+import sensitivity
+
+
+@pytest.fixture(params=['constant', 'table'])
+def data(request):
+    inputs = design.DesignInput.from_dict(dict(bot1.SWEEP_DEFAULTS, propeller_model=request.param))
+    return design.calculate(inputs).as_dict()
+
+
+def test_fixed_pack_rounds_to_design(data):
+    assert data['pack_cell']
+    columns = {key: data[key] for key in engine.BATCH_INPUT_KEYS + engine.BATCH_OPTION_KEYS if key in data}
+    columns['pack_cell'] = int(np.flatnonzero(packs.CELL_TABLE['name'] == data['pack_cell'])[0])
+    columns['pack_series'] = data['pack_series']
+    results = engine.calculate_batch(columns)
+    # Непрерывное P той же сборки, округленное вверх, - P расчета, и масса не больше расчетной
+    assert np.ceil(results['pack_parallel'] - 1e-9) == data['pack_parallel']
+    assert results['takeoff_mass'] <= data['takeoff_mass'] + 1e-9
+    np.testing.assert_allclose(results['battery_voltage'], data['battery_voltage'])
+
+
+def test_elasticities_follow_pack_model(data):
+    report, feasible = sensitivity.elasticities(data)
+    assert feasible
+    mass = report['takeoff_mass']
+    assert mass['payload'] > 0 and mass['flight_time'] > 0 and mass['aero_quality'] < 0
+    # Масса сборки задается элементом, удельная энергия батареи на нее не влияет
+    assert abs(report['battery_mass']['battery_capacity']) < 1e-6
+
+
+def test_elasticity_matches_finite_difference(data):
+    report, _ = sensitivity.elasticities(data)
+    columns = {key: data[key] for key in engine.BATCH_INPUT_KEYS + engine.BATCH_OPTION_KEYS if key in data}
+    columns['pack_cell'] = int(np.flatnonzero(packs.CELL_TABLE['name'] == data['pack_cell'])[0])
+    columns['pack_series'] = data['pack_series']
+    columns['aspect_ratio'] = float(engine.aspect_ratio(data['aero_quality']))
+    columns['payload'] = data['payload'] * np.array([1.0, 1.01, 0.99])
+    mass = engine.calculate_batch(columns)['takeoff_mass']
+    np.testing.assert_allclose(report['takeoff_mass']['payload'], (mass[1] - mass[2]) / 0.02 / mass[0], rtol=1e-3)
@@ -0,0 +1,145 @@
+"""Хранилища конфигураций (storage.py)"""
+import gc
+import json
+import logging
+import random
+import threading
+
+import pytest
+
+import storage
+from storage import JournalConfigStore, MongoConfigStore, SQLiteConfigStore, ShardedConfigStore
+
+
+def config(number):
+    return {'id': f"id-{number}", 'created_at': f"2024-01-01 00:00:{number:02d}", 'inputs': {'payload': float(number)}}
+
+
+def open_store(backend, path):
+    if backend == 'files':
+        return ShardedConfigStore(str(path / 'configs'))
+    if backend == 'sqlite':
+        return SQLiteConfigStore(str(path / 'configurations.db'))
+    if backend == 'journal':
+        return JournalConfigStore(str(path / 'journal'), fsync=False)
+    mongomock = pytest.importorskip('mongomock')
+    return MongoConfigStore(client=mongomock.MongoClient())
+
+
+def expected_page(user_configs, limit, older_than=None, newer_than=None):
+    """Страница истории полной сортировкой (как было в ConfigStore.list_page)"""
+    items = sorted(user_configs.items(), key=lambda item: storage.page_key(item[1]), reverse=True)
+    if newer_than is not None:
+        items = [item for item in items if storage.page_key(item[1]) > tuple(newer_than)]
+        return items[-limit:], len(items) > limit
+    if older_than is not None:
+        items = [item for item in items if storage.page_key(item[1]) < tuple(older_than)]
+    return items[:limit], len(items) > limit
+
+
+@pytest.mark.parametrize('backend', ['files', 'sqlite', 'journal', 'mongo'])
+def test_list_page(backend, tmp_path):
+    store = open_store(backend, tmp_path)
+    rng = random.Random(2)
+    try:
+        user_configs = {}
+        # Совпадающие created_at различаются идентификатором
+        for number in rng.sample(range(100), 37):
+            data = {'id': f"id-{number:03d}", 'created_at': f"2024-01-01 00:00:{number // 3:02d}"}
+            user_configs[f"c{number}"] = data
+            store.save_config(7, f"c{number}", data)
+        store.delete_config(7, 'c50')
+        user_configs.pop('c50', None)
+        keys = sorted(storage.page_key(data) for data in user_configs.values())
+        cursors = [None, ('', ''), ('9999', '')] + keys + [(key[0], key[1] + '0') for key in keys[::5]]
+        for limit in (1, 5, 36, 40):
+            for cursor in cursors:
+                assert store.list_page(7, limit, older_than=cursor) == expected_page(user_configs, limit, older_than=cursor)
+                if cursor is not None:
+                    assert (store.list_page(7, limit, newer_than=cursor)
+                            == expected_page(user_configs, limit, newer_than=cursor))
+        assert store.list_page(8, 5) == ([], False)
+    finally:
+        store.close()
+
+
+def test_files_page_index_follows_external_change(tmp_path):
+    store = ShardedConfigStore(str(tmp_path / 'configs'))
+    store.save_user(1, {'a': config(1), 'b': config(2)})
+    assert [name for name, _ in store.list_page(1, 5)[0]] == ['b', 'a']
+    # Шард изменен другим процессом: порядок истории перестраивается вместе с кэшем
+    other = ShardedConfigStore(str(tmp_path / 'configs'))
+    other.save_user(1, {'a': config(1), 'b': config(2), 'c': config(3)}, expected_version=1)
+    assert [name for name, _ in store.list_page(1, 5)[0]] == ['c', 'b', 'a']
+
+
+@pytest.fixture
+def mongo_store():
+    mongomock = pytest.importorskip('mongomock')
+    store = MongoConfigStore(client=mongomock.MongoClient())
+    yield store
+    store.close()
+
+
+def test_mongo_save_user_replaces_configs(mongo_store):
+    mongo_store.save_user(1, {f"c{n}": config(n) for n in range(4)})
+    version = mongo_store.save_user(1, {'c1': config(1), 'c3': dict(config(3), note="x"), 'c5': config(5)})
+    assert version == 2
+    assert mongo_store.load_user(1) == {'c1': config(1), 'c3': dict(config(3), note="x"), 'c5': config(5)}
+    assert mongo_store.save_user(1, {}) == 3
+    assert mongo_store.load_user(1) == {}
+
+
+def test_mongo_save_user_failure_keeps_configs(mongo_store, monkeypatch):
+    saved = {f"c{n}": config(n) for n in range(3)}
+    mongo_store.save_user(1, saved)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("нет связи с сервером")
+
+    # Запись прервалась до удаления лишних конфигураций: прежние конфигурации на месте
+    monkeypatch.setattr(mongo_store.collection, 'bulk_write', fail)
+    with pytest.raises(RuntimeError):
+        mongo_store.save_user(1, {'c0': config(0)})
+    assert mongo_store.load_user(1) == saved
+
+
+def test_migrate_legacy_skips_bad_users(tmp_path, caplog):
+    legacy = tmp_path / 'configurations.json'
+    legacy.write_text(json.dumps({
+        '12': {'a': {'created_at': "2024-01-01 00:00:01"}},
+        'abc': {'b': config(2)},
+        '../13': {'c': config(3)},
+        '14': ['not', 'configs']
+    }))
+    with caplog.at_level(logging.ERROR, logger='storage'):
+        store = ShardedConfigStore(str(tmp_path / 'configs'), legacy_file=str(legacy))
+    assert list(store.user_ids()) == ['12']
+    assert store.load_user(12)['a']['id']
+    assert store.index['migrated_from'] == 'configurations.json'
+    assert len([r for r in caplog.records if r.levelno == logging.ERROR]) == 3
+
+
+def test_ensure_config_ids_keeps_input():
+    user_configs = {'a': {'created_at': "x"}, 'b': config(2)}
+    result = storage.ensure_config_ids(user_configs)
+    assert user_configs == {'a': {'created_at': "x"}, 'b': config(2)}
+    assert result['a']['id'] and result['a']['created_at'] == "x"
+    assert result['b'] is user_configs['b']
+
+
+def test_user_locks_per_user(tmp_path):
+    store = ShardedConfigStore(str(tmp_path / 'configs'))
+    lock = store._user_lock(1)
+    assert store._user_lock('1') is lock
+    assert store._user_lock(2) is not lock
+    # Блокировка другого пользователя свободна, пока первая удерживается в другом потоке
+    acquired = []
+    with lock:
+        other = threading.Thread(target=lambda: acquired.append(store._user_lock(2).acquire(blocking=False)))
+        other.start()
+        other.join()
+    assert acquired == [True]
+    del lock
+    gc.collect()
+    assert len(store._user_locks) == 0
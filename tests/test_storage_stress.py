@@ -0,0 +1,80 @@
+"""Нагрузочная проверка одновременных сохранений конфигураций (bot1.save_user_config)"""
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import bot1
+from storage import JournalConfigStore, MongoConfigStore, SQLiteConfigStore, ShardedConfigStore
+
+USERS = 50
+SAVES_PER_USER = 40  # всего USERS * SAVES_PER_USER = 2000 одновременных сохранений
+WORKERS = 32
+
+
+def open_store(backend, path):
+    """Хранилище в каталоге path; для mongo - общий клиент mongomock"""
+    if backend == 'files':
+        return ShardedConfigStore(str(path / 'configs'))
+    if backend == 'sqlite':
+        return SQLiteConfigStore(str(path / 'configurations.db'))
+    if backend == 'journal':
+        # Частое уплотнение, чтобы оно шло одновременно с записью
+        return JournalConfigStore(str(path / 'journal'), compact_every=250, fsync=False)
+    mongomock = pytest.importorskip('mongomock')
+    return MongoConfigStore(client=mongomock.MongoClient())
+
+
+def record(user_id, number):
+    return {
+        'schema': bot1.CONFIG_SCHEMA_VERSION,
+        'id': f"{user_id}-{number}",
+        'created_at': f"2024-01-01 00:00:{number:02d}",
+        'inputs': {'payload': float(number), 'speed': 100.0 + user_id}
+    }
+
+
+async def save_all():
+    # Сохранения разных пользователей перемешаны, чтобы они конкурировали за потоки и блокировки
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(WORKERS))
+    await asyncio.gather(*(
+        bot1.save_user_config(user_id, f"config_{number}", record(user_id, number))
+        for number in range(SAVES_PER_USER)
+        for user_id in range(USERS)
+    ))
+
+
+def check(store):
+    """Ни одна запись не потеряна, версия каждого пользователя равна числу сохранений"""
+    assert sorted(store.user_ids(), key=int) == [str(user_id) for user_id in range(USERS)]
+    for user_id in range(USERS):
+        user_configs, version = store.load_user_versioned(user_id)
+        assert user_configs == {f"config_{number}": record(user_id, number) for number in range(SAVES_PER_USER)}
+        assert version == SAVES_PER_USER
+        name, data = store.get_config_by_id(user_id, f"{user_id}-{SAVES_PER_USER - 1}")
+        assert name == f"config_{SAVES_PER_USER - 1}" and data == record(user_id, SAVES_PER_USER - 1)
+
+
+@pytest.mark.parametrize('backend', ['files', 'sqlite', 'journal', 'mongo'])
+def test_concurrent_saves(backend, tmp_path, monkeypatch):
+    store = open_store(backend, tmp_path)
+    monkeypatch.setattr(bot1, 'config_store', store)
+    # Частое переключение потоков, чтобы гонки между чтением и записью проявлялись
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-5)
+    try:
+        asyncio.run(save_all())
+        assert len(bot1.user_locks) == 0
+        check(store)
+    finally:
+        sys.setswitchinterval(switch_interval)
+        store.close()
+
+    # Записанное на диск хранилище после повторного открытия содержит то же самое
+    if backend != 'mongo':
+        store = open_store(backend, tmp_path)
+        try:
+            check(store)
+        finally:
+            store.close()